@@ -1,3 +1,14 @@
 from django.contrib import admin
+from .models import ConfiguracaoHorario, SerieRecorrente
 
-# Register your models here.
+@admin.register(ConfiguracaoHorario)
+class ConfiguracaoHorarioAdmin(admin.ModelAdmin):
+    list_display = ['usuario', 'dia_semana', 'hora_inicio', 'hora_fim', 'ativo']
+    list_editable = ['ativo']
+    list_filter = ['dia_semana', 'ativo']
+
+
+@admin.register(SerieRecorrente)
+class SerieRecorrenteAdmin(admin.ModelAdmin):
+    list_display = ['cliente', 'servico', 'frequencia', 'data_inicio', 'hora_inicio', 'criado_por']
+    list_filter = ['frequencia']
@@ -1,9 +1,12 @@
 from django import forms
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.utils import timezone
 from datetime import datetime, time
-from .models import Cliente, TipoServico, Agendamento
-import re
+from .models import Cliente, TipoServico, Agendamento, AgendamentoStatusHistorico, SerieRecorrente
+from .services.recorrencia import datas_da_serie
+from .validators import validar_cpf, validar_data_nascimento
+
 
 class ClienteForm(forms.ModelForm):
     """Form para cadastro/edição de clientes"""
@@ -55,34 +58,28 @@ class ClienteForm(forms.ModelForm):
     def clean_cpf(self):
         cpf = self.cleaned_data.get('cpf')
         if cpf:
-            # Remove caracteres especiais
-            cpf_numbers = re.sub(r'[^0-9]', '', cpf)
-            
-            # Validação básica de CPF
-            if len(cpf_numbers) != 11:
-                raise ValidationError("CPF deve ter 11 dígitos.")
-            
-            # Verifica se todos os dígitos são iguais
-            if cpf_numbers == cpf_numbers[0] * 11:
-                raise ValidationError("CPF inválido.")
-                
+            validar_cpf(cpf)
         return cpf
 
     def clean_data_nascimento(self):
         data = self.cleaned_data.get('data_nascimento')
         if data:
-            hoje = timezone.now().date()
-            if data > hoje:
-                raise ValidationError("Data de nascimento não pode ser no futuro.")
-            
-            # Verificar se a pessoa tem pelo menos 1 ano
-            idade = hoje.year - data.year
-            if idade < 1:
-                raise ValidationError("Cliente deve ter pelo menos 1 ano.")
-                
+            validar_data_nascimento(data)
         return data
 
 
+class ImportarClientesForm(forms.Form):
+    """Upload do CSV de clientes"""
+    arquivo = forms.FileField(
+        label='Arquivo CSV',
+        widget=forms.ClearableFileInput(attrs={
+            'class': 'form-control',
+            'accept': '.csv,text/csv'
+        }),
+        help_text='Mesmas colunas da exportação: Nome; Email; Telefone; CPF; Data de Nascimento; Endereço; Ativo'
+    )
+
+
 class TipoServicoForm(forms.ModelForm):
     """Form para cadastro/edição de tipos de serviço"""
     
@@ -243,37 +240,134 @@ class AgendamentoForm(forms.ModelForm):
                                  f"o horário máximo de início é {(datetime.combine(data_agendamento, time(23, 59)) - servico.duracao).time().strftime('%H:%M')}"
                 })
             
-            # Verificar conflitos de horário
-            agendamentos_conflitantes = Agendamento.objects.filter(
-                criado_por=self.user,
-                data_agendamento=data_agendamento,
-                status__in=['agendado', 'confirmado', 'em_andamento']
-            )
+            # Já calculada aqui: o save() não recalcula e o full_clean() do form a valida
+            self.instance.hora_fim = hora_fim
             
-            # Excluir o próprio agendamento se estiver editando
-            if self.instance and self.instance.pk:
-                agendamentos_conflitantes = agendamentos_conflitantes.exclude(pk=self.instance.pk)
-            
-            for agendamento in agendamentos_conflitantes:
-                # Calcular hora_fim do agendamento existente se não estiver definida
-                if agendamento.hora_fim:
-                    agend_fim = agendamento.hora_fim
-                else:
-                    agend_inicio_dt = datetime.combine(data_agendamento, agendamento.hora_inicio)
-                    agend_fim_dt = agend_inicio_dt + agendamento.servico.duracao
-                    agend_fim = agend_fim_dt.time()
-                
-                agend_inicio = agendamento.hora_inicio
-                
-                # Verificar sobreposição
-                if (hora_inicio < agend_fim and hora_fim > agend_inicio):
-                    raise ValidationError({
-                        'hora_inicio': f"Conflito de horário com agendamento existente: "
-                                     f"{agendamento.cliente.nome} das {agend_inicio} às {agend_fim}"
-                    })
+            # Verificar conflitos de horário sempre no banco: o mapa de ocupação em cache
+            # pode estar atrasado e serve só à listagem de horários livres
+            conflito = Agendamento.objects.primeiro_conflito(
+                self.user, data_agendamento, hora_inicio, hora_fim,
+                excluir_pk=self.instance.pk if self.instance else None,
+            )
+            if conflito:
+                agend_inicio, agend_fim, cliente_nome = conflito
+                raise ValidationError({
+                    'hora_inicio': f"Conflito de horário com agendamento existente: "
+                                 f"{cliente_nome} das {agend_inicio} às {agend_fim}"
+                })
         
         return cleaned_data
 
+    def save(self, commit=True):
+        agendamento = super().save(commit=False)
+        if commit:
+            # _post_clean() já rodou full_clean() na instância; não repetir no save()
+            agendamento.save(validar=False)
+        return agendamento
+
+
+class SerieRecorrenteForm(forms.ModelForm):
+    """Form para criação de séries recorrentes de agendamentos"""
+
+    class Meta:
+        model = SerieRecorrente
+        fields = [
+            'cliente', 'servico', 'frequencia', 'data_inicio', 'hora_inicio',
+            'quantidade', 'data_fim', 'observacoes', 'valor_cobrado'
+        ]
+        widgets = {
+            'cliente': forms.Select(attrs={
+                'class': 'form-select'
+            }),
+            'servico': forms.Select(attrs={
+                'class': 'form-select'
+            }),
+            'frequencia': forms.Select(attrs={
+                'class': 'form-select'
+            }),
+            'data_inicio': forms.DateInput(attrs={
+                'class': 'form-control',
+                'type': 'date'
+            }),
+            'hora_inicio': forms.TimeInput(attrs={
+                'class': 'form-control',
+                'type': 'time'
+            }),
+            'quantidade': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'min': '1',
+                'max': str(SerieRecorrente.LIMITE_OCORRENCIAS),
+                'placeholder': 'Ex: 52'
+            }),
+            'data_fim': forms.DateInput(attrs={
+                'class': 'form-control',
+                'type': 'date'
+            }),
+            'observacoes': forms.Textarea(attrs={
+                'class': 'form-control',
+                'rows': 3,
+                'placeholder': 'Observações copiadas para cada agendamento (opcional)'
+            }),
+            'valor_cobrado': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'step': '0.01',
+                'min': '0',
+                'placeholder': 'Valor a ser cobrado'
+            })
+        }
+
+    def __init__(self, *args, **kwargs):
+        self.user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+
+        if self.user:
+            self.fields['cliente'].queryset = Cliente.objects.filter(
+                criado_por=self.user,
+                ativo=True
+            ).order_by('nome')
+
+            self.fields['servico'].queryset = TipoServico.objects.filter(
+                criado_por=self.user,
+                ativo=True
+            ).order_by('nome')
+
+        self.fields['cliente'].empty_label = "Selecione um cliente"
+        self.fields['servico'].empty_label = "Selecione um serviço"
+
+    def clean_data_inicio(self):
+        data = self.cleaned_data.get('data_inicio')
+        if data and data < timezone.now().date():
+            raise ValidationError("Não é possível agendar para datas passadas.")
+        return data
+
+    def clean(self):
+        cleaned_data = super().clean()
+        frequencia = cleaned_data.get('frequencia')
+        data_inicio = cleaned_data.get('data_inicio')
+        hora_inicio = cleaned_data.get('hora_inicio')
+        servico = cleaned_data.get('servico')
+        quantidade = cleaned_data.get('quantidade')
+        data_fim = cleaned_data.get('data_fim')
+        limite = SerieRecorrente.LIMITE_OCORRENCIAS
+
+        # Exatamente um critério de término
+        if (quantidade is None) == (data_fim is None):
+            raise ValidationError("Informe a quantidade de ocorrências ou a data final (apenas um dos dois).")
+        if quantidade is not None and not 1 <= quantidade <= limite:
+            self.add_error('quantidade', f"A série deve ter entre 1 e {limite} ocorrências.")
+        if data_fim and data_inicio:
+            if data_fim < data_inicio:
+                self.add_error('data_fim', "A data final deve ser posterior à primeira data.")
+            elif frequencia and len(datas_da_serie(frequencia, data_inicio, data_fim=data_fim, limite=limite + 1)) > limite:
+                self.add_error('data_fim', f"A série não pode ter mais de {limite} ocorrências.")
+
+        if data_inicio and hora_inicio and servico:
+            fim_datetime = datetime.combine(data_inicio, hora_inicio) + servico.duracao
+            if fim_datetime.date() > data_inicio:
+                self.add_error('hora_inicio', "O agendamento não pode passar da meia-noite.")
+
+        return cleaned_data
+
 
 class AgendamentoStatusForm(forms.ModelForm):
     """Form para alterar status do agendamento"""
@@ -299,7 +393,9 @@ class AgendamentoStatusForm(forms.ModelForm):
         }
 
     def __init__(self, *args, **kwargs):
+        self.user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
+        self.status_anterior = self.instance.status
         
         # Personalizar choices se necessário
         self.fields['status'].widget.attrs.update({'class': 'btn-check'})
@@ -307,14 +403,17 @@ class AgendamentoStatusForm(forms.ModelForm):
     def save(self, commit=True):
         agendamento = super().save(commit=False)
         
-        # Adicionar observações sobre mudança de status
-        observacoes_status = self.cleaned_data.get('observacoes_status')
-        if observacoes_status:
-            if agendamento.observacoes:
-                agendamento.observacoes += f"\n\n[{timezone.now().strftime('%d/%m/%Y %H:%M')}] Status alterado para {agendamento.get_status_display()}: {observacoes_status}"
-            else:
-                agendamento.observacoes = f"[{timezone.now().strftime('%d/%m/%Y %H:%M')}] Status alterado para {agendamento.get_status_display()}: {observacoes_status}"
-        
         if commit:
-            agendamento.save()
+            observacoes_status = self.cleaned_data.get('observacoes_status', '')
+            with transaction.atomic():
+                agendamento.save()
+                # Histórico da mudança: um INSERT por transição (ou observação registrada)
+                if agendamento.status != self.status_anterior or observacoes_status:
+                    AgendamentoStatusHistorico.objects.create(
+                        agendamento=agendamento,
+                        status_anterior=self.status_anterior,
+                        status_novo=agendamento.status,
+                        observacao=observacoes_status,
+                        criado_por=self.user,
+                    )
         return agendamento
\ No newline at end of file
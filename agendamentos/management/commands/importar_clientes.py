@@ -0,0 +1,65 @@
+"""
+Importa clientes de um arquivo CSV (mesmo formato da exportação)
+
+Uso:
+    python manage.py importar_clientes clientes.csv --usuario recepcao
+    python manage.py importar_clientes clientes.csv --usuario recepcao --batch-size 2000 --relatorio-erros erros.csv
+"""
+
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from agendamentos.services.exportacao import gerar_linhas_csv
+from agendamentos.services.importacao import CABECALHO_ERROS, importar_clientes
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Importa clientes de um CSV em lotes, gerando um relatório com as linhas recusadas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo CSV')
+        parser.add_argument(
+            '--usuario',
+            required=True,
+            help='Username do usuário dono dos clientes importados',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Quantidade de clientes gravados por INSERT',
+        )
+        parser.add_argument(
+            '--relatorio-erros',
+            help='Arquivo CSV com as linhas recusadas (padrão: <arquivo>_erros.csv)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            usuario = User.objects.get(username=options['usuario'])
+        except User.DoesNotExist:
+            raise CommandError(f'Usuário "{options["usuario"]}" não encontrado.')
+
+        try:
+            with open(options['arquivo'], encoding='utf-8-sig', newline='') as arquivo:
+                resultado = importar_clientes(usuario, arquivo, batch_size=options['batch_size'])
+        except OSError as erro:
+            raise CommandError(f'Não foi possível ler o arquivo: {erro}')
+        except ValidationError as erro:
+            raise CommandError(' '.join(erro.messages))
+
+        self.stdout.write(
+            self.style.SUCCESS(f'{resultado.criados} cliente(s) importado(s).')
+        )
+        if resultado.erros:
+            caminho = options['relatorio_erros'] or f'{os.path.splitext(options["arquivo"])[0]}_erros.csv'
+            with open(caminho, 'w', encoding='utf-8', newline='') as relatorio:
+                relatorio.writelines(gerar_linhas_csv(CABECALHO_ERROS, resultado.erros))
+            self.stdout.write(
+                self.style.WARNING(f'{len(resultado.erros)} linha(s) recusada(s); detalhes em {caminho}')
+            )
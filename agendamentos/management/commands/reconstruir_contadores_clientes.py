@@ -0,0 +1,45 @@
+"""
+Recalcula os contadores desnormalizados dos clientes (agendamentos,
+visitas, faltas, faturamento e última visita)
+
+Uso:
+    python manage.py reconstruir_contadores_clientes
+    python manage.py reconstruir_contadores_clientes --usuario recepcao
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from agendamentos.services.estatisticas_cliente import reconstruir_contadores
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os contadores de visitas, faltas e faturamento dos clientes a partir dos agendamentos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--usuario',
+            help='Username do usuário a reconstruir (padrão: todos)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Quantidade de clientes recalculados por vez',
+        )
+
+    def handle(self, *args, **options):
+        usuario = None
+        if options['usuario']:
+            try:
+                usuario = User.objects.get(username=options['usuario'])
+            except User.DoesNotExist:
+                raise CommandError(f'Usuário "{options["usuario"]}" não encontrado.')
+
+        total = reconstruir_contadores(usuario=usuario, batch_size=options['batch_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Contadores recalculados para {total} cliente(s).')
+        )
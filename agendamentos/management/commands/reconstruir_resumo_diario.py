@@ -0,0 +1,44 @@
+"""
+Reconstrói do zero a tabela de resumo diário de agendamentos
+
+Uso:
+    python manage.py reconstruir_resumo_diario
+    python manage.py reconstruir_resumo_diario --usuario recepcao
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from agendamentos.services.resumo_diario import reconstruir_resumos
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o resumo diário (contagens, minutos e faturamento) a partir dos agendamentos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--usuario',
+            help='Username do usuário a reconstruir (padrão: todos)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Quantidade de agendamentos lidos por vez do banco',
+        )
+
+    def handle(self, *args, **options):
+        usuario = None
+        if options['usuario']:
+            try:
+                usuario = User.objects.get(username=options['usuario'])
+            except User.DoesNotExist:
+                raise CommandError(f'Usuário "{options["usuario"]}" não encontrado.')
+
+        total = reconstruir_resumos(usuario=usuario, chunk_size=options['chunk_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Resumo diário reconstruído: {total} linha(s) gerada(s).')
+        )
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:09
+
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def preencher_resumos(apps, schema_editor):
+    """Monta o resumo a partir dos agendamentos existentes (mesma regra de services/resumo_diario)"""
+    Agendamento = apps.get_model('agendamentos', 'Agendamento')
+    ResumoDiarioAgendamento = apps.get_model('agendamentos', 'ResumoDiarioAgendamento')
+
+    acumulado = defaultdict(lambda: [0, 0, Decimal('0')])
+    linhas = Agendamento.objects.annotate(
+        receita=Coalesce('valor_cobrado', 'servico__preco')
+    ).values_list(
+        'criado_por_id', 'data_agendamento', 'status', 'servico_id',
+        'hora_inicio', 'hora_fim', 'receita',
+    ).order_by()
+    for usuario_id, data, status, servico_id, hora_inicio, hora_fim, receita in linhas.iterator(chunk_size=2000):
+        totais = acumulado[(usuario_id, data, status, servico_id)]
+        totais[0] += 1
+        if hora_inicio and hora_fim:
+            delta = datetime.combine(data, hora_fim) - datetime.combine(data, hora_inicio)
+            totais[1] += max(int(delta.total_seconds() // 60), 0)
+        totais[2] += receita or 0
+
+    ResumoDiarioAgendamento.objects.bulk_create([
+        ResumoDiarioAgendamento(
+            usuario_id=usuario_id, data=data, status=status, servico_id=servico_id,
+            quantidade=quantidade, minutos=minutos, faturamento=faturamento,
+        )
+        for (usuario_id, data, status, servico_id), (quantidade, minutos, faturamento) in acumulado.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0002_alter_agendamento_hora_fim_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoDiarioAgendamento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(verbose_name='Data')),
+                ('status', models.CharField(choices=[('agendado', 'Agendado'), ('confirmado', 'Confirmado'), ('em_andamento', 'Em Andamento'), ('concluido', 'Concluído'), ('cancelado', 'Cancelado'), ('nao_compareceu', 'Não Compareceu')], max_length=20, verbose_name='Status')),
+                ('quantidade', models.PositiveIntegerField(default=0, verbose_name='Quantidade')),
+                ('minutos', models.PositiveIntegerField(default=0, verbose_name='Minutos Agendados')),
+                ('faturamento', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Faturamento')),
+                ('servico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='agendamentos.tiposervico', verbose_name='Serviço')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Resumo Diário de Agendamentos',
+                'verbose_name_plural': 'Resumos Diários de Agendamentos',
+                'ordering': ['data'],
+                'unique_together': {('usuario', 'data', 'status', 'servico')},
+            },
+        ),
+        migrations.RunPython(preencher_resumos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0003_resumodiarioagendamento'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(fields=['criado_por', 'data_agendamento', 'hora_inicio'], name='agend_usuario_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(fields=['criado_por', 'status', 'data_agendamento'], name='agend_usuario_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(condition=models.Q(('status__in', ['agendado', 'confirmado', 'em_andamento'])), fields=['criado_por', 'data_agendamento', 'hora_inicio', 'hora_fim'], name='agend_ativos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(fields=['cliente', 'status'], name='agend_cliente_status_idx'),
+        ),
+    ]
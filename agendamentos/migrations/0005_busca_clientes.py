@@ -0,0 +1,131 @@
+"""
+Índices de busca de clientes.
+
+SQLite: tabela FTS5 de conteúdo externo sobre agendamentos_cliente,
+mantida por triggers (cobre também bulk_create/update) e sem acentos.
+PostgreSQL: pg_trgm + unaccent, com f_unaccent imutável e índice GIN
+sobre a mesma expressão usada em services/busca.py.
+Em outros bancos (ou sem FTS5/permissão para extensões) nada é criado e
+a busca volta ao icontains. Migrações futuras que recriem a tabela de
+clientes no SQLite devem recriar os triggers, descartados junto com a
+tabela antiga (o SQL fica copiado na própria migração, como em 0006).
+"""
+
+import django.db.models.deletion
+from django.db import DatabaseError, migrations, models, transaction
+
+import agendamentos.models
+
+TABELA_FTS = 'agendamentos_cliente_fts'
+
+SQLITE_CRIAR = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_FTS} USING fts5(
+        nome, email, telefone, cpf,
+        content='agendamentos_cliente', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ai AFTER INSERT ON agendamentos_cliente BEGIN
+        INSERT INTO {TABELA_FTS}(rowid, nome, email, telefone, cpf)
+        VALUES (new.id, new.nome, new.email, new.telefone, new.cpf);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ad AFTER DELETE ON agendamentos_cliente BEGIN
+        INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, nome, email, telefone, cpf)
+        VALUES ('delete', old.id, old.nome, old.email, old.telefone, old.cpf);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_au AFTER UPDATE ON agendamentos_cliente BEGIN
+        INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, nome, email, telefone, cpf)
+        VALUES ('delete', old.id, old.nome, old.email, old.telefone, old.cpf);
+        INSERT INTO {TABELA_FTS}(rowid, nome, email, telefone, cpf)
+        VALUES (new.id, new.nome, new.email, new.telefone, new.cpf);
+    END
+    """,
+    f"INSERT INTO {TABELA_FTS}({TABELA_FTS}) VALUES ('rebuild')",
+]
+
+SQLITE_REMOVER = [
+    f'DROP TRIGGER IF EXISTS {TABELA_FTS}_ai',
+    f'DROP TRIGGER IF EXISTS {TABELA_FTS}_ad',
+    f'DROP TRIGGER IF EXISTS {TABELA_FTS}_au',
+    f'DROP TABLE IF EXISTS {TABELA_FTS}',
+]
+
+POSTGRES_CRIAR = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE EXTENSION IF NOT EXISTS unaccent',
+    # unaccent() não é IMMUTABLE; o wrapper permite usá-la em índices
+    """
+    CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT public.unaccent('public.unaccent', $1) $$
+    """,
+    # A mesma expressão de services/busca.py (_expressao_trgm)
+    """
+    CREATE INDEX IF NOT EXISTS agend_cliente_busca_trgm ON agendamentos_cliente
+    USING gin (f_unaccent(lower(
+        coalesce("nome", '') || ' ' || coalesce("email", '') || ' ' ||
+        coalesce("telefone", '') || ' ' || coalesce("cpf", '')
+    )) gin_trgm_ops)
+    """,
+]
+
+POSTGRES_REMOVER = [
+    'DROP INDEX IF EXISTS agend_cliente_busca_trgm',
+    'DROP FUNCTION IF EXISTS f_unaccent(text)',
+]
+
+
+def _executar(schema_editor, comandos):
+    # Savepoint: no PostgreSQL uma falha (ex.: sem permissão para CREATE EXTENSION)
+    # não pode abortar a migração inteira; a busca cai no icontains
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            for sql in comandos:
+                schema_editor.execute(sql)
+    except DatabaseError:
+        pass
+
+
+def criar_indices_busca(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _executar(schema_editor, SQLITE_CRIAR)
+    elif vendor == 'postgresql':
+        _executar(schema_editor, POSTGRES_CRIAR)
+
+
+def remover_indices_busca(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _executar(schema_editor, SQLITE_REMOVER)
+    elif vendor == 'postgresql':
+        _executar(schema_editor, POSTGRES_REMOVER)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0004_indices_agendamento'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indices_busca, remover_indices_busca),
+        migrations.CreateModel(
+            name='ClienteIndiceBusca',
+            fields=[
+                ('cliente', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='indice_busca', serialize=False, to='agendamentos.cliente')),
+                ('indice', agendamentos.models.CampoBuscaTextual(db_column='agendamentos_cliente_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'agendamentos_cliente_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:26
+
+import re
+
+from django.db import migrations, models
+
+# Triggers do FTS5 de 0005_busca_clientes
+TRIGGERS_BUSCA_SQLITE = [
+    """
+    CREATE TRIGGER IF NOT EXISTS agendamentos_cliente_fts_ai AFTER INSERT ON agendamentos_cliente BEGIN
+        INSERT INTO agendamentos_cliente_fts(rowid, nome, email, telefone, cpf)
+        VALUES (new.id, new.nome, new.email, new.telefone, new.cpf);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS agendamentos_cliente_fts_ad AFTER DELETE ON agendamentos_cliente BEGIN
+        INSERT INTO agendamentos_cliente_fts(agendamentos_cliente_fts, rowid, nome, email, telefone, cpf)
+        VALUES ('delete', old.id, old.nome, old.email, old.telefone, old.cpf);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS agendamentos_cliente_fts_au AFTER UPDATE ON agendamentos_cliente BEGIN
+        INSERT INTO agendamentos_cliente_fts(agendamentos_cliente_fts, rowid, nome, email, telefone, cpf)
+        VALUES ('delete', old.id, old.nome, old.email, old.telefone, old.cpf);
+        INSERT INTO agendamentos_cliente_fts(rowid, nome, email, telefone, cpf)
+        VALUES (new.id, new.nome, new.email, new.telefone, new.cpf);
+    END
+    """,
+    "INSERT INTO agendamentos_cliente_fts(agendamentos_cliente_fts) VALUES ('rebuild')",
+]
+
+
+def preencher_digitos(apps, schema_editor):
+    Cliente = apps.get_model('agendamentos', 'Cliente')
+    alterados = []
+    for cliente in Cliente.objects.only('id', 'cpf', 'telefone').iterator(chunk_size=2000):
+        cliente.cpf_digitos = re.sub(r'\D', '', cliente.cpf or '')
+        cliente.telefone_digitos = re.sub(r'\D', '', cliente.telefone or '')
+        alterados.append(cliente)
+        if len(alterados) == 1000:
+            Cliente.objects.bulk_update(alterados, ['cpf_digitos', 'telefone_digitos'])
+            alterados = []
+    Cliente.objects.bulk_update(alterados, ['cpf_digitos', 'telefone_digitos'])
+
+
+def reinstalar_busca(apps, schema_editor):
+    # No SQLite o AddField recria a tabela de clientes e descarta os triggers do FTS5
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    if 'agendamentos_cliente_fts' not in schema_editor.connection.introspection.table_names():
+        return  # SQLite sem FTS5: a busca usa icontains
+    for sql in TRIGGERS_BUSCA_SQLITE:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0005_busca_clientes'),
+    ]
+
+    operations = [
+        # Ao reverter, a remoção dos campos recria a tabela de novo
+        migrations.RunPython(migrations.RunPython.noop, reinstalar_busca),
+        migrations.AddField(
+            model_name='cliente',
+            name='cpf_digitos',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=11, verbose_name='CPF (dígitos)'),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='telefone_digitos',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=15, verbose_name='Telefone (dígitos)'),
+        ),
+        migrations.RunPython(reinstalar_busca, migrations.RunPython.noop),
+        migrations.RunPython(preencher_digitos, migrations.RunPython.noop),
+    ]
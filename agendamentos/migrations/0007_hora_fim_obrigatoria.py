@@ -0,0 +1,38 @@
+from datetime import datetime, time
+
+from django.db import migrations, models
+
+
+def preencher_hora_fim(apps, schema_editor):
+    """hora_fim = hora_inicio + duração do serviço (limitada ao fim do dia)"""
+    Agendamento = apps.get_model('agendamentos', 'Agendamento')
+    pendentes = Agendamento.objects.filter(hora_fim__isnull=True).select_related('servico')
+    alterados = []
+    for agendamento in pendentes.iterator(chunk_size=2000):
+        inicio = datetime.combine(agendamento.data_agendamento, agendamento.hora_inicio)
+        fim = inicio + agendamento.servico.duracao
+        if fim.date() > agendamento.data_agendamento:
+            agendamento.hora_fim = time(23, 59, 59)
+        else:
+            agendamento.hora_fim = fim.time()
+        alterados.append(agendamento)
+        if len(alterados) == 1000:
+            Agendamento.objects.bulk_update(alterados, ['hora_fim'])
+            alterados = []
+    Agendamento.objects.bulk_update(alterados, ['hora_fim'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0006_digitos_cliente'),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_hora_fim, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='agendamento',
+            name='hora_fim',
+            field=models.TimeField(blank=True, verbose_name='Hora de Fim'),
+        ),
+    ]
@@ -0,0 +1,125 @@
+"""
+Garantia, no banco, de que agendamentos ativos do mesmo usuário não se
+sobrepõem.
+
+A validação do AgendamentoForm continua dando a mensagem amigável; esta
+camada cobre a corrida entre duas gravações simultâneas, recusando só a
+transação que perdeu:
+
+- PostgreSQL: restrição de exclusão (btree_gist) sobre
+  tsrange(data + hora_inicio, data + hora_fim) por usuário, parcial nos
+  status ativos. Horários são de parede (sem fuso), daí tsrange.
+- SQLite: triggers BEFORE INSERT/UPDATE. O SQLite tem um único escritor
+  por vez, então a checagem dentro do próprio INSERT/UPDATE já é atômica.
+
+O nome agend_sem_sobreposicao é o RESTRICAO_SOBREPOSICAO de models.py.
+Migrações futuras que recriem a tabela de agendamentos no SQLite devem
+recriar os triggers (o SQL fica copiado na própria migração).
+"""
+
+from django.db import migrations
+
+STATUS_ATIVOS_SQL = "'agendado', 'confirmado', 'em_andamento'"
+
+CONFLITO_SQLITE = f"""
+    SELECT RAISE(ABORT, 'agend_sem_sobreposicao')
+    WHERE EXISTS (
+        SELECT 1 FROM agendamentos_agendamento a
+        WHERE a.criado_por_id = NEW.criado_por_id
+          AND a.data_agendamento = NEW.data_agendamento
+          AND a.status IN ({STATUS_ATIVOS_SQL})
+          AND a.hora_inicio < NEW.hora_fim
+          AND a.hora_fim > NEW.hora_inicio
+          AND a.id IS NOT NEW.id
+    );
+"""
+
+SQLITE_CRIAR = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS agend_sem_sobreposicao_ins
+    BEFORE INSERT ON agendamentos_agendamento
+    WHEN NEW.status IN ({STATUS_ATIVOS_SQL})
+    BEGIN {CONFLITO_SQLITE} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS agend_sem_sobreposicao_upd
+    BEFORE UPDATE OF criado_por_id, data_agendamento, hora_inicio, hora_fim, status
+    ON agendamentos_agendamento
+    WHEN NEW.status IN ({STATUS_ATIVOS_SQL})
+    BEGIN {CONFLITO_SQLITE} END
+    """,
+]
+
+SQLITE_REMOVER = [
+    'DROP TRIGGER IF EXISTS agend_sem_sobreposicao_ins',
+    'DROP TRIGGER IF EXISTS agend_sem_sobreposicao_upd',
+]
+
+POSTGRES_CRIAR = [
+    'CREATE EXTENSION IF NOT EXISTS btree_gist',
+    'ALTER TABLE agendamentos_agendamento DROP CONSTRAINT IF EXISTS agend_sem_sobreposicao',
+    f"""
+    ALTER TABLE agendamentos_agendamento ADD CONSTRAINT agend_sem_sobreposicao
+    EXCLUDE USING gist (
+        criado_por_id WITH =,
+        tsrange(data_agendamento + hora_inicio, data_agendamento + hora_fim, '[)') WITH &&
+    ) WHERE (status IN ({STATUS_ATIVOS_SQL}))
+    """,
+]
+
+POSTGRES_REMOVER = [
+    'ALTER TABLE agendamentos_agendamento DROP CONSTRAINT IF EXISTS agend_sem_sobreposicao',
+]
+
+# Pares de agendamentos ativos já sobrepostos (impedem a criação da restrição)
+SQL_SOBREPOSICOES_EXISTENTES = f"""
+    SELECT a.id, b.id FROM agendamentos_agendamento a
+    JOIN agendamentos_agendamento b
+      ON a.criado_por_id = b.criado_por_id
+     AND a.data_agendamento = b.data_agendamento
+     AND a.id < b.id
+     AND a.hora_inicio < b.hora_fim
+     AND a.hora_fim > b.hora_inicio
+    WHERE a.status IN ({STATUS_ATIVOS_SQL}) AND b.status IN ({STATUS_ATIVOS_SQL})
+"""
+
+
+def _comandos(vendor, criar):
+    if vendor == 'sqlite':
+        return SQLITE_CRIAR if criar else SQLITE_REMOVER
+    if vendor == 'postgresql':
+        return POSTGRES_CRIAR if criar else POSTGRES_REMOVER
+    return []
+
+
+def criar_restricao(apps, schema_editor):
+    """Cria os triggers (SQLite) ou a restrição de exclusão (PostgreSQL)"""
+    comandos = _comandos(schema_editor.connection.vendor, criar=True)
+    if not comandos:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(SQL_SOBREPOSICOES_EXISTENTES)
+        pares = cursor.fetchall()
+    if pares:
+        raise RuntimeError(
+            f'Existem {len(pares)} pares de agendamentos ativos sobrepostos '
+            f'(ex.: ids {pares[0][0]} e {pares[0][1]}). Resolva-os antes de aplicar a migração.'
+        )
+    for sql in comandos:
+        schema_editor.execute(sql)
+
+
+def remover_restricao(apps, schema_editor):
+    for sql in _comandos(schema_editor.connection.vendor, criar=False):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0007_hora_fim_obrigatoria'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_restricao, remover_restricao),
+    ]
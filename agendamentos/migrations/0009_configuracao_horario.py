@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0008_restricao_sobreposicao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConfiguracaoHorario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia_semana', models.IntegerField(choices=[(0, 'Segunda-feira'), (1, 'Terça-feira'), (2, 'Quarta-feira'), (3, 'Quinta-feira'), (4, 'Sexta-feira'), (5, 'Sábado'), (6, 'Domingo')], verbose_name='Dia da Semana')),
+                ('hora_inicio', models.TimeField(verbose_name='Hora de Início')),
+                ('hora_fim', models.TimeField(verbose_name='Hora de Fim')),
+                ('ativo', models.BooleanField(default=True, verbose_name='Ativo')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Configuração de Horário',
+                'verbose_name_plural': 'Configurações de Horários',
+                'ordering': ['dia_semana', 'hora_inicio'],
+                'unique_together': {('usuario', 'dia_semana')},
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0009_configuracao_horario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SerieRecorrente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequencia', models.CharField(choices=[('semanal', 'Semanal'), ('quinzenal', 'Quinzenal'), ('mensal', 'Mensal')], default='semanal', max_length=10, verbose_name='Frequência')),
+                ('data_inicio', models.DateField(verbose_name='Primeira Data')),
+                ('hora_inicio', models.TimeField(verbose_name='Hora de Início')),
+                ('quantidade', models.PositiveIntegerField(blank=True, null=True, verbose_name='Quantidade de Ocorrências')),
+                ('data_fim', models.DateField(blank=True, null=True, verbose_name='Repetir até')),
+                ('valor_cobrado', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Valor Cobrado')),
+                ('observacoes', models.TextField(blank=True, null=True, verbose_name='Observações')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='agendamentos.cliente', verbose_name='Cliente')),
+                ('criado_por', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Criado por')),
+                ('servico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='agendamentos.tiposervico', verbose_name='Serviço')),
+            ],
+            options={
+                'verbose_name': 'Série Recorrente',
+                'verbose_name_plural': 'Séries Recorrentes',
+                'ordering': ['-criado_em'],
+            },
+        ),
+        migrations.AddField(
+            model_name='agendamento',
+            name='serie',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='agendamentos', to='agendamentos.serierecorrente', verbose_name='Série'),
+        ),
+    ]
@@ -0,0 +1,129 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:55
+
+import re
+from datetime import datetime, timezone as dt_timezone
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+# Linhas gravadas pelo AgendamentoStatusForm nas observações:
+# "[dd/mm/aaaa HH:MM] Status alterado para <Status>: <observação>", separadas por linha em branco
+MARCADOR = re.compile(r'\[(\d{2}/\d{2}/\d{4} \d{2}:\d{2})\] Status alterado para (.*)', re.DOTALL)
+SEPARADOR = '\n\n'
+LOTE = 1000
+
+
+def _eventos(texto, rotulos):
+    """
+    (observações sem o histórico, [(criado_em, status, observação)]) de um texto.
+
+    Só saem das observações os blocos que viraram evento; texto livre
+    (inclusive o escrito depois de uma linha de status) e linhas com um
+    status desconhecido continuam lá, na ordem original.
+    """
+    restante, eventos = [], []
+    for bloco in texto.split(SEPARADOR):
+        marcador = MARCADOR.fullmatch(bloco)
+        evento = None
+        if marcador:
+            trecho = marcador.group(2)
+            for rotulo, status in rotulos:
+                if trecho == rotulo or trecho.startswith(f'{rotulo}:'):
+                    # O form gravava o horário com timezone.now(), em UTC
+                    criado_em = datetime.strptime(marcador.group(1), '%d/%m/%Y %H:%M').replace(tzinfo=dt_timezone.utc)
+                    evento = (criado_em, status, trecho[len(rotulo) + 1:].strip())
+                    break
+        if evento:
+            eventos.append(evento)
+        else:
+            restante.append(bloco)
+    return SEPARADOR.join(restante).strip(), eventos
+
+
+def migrar_historico(apps, schema_editor):
+    Agendamento = apps.get_model('agendamentos', 'Agendamento')
+    Historico = apps.get_model('agendamentos', 'AgendamentoStatusHistorico')
+    # Rótulos mais longos primeiro ("Em Andamento" antes de um eventual prefixo)
+    rotulos = sorted(
+        ((str(rotulo), valor) for valor, rotulo in Agendamento._meta.get_field('status').choices),
+        key=lambda item: -len(item[0]),
+    )
+
+    alterados, eventos = [], []
+    candidatos = Agendamento.objects.filter(observacoes__contains='] Status alterado para ').only(
+        'id', 'observacoes', 'criado_por_id'
+    )
+    for agendamento in candidatos.iterator(chunk_size=LOTE):
+        restante, encontrados = _eventos(agendamento.observacoes, rotulos)
+        if not encontrados:
+            continue
+        anterior = ''
+        for criado_em, status, observacao in encontrados:
+            eventos.append(Historico(
+                agendamento_id=agendamento.pk, status_anterior=anterior, status_novo=status,
+                observacao=observacao, criado_em=criado_em, criado_por_id=agendamento.criado_por_id,
+            ))
+            anterior = status
+        agendamento.observacoes = restante or None
+        alterados.append(agendamento)
+
+        if len(alterados) >= LOTE:
+            Historico.objects.bulk_create(eventos, batch_size=LOTE)
+            Agendamento.objects.bulk_update(alterados, ['observacoes'], batch_size=LOTE)
+            alterados, eventos = [], []
+    Historico.objects.bulk_create(eventos, batch_size=LOTE)
+    Agendamento.objects.bulk_update(alterados, ['observacoes'], batch_size=LOTE)
+
+
+def restaurar_observacoes(apps, schema_editor):
+    """Reescreve o histórico como linhas nas observações (reversão)"""
+    Agendamento = apps.get_model('agendamentos', 'Agendamento')
+    Historico = apps.get_model('agendamentos', 'AgendamentoStatusHistorico')
+    rotulos = dict(Agendamento._meta.get_field('status').choices)
+
+    linhas = {}
+    for agendamento_id, status, observacao, criado_em in Historico.objects.order_by(
+        'agendamento_id', 'criado_em', 'id'
+    ).values_list('agendamento_id', 'status_novo', 'observacao', 'criado_em').iterator(chunk_size=LOTE):
+        linha = f"[{criado_em.astimezone(dt_timezone.utc):%d/%m/%Y %H:%M}] Status alterado para {rotulos[status]}"
+        linhas.setdefault(agendamento_id, []).append(f'{linha}: {observacao}' if observacao else linha)
+
+    ids = list(linhas)
+    for inicio in range(0, len(ids), LOTE):
+        agendamentos = list(Agendamento.objects.filter(pk__in=ids[inicio:inicio + LOTE]).only('id', 'observacoes'))
+        for agendamento in agendamentos:
+            partes = ([agendamento.observacoes] if agendamento.observacoes else []) + linhas[agendamento.pk]
+            agendamento.observacoes = '\n\n'.join(partes)
+        Agendamento.objects.bulk_update(agendamentos, ['observacoes'], batch_size=LOTE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0010_serie_recorrente'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgendamentoStatusHistorico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status_anterior', models.CharField(blank=True, choices=[('agendado', 'Agendado'), ('confirmado', 'Confirmado'), ('em_andamento', 'Em Andamento'), ('concluido', 'Concluído'), ('cancelado', 'Cancelado'), ('nao_compareceu', 'Não Compareceu')], max_length=20, verbose_name='Status Anterior')),
+                ('status_novo', models.CharField(choices=[('agendado', 'Agendado'), ('confirmado', 'Confirmado'), ('em_andamento', 'Em Andamento'), ('concluido', 'Concluído'), ('cancelado', 'Cancelado'), ('nao_compareceu', 'Não Compareceu')], max_length=20, verbose_name='Novo Status')),
+                ('observacao', models.TextField(blank=True, verbose_name='Observação')),
+                ('criado_em', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Criado em')),
+                ('agendamento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historico_status', to='agendamentos.agendamento', verbose_name='Agendamento')),
+                ('criado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Criado por')),
+            ],
+            options={
+                'verbose_name': 'Histórico de Status',
+                'verbose_name_plural': 'Históricos de Status',
+                'ordering': ['-criado_em', '-id'],
+                'indexes': [models.Index(fields=['agendamento', 'criado_em'], name='agend_hist_agend_data_idx')],
+            },
+        ),
+        migrations.RunPython(migrar_historico, restaurar_observacoes),
+    ]
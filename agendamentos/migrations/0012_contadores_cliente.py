@@ -0,0 +1,122 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:59
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import Coalesce
+
+LOTE = 1000
+
+# Triggers do FTS5 de 0005_busca_clientes (o de UPDATE restrito às colunas indexadas)
+TRIGGERS_BUSCA_SQLITE = [
+    """
+    CREATE TRIGGER IF NOT EXISTS agendamentos_cliente_fts_ai AFTER INSERT ON agendamentos_cliente BEGIN
+        INSERT INTO agendamentos_cliente_fts(rowid, nome, email, telefone, cpf)
+        VALUES (new.id, new.nome, new.email, new.telefone, new.cpf);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS agendamentos_cliente_fts_ad AFTER DELETE ON agendamentos_cliente BEGIN
+        INSERT INTO agendamentos_cliente_fts(agendamentos_cliente_fts, rowid, nome, email, telefone, cpf)
+        VALUES ('delete', old.id, old.nome, old.email, old.telefone, old.cpf);
+    END
+    """,
+    # Só as colunas indexadas: os contadores são atualizados a cada escrita em agendamentos
+    'DROP TRIGGER IF EXISTS agendamentos_cliente_fts_au',
+    """
+    CREATE TRIGGER agendamentos_cliente_fts_au AFTER UPDATE OF nome, email, telefone, cpf
+    ON agendamentos_cliente BEGIN
+        INSERT INTO agendamentos_cliente_fts(agendamentos_cliente_fts, rowid, nome, email, telefone, cpf)
+        VALUES ('delete', old.id, old.nome, old.email, old.telefone, old.cpf);
+        INSERT INTO agendamentos_cliente_fts(rowid, nome, email, telefone, cpf)
+        VALUES (new.id, new.nome, new.email, new.telefone, new.cpf);
+    END
+    """,
+    "INSERT INTO agendamentos_cliente_fts(agendamentos_cliente_fts) VALUES ('rebuild')",
+]
+
+
+def preencher_contadores(apps, schema_editor):
+    Agendamento = apps.get_model('agendamentos', 'Agendamento')
+    Cliente = apps.get_model('agendamentos', 'Cliente')
+    concluido = Q(status='concluido')
+    totais = {
+        linha.pop('cliente_id'): linha
+        for linha in Agendamento.objects.order_by().values('cliente_id').annotate(
+            total_agendamentos=Count('id'),
+            total_visitas=Count('id', filter=concluido),
+            total_faltas=Count('id', filter=Q(status='nao_compareceu')),
+            faturamento_total=Sum(Coalesce('valor_cobrado', 'servico__preco'), filter=concluido),
+            ultima_visita=Max('data_agendamento', filter=concluido),
+        )
+    }
+
+    alterados = []
+    for cliente_id, linha in totais.items():
+        linha['faturamento_total'] = linha['faturamento_total'] or Decimal('0')
+        alterados.append(Cliente(pk=cliente_id, **linha))
+    Cliente.objects.bulk_update(
+        alterados,
+        ['total_agendamentos', 'total_visitas', 'total_faltas', 'faturamento_total', 'ultima_visita'],
+        batch_size=LOTE,
+    )
+
+
+def reinstalar_busca(apps, schema_editor):
+    # No SQLite o AddField recria a tabela de clientes e descarta os triggers do FTS5
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    if 'agendamentos_cliente_fts' not in schema_editor.connection.introspection.table_names():
+        return  # SQLite sem FTS5: a busca usa icontains
+    for sql in TRIGGERS_BUSCA_SQLITE:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0011_historico_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Ao reverter, a remoção dos campos recria a tabela de novo
+        migrations.RunPython(migrations.RunPython.noop, reinstalar_busca),
+        migrations.AddField(
+            model_name='cliente',
+            name='faturamento_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Faturamento Total'),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='total_agendamentos',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Agendamentos'),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='total_faltas',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Faltas'),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='total_visitas',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Visitas'),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='ultima_visita',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Última Visita'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['criado_por', 'total_visitas'], name='cliente_usuario_visitas_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['criado_por', 'faturamento_total'], name='cliente_usuario_fatur_idx'),
+        ),
+        migrations.RunPython(reinstalar_busca, migrations.RunPython.noop),
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+    ]
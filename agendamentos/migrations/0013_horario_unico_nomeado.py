@@ -0,0 +1,66 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Triggers de 0008_restricao_sobreposicao
+STATUS_ATIVOS_SQL = "'agendado', 'confirmado', 'em_andamento'"
+
+CONFLITO_SQLITE = f"""
+    SELECT RAISE(ABORT, 'agend_sem_sobreposicao')
+    WHERE EXISTS (
+        SELECT 1 FROM agendamentos_agendamento a
+        WHERE a.criado_por_id = NEW.criado_por_id
+          AND a.data_agendamento = NEW.data_agendamento
+          AND a.status IN ({STATUS_ATIVOS_SQL})
+          AND a.hora_inicio < NEW.hora_fim
+          AND a.hora_fim > NEW.hora_inicio
+          AND a.id IS NOT NEW.id
+    );
+"""
+
+TRIGGERS_SOBREPOSICAO_SQLITE = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS agend_sem_sobreposicao_ins
+    BEFORE INSERT ON agendamentos_agendamento
+    WHEN NEW.status IN ({STATUS_ATIVOS_SQL})
+    BEGIN {CONFLITO_SQLITE} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS agend_sem_sobreposicao_upd
+    BEFORE UPDATE OF criado_por_id, data_agendamento, hora_inicio, hora_fim, status
+    ON agendamentos_agendamento
+    WHEN NEW.status IN ({STATUS_ATIVOS_SQL})
+    BEGIN {CONFLITO_SQLITE} END
+    """,
+]
+
+
+def reinstalar_sobreposicao(apps, schema_editor):
+    # No SQLite trocar a unicidade recria a tabela de agendamentos e descarta os triggers
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in TRIGGERS_SOBREPOSICAO_SQLITE:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0012_contadores_cliente'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Ao reverter, as operações abaixo recriam a tabela de novo
+        migrations.RunPython(migrations.RunPython.noop, reinstalar_sobreposicao),
+        migrations.AlterUniqueTogether(
+            name='agendamento',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='agendamento',
+            constraint=models.UniqueConstraint(fields=('data_agendamento', 'hora_inicio', 'criado_por'), name='agend_horario_unico'),
+        ),
+        migrations.RunPython(reinstalar_sobreposicao, migrations.RunPython.noop),
+    ]
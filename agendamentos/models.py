@@ -1,9 +1,16 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import RegexValidator
 from django.utils import timezone
 from datetime import datetime, timedelta
 from django.core.exceptions import ValidationError
+import re
+
+
+def somente_digitos(valor):
+    """Remove a máscara (pontos, traços, parênteses, espaços) deixando só os dígitos"""
+    return re.sub(r'\D', '', valor or '')
+
 
 class Cliente(models.Model):
     """Model para armazenar dados dos clientes"""
@@ -28,10 +35,28 @@ class Cliente(models.Model):
         unique=True, 
         verbose_name="CPF"
     )
+    # Cópias sem máscara, preenchidas no save(), para busca por prefixo indexada
+    cpf_digitos = models.CharField(
+        max_length=11, blank=True, default='', editable=False, db_index=True,
+        verbose_name="CPF (dígitos)"
+    )
+    telefone_digitos = models.CharField(
+        max_length=15, blank=True, default='', editable=False, db_index=True,
+        verbose_name="Telefone (dígitos)"
+    )
     data_nascimento = models.DateField(verbose_name="Data de Nascimento")
     endereco = models.TextField(blank=True, null=True, verbose_name="Endereço")
     observacoes = models.TextField(blank=True, null=True, verbose_name="Observações")
     ativo = models.BooleanField(default=True, verbose_name="Ativo")
+    # Contadores desnormalizados, recalculados a cada escrita nos agendamentos do cliente
+    # (services.estatisticas_cliente.atualizar_contadores), para ordenar a listagem sem JOIN
+    total_agendamentos = models.PositiveIntegerField(default=0, editable=False, verbose_name="Agendamentos")
+    total_visitas = models.PositiveIntegerField(default=0, editable=False, verbose_name="Visitas")
+    total_faltas = models.PositiveIntegerField(default=0, editable=False, verbose_name="Faltas")
+    faturamento_total = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, editable=False, verbose_name="Faturamento Total"
+    )
+    ultima_visita = models.DateField(blank=True, null=True, editable=False, verbose_name="Última Visita")
     criado_em = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
     atualizado_em = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
     criado_por = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Criado por")
@@ -40,10 +65,27 @@ class Cliente(models.Model):
         verbose_name = "Cliente"
         verbose_name_plural = "Clientes"
         ordering = ['nome']
+        indexes = [
+            models.Index(fields=['criado_por', 'total_visitas'], name='cliente_usuario_visitas_idx'),
+            models.Index(fields=['criado_por', 'faturamento_total'], name='cliente_usuario_fatur_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nome} - {self.telefone}"
 
+    def save(self, *args, **kwargs):
+        self.cpf_digitos = somente_digitos(self.cpf)
+        self.telefone_digitos = somente_digitos(self.telefone)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            campos = set(update_fields)
+            if 'cpf' in campos:
+                campos.add('cpf_digitos')
+            if 'telefone' in campos:
+                campos.add('telefone_digitos')
+            kwargs['update_fields'] = campos
+        super().save(*args, **kwargs)
+
     @property
     def idade(self):
         """Calcula a idade do cliente"""
@@ -53,6 +95,42 @@ class Cliente(models.Model):
         )
 
 
+class CampoBuscaTextual(models.TextField):
+    """Coluna oculta do FTS5 com o nome da própria tabela, alvo do MATCH"""
+
+
+@CampoBuscaTextual.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+class ClienteIndiceBusca(models.Model):
+    """
+    Tabela FTS5 de busca de clientes (somente SQLite, criada na migração 0005).
+
+    Somente leitura: os triggers do banco a mantêm em sincronia com Cliente.
+    """
+    cliente = models.OneToOneField(
+        Cliente,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        related_name='indice_busca',
+    )
+    indice = CampoBuscaTextual(db_column='agendamentos_cliente_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'agendamentos_cliente_fts'
+
+
 class TipoServico(models.Model):
     """Model para tipos de serviços oferecidos"""
     nome = models.CharField(max_length=100, verbose_name="Nome do Serviço")
@@ -80,6 +158,76 @@ class TipoServico(models.Model):
         return f"{hours}h{minutes:02d}min"
 
 
+class ConfiguracaoHorario(models.Model):
+    """Horário de funcionamento do usuário em cada dia da semana"""
+    DIAS_SEMANA = [
+        (0, 'Segunda-feira'),
+        (1, 'Terça-feira'),
+        (2, 'Quarta-feira'),
+        (3, 'Quinta-feira'),
+        (4, 'Sexta-feira'),
+        (5, 'Sábado'),
+        (6, 'Domingo'),
+    ]
+
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Usuário")
+    dia_semana = models.IntegerField(choices=DIAS_SEMANA, verbose_name="Dia da Semana")
+    hora_inicio = models.TimeField(verbose_name="Hora de Início")
+    hora_fim = models.TimeField(verbose_name="Hora de Fim")
+    ativo = models.BooleanField(default=True, verbose_name="Ativo")
+
+    class Meta:
+        verbose_name = "Configuração de Horário"
+        verbose_name_plural = "Configurações de Horários"
+        ordering = ['dia_semana', 'hora_inicio']
+        unique_together = ['usuario', 'dia_semana']
+
+    def __str__(self):
+        return f"{self.get_dia_semana_display()}: {self.hora_inicio:%H:%M} - {self.hora_fim:%H:%M}"
+
+    def clean(self):
+        if self.hora_inicio and self.hora_fim and self.hora_fim <= self.hora_inicio:
+            raise ValidationError({'hora_fim': "Hora de fim deve ser maior que hora de início."})
+
+
+class SerieRecorrente(models.Model):
+    """Série de agendamentos que se repetem (semanal, quinzenal ou mensal)"""
+    FREQUENCIAS = [
+        ('semanal', 'Semanal'),
+        ('quinzenal', 'Quinzenal'),
+        ('mensal', 'Mensal'),
+    ]
+
+    # Maior número de ocorrências aceito em uma série (dois anos de agendamentos semanais)
+    LIMITE_OCORRENCIAS = 104
+
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, verbose_name="Cliente")
+    servico = models.ForeignKey(TipoServico, on_delete=models.CASCADE, verbose_name="Serviço")
+    frequencia = models.CharField(max_length=10, choices=FREQUENCIAS, default='semanal', verbose_name="Frequência")
+    data_inicio = models.DateField(verbose_name="Primeira Data")
+    hora_inicio = models.TimeField(verbose_name="Hora de Início")
+    quantidade = models.PositiveIntegerField(blank=True, null=True, verbose_name="Quantidade de Ocorrências")
+    data_fim = models.DateField(blank=True, null=True, verbose_name="Repetir até")
+    valor_cobrado = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        blank=True,
+        null=True,
+        verbose_name="Valor Cobrado"
+    )
+    observacoes = models.TextField(blank=True, null=True, verbose_name="Observações")
+    criado_em = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
+    criado_por = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Criado por")
+
+    class Meta:
+        verbose_name = "Série Recorrente"
+        verbose_name_plural = "Séries Recorrentes"
+        ordering = ['-criado_em']
+
+    def __str__(self):
+        return f"{self.cliente.nome} - {self.get_frequencia_display()} desde {self.data_inicio:%d/%m/%Y}"
+
+
 class StatusAgendamento(models.TextChoices):
     """Choices para status do agendamento"""
     AGENDADO = 'agendado', 'Agendado'
@@ -90,13 +238,104 @@ class StatusAgendamento(models.TextChoices):
     NAO_COMPARECEU = 'nao_compareceu', 'Não Compareceu'
 
 
+# Status que ocupam a agenda (usados na verificação de conflitos)
+STATUS_ATIVOS = [
+    StatusAgendamento.AGENDADO,
+    StatusAgendamento.CONFIRMADO,
+    StatusAgendamento.EM_ANDAMENTO,
+]
+
+# Regras de pode_editar()/pode_cancelar(), também usadas nas alterações em lote
+STATUS_EDITAVEIS = [StatusAgendamento.AGENDADO, StatusAgendamento.CONFIRMADO]
+STATUS_FINALIZADOS = [StatusAgendamento.CONCLUIDO, StatusAgendamento.CANCELADO]
+
+# Restrição/trigger do banco contra sobreposição de agendamentos ativos (migração 0008)
+RESTRICAO_SOBREPOSICAO = 'agend_sem_sobreposicao'
+# Um único agendamento por (data, hora de início, usuário)
+RESTRICAO_HORARIO_UNICO = 'agend_horario_unico'
+
+
+def restricao_violada(erro, modelo):
+    """
+    Nome da restrição violada por um IntegrityError, ou None.
+
+    O PostgreSQL informa o nome (diag.constraint_name); os triggers do
+    SQLite o usam como mensagem. Já o SQLite não nomeia violações de
+    UNIQUE, só as colunas, então as UniqueConstraint do modelo são
+    reconhecidas pelas suas colunas.
+    """
+    nome = getattr(getattr(erro.__cause__, 'diag', None), 'constraint_name', None)
+    if nome:
+        return nome
+    mensagem = str(erro)
+    if RESTRICAO_SOBREPOSICAO in mensagem:
+        return RESTRICAO_SOBREPOSICAO
+    tabela = modelo._meta.db_table
+    for restricao in modelo._meta.constraints:
+        if isinstance(restricao, models.UniqueConstraint) and restricao.fields:
+            colunas = ', '.join(f'{tabela}.{modelo._meta.get_field(campo).column}' for campo in restricao.fields)
+            if mensagem == f'UNIQUE constraint failed: {colunas}':
+                return restricao.name
+    return None
+
+
+class AgendamentoQuerySet(models.QuerySet):
+    """Consultas reutilizadas pelas views de agendamentos"""
+
+    # Colunas lidas pelos templates de listagem (lista, dashboard, histórico do cliente)
+    CAMPOS_EXIBICAO = (
+        'id', 'data_agendamento', 'hora_inicio', 'hora_fim', 'status', 'valor_cobrado', 'observacoes',
+        'cliente__id', 'cliente__nome', 'cliente__telefone',
+        'servico__id', 'servico__nome', 'servico__duracao', 'servico__preco',
+    )
+
+    def para_exibicao(self):
+        """Carrega cliente e serviço no mesmo SELECT, apenas com as colunas exibidas"""
+        return self.select_related('cliente', 'servico').only(*self.CAMPOS_EXIBICAO)
+
+    def ativos(self):
+        """Agendamentos que ocupam a agenda"""
+        return self.filter(status__in=STATUS_ATIVOS)
+
+    def podem_mudar_para(self, status):
+        """
+        Agendamentos que aceitam passar para `status`: encerrar (concluir,
+        cancelar, não compareceu) segue pode_cancelar(); os demais status
+        seguem pode_editar(). Quem já está no status fica de fora.
+        """
+        if status in (StatusAgendamento.CONCLUIDO, StatusAgendamento.CANCELADO, StatusAgendamento.NAO_COMPARECEU):
+            queryset = self.exclude(status__in=STATUS_FINALIZADOS)
+        else:
+            queryset = self.filter(status__in=STATUS_EDITAVEIS)
+        return queryset.exclude(status=status)
+
+    def conflitantes(self, usuario, data, hora_inicio, hora_fim, excluir_pk=None):
+        """Agendamentos ativos do usuário que se sobrepõem ao intervalo [hora_inicio, hora_fim)"""
+        queryset = self.ativos().filter(
+            criado_por=usuario,
+            data_agendamento=data,
+            hora_inicio__lt=hora_fim,
+            hora_fim__gt=hora_inicio,
+        )
+        if excluir_pk:
+            queryset = queryset.exclude(pk=excluir_pk)
+        return queryset
+
+    def primeiro_conflito(self, usuario, data, hora_inicio, hora_fim, excluir_pk=None):
+        """(hora_inicio, hora_fim, nome do cliente) do primeiro conflito, ou None"""
+        return self.conflitantes(usuario, data, hora_inicio, hora_fim, excluir_pk).order_by(
+            'hora_inicio'
+        ).values_list('hora_inicio', 'hora_fim', 'cliente__nome').first()
+
+
 class Agendamento(models.Model):
     """Model principal para agendamentos"""
     cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, verbose_name="Cliente")
     servico = models.ForeignKey(TipoServico, on_delete=models.CASCADE, verbose_name="Serviço")
     data_agendamento = models.DateField(verbose_name="Data do Agendamento")
     hora_inicio = models.TimeField(verbose_name="Hora de Início")
-    hora_fim = models.TimeField(verbose_name="Hora de Fim", blank=True, null=True)  # Permitir null
+    # Calculada no save() a partir da duração do serviço; nunca nula no banco
+    hora_fim = models.TimeField(verbose_name="Hora de Fim", blank=True)
     status = models.CharField(
         max_length=20,
         choices=StatusAgendamento.choices,
@@ -114,12 +353,40 @@ class Agendamento(models.Model):
     criado_em = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
     atualizado_em = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
     criado_por = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Criado por")
+    serie = models.ForeignKey(
+        SerieRecorrente,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='agendamentos',
+        verbose_name="Série"
+    )
+
+    objects = AgendamentoQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Agendamento"
         verbose_name_plural = "Agendamentos"
         ordering = ['data_agendamento', 'hora_inicio']
-        unique_together = ['data_agendamento', 'hora_inicio', 'criado_por']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['data_agendamento', 'hora_inicio', 'criado_por'], name=RESTRICAO_HORARIO_UNICO
+            ),
+        ]
+        indexes = [
+            # Listagem, dashboard e relatórios: sempre por usuário, filtrando/ordenando por data
+            models.Index(fields=['criado_por', 'data_agendamento', 'hora_inicio'], name='agend_usuario_data_idx'),
+            # Filtros por status (pendentes, concluídos no período)
+            models.Index(fields=['criado_por', 'status', 'data_agendamento'], name='agend_usuario_status_idx'),
+            # Verificação de conflito: apenas agendamentos ativos do dia
+            models.Index(
+                fields=['criado_por', 'data_agendamento', 'hora_inicio', 'hora_fim'],
+                name='agend_ativos_idx',
+                condition=models.Q(status__in=STATUS_ATIVOS),
+            ),
+            # Histórico e estatísticas do cliente
+            models.Index(fields=['cliente', 'status'], name='agend_cliente_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.cliente.nome} - {self.data_agendamento} {self.hora_inicio}"
@@ -140,21 +407,44 @@ class Agendamento(models.Model):
         if errors:
             raise ValidationError(errors)
 
-    def save(self, *args, **kwargs):
-        # Auto-calcular hora_fim baseada na duração do serviço (se não estiver definida)
+    def preencher_calculados(self):
+        """Preenche hora_fim (pela duração do serviço) e valor_cobrado (pelo preço), se vazios"""
         if not self.hora_fim and self.servico and self.hora_inicio:
             inicio_datetime = datetime.combine(self.data_agendamento, self.hora_inicio)
             fim_datetime = inicio_datetime + self.servico.duracao
             self.hora_fim = fim_datetime.time()
         
-        # Auto-definir valor_cobrado se não informado
         if not self.valor_cobrado and self.servico:
             self.valor_cobrado = self.servico.preco
+
+    def save(self, *args, validar=True, **kwargs):
+        """
+        Salva o agendamento. Com validar=False o full_clean() é pulado: use
+        apenas quando os dados já foram validados (ex.: AgendamentoForm).
+        """
+        self.preencher_calculados()
         
         # Executar validações antes de salvar
-        self.full_clean()
+        if validar:
+            self.full_clean()
         
-        super().save(*args, **kwargs)
+        # O banco recusa a sobreposição que escapou da validação (gravações simultâneas);
+        # o savepoint mantém a transação externa utilizável
+        try:
+            with transaction.atomic(using=kwargs.get('using')):
+                super().save(*args, **kwargs)
+        except IntegrityError as erro:
+            restricao = restricao_violada(erro, Agendamento)
+            if restricao == RESTRICAO_SOBREPOSICAO:
+                raise ValidationError({
+                    'hora_inicio': "Conflito de horário: outro agendamento ativo acabou de ocupar este intervalo."
+                })
+            # Unicidade que o full_clean() checaria com um SELECT
+            if restricao == RESTRICAO_HORARIO_UNICO:
+                raise ValidationError({
+                    'hora_inicio': "Já existe um agendamento neste dia e horário."
+                })
+            raise
 
     @property
     def duracao_total(self):
@@ -181,8 +471,64 @@ class Agendamento(models.Model):
 
     def pode_editar(self):
         """Verifica se o agendamento pode ser editado"""
-        return self.status in ['agendado', 'confirmado']
+        return self.status in STATUS_EDITAVEIS
 
     def pode_cancelar(self):
         """Verifica se o agendamento pode ser cancelado"""
-        return self.status not in ['concluido', 'cancelado']
\ No newline at end of file
+        return self.status not in STATUS_FINALIZADOS
+
+class AgendamentoStatusHistorico(models.Model):
+    """Mudança de status de um agendamento (somente inserção; uma linha por transição)"""
+    agendamento = models.ForeignKey(
+        Agendamento,
+        on_delete=models.CASCADE,
+        related_name='historico_status',
+        verbose_name="Agendamento"
+    )
+    # Vazio quando desconhecido (eventos migrados do texto das observações)
+    status_anterior = models.CharField(
+        max_length=20, choices=StatusAgendamento.choices, blank=True, verbose_name="Status Anterior"
+    )
+    status_novo = models.CharField(max_length=20, choices=StatusAgendamento.choices, verbose_name="Novo Status")
+    observacao = models.TextField(blank=True, verbose_name="Observação")
+    # Sem auto_now_add: a migração grava a data original dos eventos antigos
+    criado_em = models.DateTimeField(default=timezone.now, verbose_name="Criado em")
+    criado_por = models.ForeignKey(
+        User, on_delete=models.SET_NULL, blank=True, null=True, verbose_name="Criado por"
+    )
+
+    class Meta:
+        verbose_name = "Histórico de Status"
+        verbose_name_plural = "Históricos de Status"
+        ordering = ['-criado_em', '-id']
+        indexes = [
+            models.Index(fields=['agendamento', 'criado_em'], name='agend_hist_agend_data_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.agendamento_id}: {self.status_anterior or '?'} -> {self.status_novo}"
+
+
+class ResumoDiarioAgendamento(models.Model):
+    """Resumo diário de agendamentos por usuário, status e serviço (mantido via signals)"""
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Usuário")
+    data = models.DateField(verbose_name="Data")
+    status = models.CharField(max_length=20, choices=StatusAgendamento.choices, verbose_name="Status")
+    servico = models.ForeignKey(TipoServico, on_delete=models.CASCADE, verbose_name="Serviço")
+    quantidade = models.PositiveIntegerField(default=0, verbose_name="Quantidade")
+    minutos = models.PositiveIntegerField(default=0, verbose_name="Minutos Agendados")
+    faturamento = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        verbose_name="Faturamento"
+    )
+
+    class Meta:
+        verbose_name = "Resumo Diário de Agendamentos"
+        verbose_name_plural = "Resumos Diários de Agendamentos"
+        ordering = ['data']
+        unique_together = ['usuario', 'data', 'status', 'servico']
+
+    def __str__(self):
+        return f"{self.usuario} - {self.data} {self.status}: {self.quantidade}"
@@ -0,0 +1,207 @@
+"""
+Paginação por cursor (keyset) para as listagens.
+
+Em vez de OFFSET, cada página filtra a partir da chave de ordenação do
+último (ou primeiro) registro da página anterior e não executa COUNT,
+então a página N custa o mesmo que a página 1. Ativada com
+`?paginacao=cursor`; os tokens de próxima/anterior são opacos e
+assinados.
+
+Na paginação por página, ContagemPaginacaoMixin fornece ao paginator um
+total já conhecido (cache ou estimativa) e expõe o mesmo número ao
+template, evitando um segundo COUNT.
+"""
+
+from decimal import Decimal
+
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .services.contagem import contar_lista
+
+SALT_CURSOR = 'agendamentos.paginacao.cursor'
+DIRECOES_CURSOR = ('proxima', 'anterior')
+
+
+def codificar_cursor(valores, direcao, salt=SALT_CURSOR):
+    """Token opaco com os valores da chave e a direção ('proxima' ou 'anterior')"""
+    return signing.dumps({'v': valores, 'd': direcao}, salt=salt, compress=True)
+
+
+def decodificar_cursor(token, salt=SALT_CURSOR):
+    """Retorna (valores, direcao) ou (None, None) para tokens ausentes/inválidos"""
+    if not token:
+        return None, None
+    try:
+        dados = signing.loads(token, salt=salt)
+        valores, direcao = dados['v'], dados['d']
+    except (signing.BadSignature, KeyError, TypeError):
+        return None, None
+    if not isinstance(valores, list) or direcao not in DIRECOES_CURSOR:
+        return None, None
+    return valores, direcao
+
+
+class PaginacaoCursorMixin:
+    """
+    Mixin para ListView com paginação por cursor opcional.
+
+    `ordenacao_cursor` lista os campos da chave (prefixo '-' para
+    decrescente); o último deve ser único (ex.: 'id'). O salt do token
+    inclui o modelo e a ordenação: um token de outra listagem (ou de
+    outra ordenação) é tratado como inválido e volta à primeira página.
+    """
+    ordenacao_cursor = ('id',)
+    parametro_cursor = 'cursor'
+
+    def usa_paginacao_cursor(self):
+        return self.request.GET.get('paginacao') == 'cursor'
+
+    def _campos_cursor(self):
+        return [(campo.lstrip('-'), campo.startswith('-')) for campo in self.ordenacao_cursor]
+
+    def salt_cursor(self):
+        return f"{SALT_CURSOR}:{self.model._meta.label_lower}:{','.join(self.ordenacao_cursor)}"
+
+    def _converter_valores(self, queryset, valores):
+        """Valores do token no tipo de cada campo da chave; None se não corresponderem"""
+        campos = self._campos_cursor()
+        if len(valores) != len(campos):
+            return None
+        convertidos = []
+        for (campo, _), valor in zip(campos, valores):
+            anotacao = queryset.query.annotations.get(campo)
+            field = anotacao.output_field if anotacao is not None else queryset.model._meta.get_field(campo)
+            try:
+                convertidos.append(field.to_python(valor))
+            except (ValidationError, TypeError, ValueError):
+                return None
+            if convertidos[-1] is None:
+                return None
+        return convertidos
+
+    def _filtro_apos(self, valores, para_tras):
+        """Q que seleciona os registros depois (ou antes) da chave informada"""
+        campos = self._campos_cursor()
+        filtro = Q()
+        for i, (campo, decrescente) in enumerate(campos):
+            # Em ordem decrescente "depois" significa menor; voltar inverte a comparação
+            operador = 'lt' if decrescente != para_tras else 'gt'
+            condicao = Q(**{f'{campo}__{operador}': valores[i]})
+            for j in range(i):
+                condicao &= Q(**{campos[j][0]: valores[j]})
+            filtro |= condicao
+        return filtro
+
+    def _valores_chave(self, obj):
+        # Datas e Decimal vão como texto no token (JSON); _converter_valores os restaura
+        return [
+            valor.isoformat() if hasattr(valor, 'isoformat') else str(valor) if isinstance(valor, Decimal) else valor
+            for valor in (getattr(obj, campo) for campo, _ in self._campos_cursor())
+        ]
+
+    def _url_cursor(self, token):
+        parametros = self.request.GET.copy()
+        parametros.pop('page', None)
+        parametros['paginacao'] = 'cursor'
+        parametros[self.parametro_cursor] = token
+        return f'?{parametros.urlencode()}'
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.usa_paginacao_cursor():
+            return super().paginate_queryset(queryset, page_size)
+
+        salt = self.salt_cursor()
+        valores, direcao = decodificar_cursor(self.request.GET.get(self.parametro_cursor), salt=salt)
+        if valores is not None:
+            valores = self._converter_valores(queryset, valores)
+        para_tras = valores is not None and direcao == 'anterior'
+
+        ordenacao = list(self.ordenacao_cursor)
+        if para_tras:
+            ordenacao = [campo[1:] if campo.startswith('-') else f'-{campo}' for campo in ordenacao]
+
+        queryset = queryset.order_by(*ordenacao)
+        if valores:
+            queryset = queryset.filter(self._filtro_apos(valores, para_tras))
+
+        # Um registro a mais indica se existe outra página na mesma direção
+        registros = list(queryset[:page_size + 1])
+        tem_mais = len(registros) > page_size
+        registros = registros[:page_size]
+        if para_tras:
+            registros.reverse()
+
+        tem_proxima = tem_mais if not para_tras else valores is not None
+        tem_anterior = tem_mais if para_tras else valores is not None
+
+        self.cursor_proximo_url = None
+        self.cursor_anterior_url = None
+        if registros and tem_proxima:
+            self.cursor_proximo_url = self._url_cursor(
+                codificar_cursor(self._valores_chave(registros[-1]), 'proxima', salt=salt)
+            )
+        if registros and tem_anterior:
+            self.cursor_anterior_url = self._url_cursor(
+                codificar_cursor(self._valores_chave(registros[0]), 'anterior', salt=salt)
+            )
+
+        return (None, None, registros, False)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['paginacao_cursor'] = self.usa_paginacao_cursor()
+        if context['paginacao_cursor']:
+            context['cursor_proximo_url'] = getattr(self, 'cursor_proximo_url', None)
+            context['cursor_anterior_url'] = getattr(self, 'cursor_anterior_url', None)
+        return context
+
+
+class PaginadorContagem(Paginator):
+    """Paginator que aceita um total conhecido de antemão (exato ou aproximado)"""
+
+    def __init__(self, *args, contagem=None, aproximada=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._contagem = contagem
+        self.aproximada = aproximada
+
+    @cached_property
+    def count(self):
+        if self._contagem is not None:
+            return self._contagem
+        return super().count
+
+
+class ContagemPaginacaoMixin:
+    """
+    Mixin para ListView: total da listagem com uma única contagem por request.
+
+    `parametros_filtro` lista os parâmetros GET que restringem a listagem;
+    sem nenhum deles o total do usuário vem do cache. O total fica em
+    context['total_registros'] (e `total_aproximado` quando for estimativa).
+    """
+    paginator_class = PaginadorContagem
+    parametros_filtro = ('search', 'status')
+
+    def listagem_filtrada(self):
+        return any(self.request.GET.get(parametro) for parametro in self.parametros_filtro)
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        contagem, aproximada = contar_lista(
+            queryset, self.model, self.request.user.pk, self.listagem_filtrada()
+        )
+        return super().get_paginator(
+            queryset, per_page, orphans=orphans, allow_empty_first_page=allow_empty_first_page,
+            contagem=contagem, aproximada=aproximada, **kwargs
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        paginator = context.get('paginator')
+        if paginator is not None:
+            context['total_registros'] = paginator.count
+            context['total_aproximado'] = getattr(paginator, 'aproximada', False)
+        return context
@@ -0,0 +1 @@
+"""Serviços de domínio reutilizados pelas views de agendamentos"""
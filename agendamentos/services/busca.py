@@ -0,0 +1,172 @@
+"""
+Busca de clientes com backends plugáveis.
+
+- SQLite: tabela FTS5 (agendamentos_cliente_fts) mantida por triggers,
+  com remoção de acentos e ranking por bm25. A tabela, os triggers e o
+  índice do PostgreSQL são criados pela migração 0005_busca_clientes.
+  O FTS5 casa só o início das palavras; sem resultado, o termo é
+  procurado no meio do texto com icontains ("ilva" -> "Silva").
+- PostgreSQL: índice GIN pg_trgm sobre f_unaccent(lower(...)), com
+  ranking por word_similarity.
+- Demais casos: o filtro original com icontains.
+
+Termos numéricos (CPF/telefone, com ou sem máscara) não passam pelo
+backend: viram busca por prefixo nas colunas cpf_digitos e
+telefone_digitos, que têm índice B-tree. Sem resultado, os dígitos são
+procurados em qualquer posição (ex.: telefone digitado sem DDD).
+
+O backend pode ser forçado com settings.AGENDAMENTOS_BUSCA_CLIENTES
+(caminho pontilhado da classe).
+"""
+
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, F, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from ..models import somente_digitos
+
+TABELA_FTS = 'agendamentos_cliente_fts'  # ClienteIndiceBusca
+
+
+def _expressao_trgm(tabela=''):
+    """Texto indexado no PostgreSQL; a busca precisa usar a mesma expressão do índice (migração 0005)"""
+    prefixo = f'"{tabela}".' if tabela else ''
+    colunas = " || ' ' || ".join(
+        f"coalesce({prefixo}\"{coluna}\", '')" for coluna in ('nome', 'email', 'telefone', 'cpf')
+    )
+    return f'f_unaccent(lower({colunas}))'
+
+
+def escapar_like(termo):
+    """Escapa os curingas do LIKE (\\, % e _) para usar o termo como texto literal"""
+    return termo.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class BuscaClientesIcontains:
+    """Busca original: OR de icontains em nome, email, telefone e CPF"""
+
+    def buscar(self, queryset, termo):
+        return queryset.filter(
+            Q(nome__icontains=termo) |
+            Q(email__icontains=termo) |
+            Q(telefone__icontains=termo) |
+            Q(cpf__icontains=termo)
+        )
+
+
+class BuscaClientesFTS5(BuscaClientesIcontains):
+    """Busca via FTS5 (SQLite), com prefixo em cada termo e ordenação por bm25; sem resultado, icontains"""
+
+    @staticmethod
+    def expressao_match(termo):
+        """Converte o texto digitado em uma consulta FTS5 segura ("jo" "sil" -> "jo"* AND "sil"*)"""
+        tokens = re.findall(r'\w+', termo)
+        return ' AND '.join(f'"{token}"*' for token in tokens)
+
+    def buscar(self, queryset, termo):
+        match = self.expressao_match(termo)
+        if not match:
+            return super().buscar(queryset, termo)
+
+        # JOIN com a tabela FTS5; "rank" é o bm25 (menor = mais relevante)
+        resultado = queryset.filter(indice_busca__indice__match=match).annotate(
+            relevancia=F('indice_busca__rank')
+        ).order_by('relevancia', 'nome')
+        if resultado.exists():
+            return resultado
+        # Trecho do meio de uma palavra não é prefixo de nenhum token
+        return super().buscar(queryset, termo)
+
+
+class BuscaClientesTrigram(BuscaClientesIcontains):
+    """Busca via pg_trgm + unaccent (PostgreSQL), ordenada por similaridade"""
+
+    def buscar(self, queryset, termo):
+        termo = termo.strip()
+        if not termo:
+            return queryset
+        expressao = _expressao_trgm(queryset.model._meta.db_table)
+        return queryset.filter(
+            RawSQL(
+                f"{expressao} LIKE '%%' || f_unaccent(lower(%s)) || '%%' ESCAPE '\\'",
+                [escapar_like(termo)],
+                output_field=BooleanField(),
+            )
+        ).annotate(
+            relevancia=RawSQL(
+                f'word_similarity(f_unaccent(lower(%s)), {expressao})',
+                [termo],
+                output_field=FloatField(),
+            )
+        ).order_by('-relevancia', 'nome')
+
+
+@lru_cache(maxsize=None)
+def _tabela_existe(nome):
+    return nome in connection.introspection.table_names()
+
+
+@lru_cache(maxsize=None)
+def _funcao_pg_existe(nome):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_proc WHERE proname = %s', [nome])
+        return cursor.fetchone() is not None
+
+
+def obter_backend_busca():
+    """Backend de busca de clientes adequado ao banco em uso"""
+    caminho = getattr(settings, 'AGENDAMENTOS_BUSCA_CLIENTES', None)
+    if caminho:
+        return import_string(caminho)()
+    if connection.vendor == 'sqlite' and _tabela_existe(TABELA_FTS):
+        return BuscaClientesFTS5()
+    if connection.vendor == 'postgresql' and _funcao_pg_existe('f_unaccent'):
+        return BuscaClientesTrigram()
+    return BuscaClientesIcontains()
+
+
+def digitos_do_termo(termo):
+    """Dígitos do termo se ele for numérico (só dígitos e máscara), senão None"""
+    if re.fullmatch(r'[\d\s().\-/]+', termo) and re.search(r'\d', termo):
+        return somente_digitos(termo)
+    return None
+
+
+def filtro_prefixo(campo, prefixo):
+    """
+    Q equivalente a campo LIKE 'prefixo%' escrito como intervalo, que vira
+    busca no índice em qualquer banco (no SQLite o LIKE com ESCAPE gerado
+    pelo Django não usa índice).
+    """
+    filtro = Q(**{f'{campo}__gte': prefixo})
+    # Menor string maior que todas as que começam com o prefixo: '1199' -> '12'
+    fim = prefixo.rstrip('9')
+    if fim:
+        filtro &= Q(**{f'{campo}__lt': fim[:-1] + str(int(fim[-1]) + 1)})
+    return filtro
+
+
+def buscar_por_digitos(queryset, digitos):
+    """Clientes cujo CPF ou telefone começa com os dígitos informados"""
+    return queryset.filter(
+        filtro_prefixo('cpf_digitos', digitos) | filtro_prefixo('telefone_digitos', digitos)
+    ).order_by('nome')
+
+
+def buscar_clientes(queryset, termo):
+    """Filtra (e ordena por relevância, quando suportado) os clientes pelo termo"""
+    digitos = digitos_do_termo(termo)
+    if digitos:
+        resultado = buscar_por_digitos(queryset, digitos)
+        if resultado.exists():
+            return resultado
+        # Trecho do meio do número: varre as colunas, sem índice
+        return queryset.filter(
+            Q(cpf_digitos__contains=digitos) | Q(telefone_digitos__contains=digitos)
+        ).order_by('nome')
+    return obter_backend_busca().buscar(queryset, termo)
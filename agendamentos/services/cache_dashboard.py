@@ -0,0 +1,98 @@
+"""
+Cache por usuário do contexto do dashboard.
+
+A chave inclui uma versão por usuário (incrementada a cada escrita em
+Agendamento, Cliente ou TipoServico) e a data local, e expira na
+próxima meia-noite de America/Sao_Paulo, quando "hoje" e "semana" mudam.
+A versão só invalida o contexto se o cache for compartilhado entre os
+processos (DatabaseCache em settings_production).
+
+Os contadores de acertos/falhas custam uma escrita no cache a cada
+leitura (no DatabaseCache, um UPDATE no banco), por isso só são
+mantidos com settings.AGENDAMENTOS_ESTATISTICAS_CACHE (padrão: DEBUG).
+"""
+
+import time as relogio
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+CHAVE_VERSAO = 'dashboard:versao:{user_id}'
+CHAVE_CONTEXTO = 'dashboard:contexto:{user_id}:v{versao}:{data}'
+CHAVE_HITS = 'dashboard:estatisticas:hits'
+CHAVE_MISSES = 'dashboard:estatisticas:misses'
+
+
+def _incrementar(chave, inicial=0):
+    try:
+        return cache.incr(chave)
+    except ValueError:
+        # Chave ainda não existe (ou foi descartada): inicia o contador
+        cache.add(chave, inicial, timeout=None)
+        return cache.incr(chave)
+
+
+def estatisticas_habilitadas():
+    return getattr(settings, 'AGENDAMENTOS_ESTATISTICAS_CACHE', settings.DEBUG)
+
+
+def _versao_inicial():
+    # Baseada no relógio para nunca reaproveitar uma versão antiga após despejo
+    return int(relogio.time() * 1000)
+
+
+def segundos_ate_meia_noite(agora=None):
+    """Segundos até a próxima meia-noite no fuso local"""
+    agora = timezone.localtime(agora)
+    meia_noite = timezone.make_aware(
+        datetime.combine(agora.date() + timedelta(days=1), time.min),
+        agora.tzinfo,
+    )
+    return max(int((meia_noite - agora).total_seconds()), 1)
+
+
+def versao_dashboard(user_id):
+    """Versão atual do cache do dashboard do usuário"""
+    return cache.get_or_set(CHAVE_VERSAO.format(user_id=user_id), _versao_inicial, timeout=None)
+
+
+def invalidar_dashboard(user_id):
+    """Descarta o contexto em cache do usuário incrementando sua versão"""
+    if user_id:
+        _incrementar(CHAVE_VERSAO.format(user_id=user_id), inicial=_versao_inicial())
+
+
+def obter_contexto_dashboard(user, calcular):
+    """Retorna o contexto em cache ou o calcula com `calcular()` e o armazena"""
+    hoje = timezone.localdate()
+    chave = CHAVE_CONTEXTO.format(
+        user_id=user.pk, versao=versao_dashboard(user.pk), data=hoje.isoformat()
+    )
+
+    dados = cache.get(chave)
+    contar = estatisticas_habilitadas()
+    if dados is not None:
+        if contar:
+            _incrementar(CHAVE_HITS)
+        return dados
+
+    if contar:
+        _incrementar(CHAVE_MISSES)
+    dados = calcular()
+    cache.set(chave, dados, timeout=segundos_ate_meia_noite())
+    return dados
+
+
+def estatisticas_cache_dashboard():
+    """Contadores de acertos e falhas do cache do dashboard"""
+    hits = cache.get(CHAVE_HITS, 0)
+    misses = cache.get(CHAVE_MISSES, 0)
+    total = hits + misses
+    return {
+        'habilitadas': estatisticas_habilitadas(),
+        'hits': hits,
+        'misses': misses,
+        'taxa_acerto': round((hits / total) * 100, 1) if total else 0,
+    }
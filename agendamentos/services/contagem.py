@@ -0,0 +1,69 @@
+"""
+Contagens para as listagens paginadas.
+
+- Sem filtros, o total é o número de registros do usuário, guardado no
+  cache compartilhado e descartado pelos signals quando um registro é
+  criado ou excluído. A expiração limita quanto tempo um total fica
+  errado se alguma invalidação se perder.
+- Com filtros no PostgreSQL, conjuntos grandes usam a estimativa do
+  planejador (exibida como "~N") em vez de um COUNT exato.
+- Nos demais casos o COUNT fica com o paginator, uma única vez por request.
+"""
+
+import json
+
+from django.core.cache import cache
+from django.db import connections
+
+CHAVE_TOTAL = 'contagem:{modelo}:{user_id}'
+TIMEOUT_TOTAL = 60 * 10
+
+# A partir deste tamanho estimado o COUNT exato dá lugar à estimativa
+LIMITE_ESTIMATIVA = 10000
+
+
+def _chave(modelo, user_id):
+    return CHAVE_TOTAL.format(modelo=modelo._meta.label_lower, user_id=user_id)
+
+
+def total_usuario(modelo, user_id):
+    """Total de registros de `modelo` criados pelo usuário (em cache)"""
+    return cache.get_or_set(
+        _chave(modelo, user_id),
+        lambda: modelo.objects.filter(criado_por_id=user_id).count(),
+        timeout=TIMEOUT_TOTAL,
+    )
+
+
+def invalidar_total(modelo, user_id):
+    """Descarta o total em cache do usuário para `modelo`"""
+    if user_id:
+        cache.delete(_chave(modelo, user_id))
+
+
+def estimativa_planejador(queryset):
+    """Linhas estimadas pelo planejador do PostgreSQL (None em outros bancos)"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plano = cursor.fetchone()[0]
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    return int(plano[0]['Plan']['Plan Rows'])
+
+
+def contar_lista(queryset, modelo, user_id, filtrado):
+    """
+    Retorna (total, aproximado) para a listagem.
+
+    total None significa "sem atalho": o paginator executa o COUNT exato.
+    """
+    if not filtrado:
+        return total_usuario(modelo, user_id), False
+    estimativa = estimativa_planejador(queryset)
+    if estimativa is not None and estimativa >= LIMITE_ESTIMATIVA:
+        return estimativa, True
+    return None, False
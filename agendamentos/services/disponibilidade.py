@@ -0,0 +1,90 @@
+"""
+Horários livres para um serviço, a partir do horário de funcionamento.
+
+Cada início da grade de `passo` minutos a partir da abertura é testado
+contra o mapa de ocupação do dia (services/ocupacao.py) com uma operação
+de bits. Os mapas ficam em cache; uma consulta de 30 dias custa no
+máximo duas queries (expediente + dias fora do cache).
+"""
+
+import math
+from datetime import time, timedelta
+
+from django.utils import timezone
+
+from ..models import ConfiguracaoHorario
+from .ocupacao import mapas_ocupacao, mascara, minutos
+
+# Igual ao "Intervalo entre Agendamentos" exibido nas configurações
+PASSO_PADRAO = 30
+
+# Usado enquanto o usuário não cadastrar nenhum horário: segunda a sexta, 08:00-18:00
+HORARIO_PADRAO = {dia: (time(8, 0), time(18, 0)) for dia in range(5)}
+
+LIMITE_DIAS = 62
+
+
+def _hora(total):
+    return time(total // 60, total % 60)
+
+
+def _ponto_da_grade(minuto, abertura, passo):
+    """Primeiro ponto abertura + k*passo que não é anterior a `minuto`"""
+    if minuto <= abertura:
+        return abertura
+    return abertura + math.ceil((minuto - abertura) / passo) * passo
+
+
+def horario_funcionamento(usuario):
+    """{dia_semana: (abertura, fechamento)} dos dias ativos do usuário"""
+    configuracoes = ConfiguracaoHorario.objects.filter(usuario=usuario).values_list(
+        'dia_semana', 'hora_inicio', 'hora_fim', 'ativo'
+    )
+    expediente = {}
+    possui_configuracao = False
+    for dia_semana, hora_inicio, hora_fim, ativo in configuracoes:
+        possui_configuracao = True
+        if ativo:
+            expediente[dia_semana] = (hora_inicio, hora_fim)
+    return expediente if possui_configuracao else dict(HORARIO_PADRAO)
+
+
+def horarios_livres(abertura, fechamento, ocupacao, duracao, passo, a_partir_de=0):
+    """Inícios livres (em minutos) na grade abertura + k*passo, dado o mapa de ocupação do dia"""
+    livres = []
+    candidato = _ponto_da_grade(a_partir_de, abertura, passo)
+    while candidato + duracao <= fechamento:
+        if not ocupacao & mascara(candidato, candidato + duracao):
+            livres.append(candidato)
+        candidato += passo
+    return livres
+
+
+def disponibilidade(usuario, servico, inicio, fim, passo=PASSO_PADRAO, agora=None):
+    """Lista de (data, [horários livres]) de `inicio` a `fim` para a duração do serviço"""
+    agora = timezone.localtime(agora)
+    hoje = agora.date()
+    duracao = math.ceil(servico.duracao.total_seconds() / 60)
+
+    expediente = horario_funcionamento(usuario)
+    datas = []
+    data = max(inicio, hoje)
+    while data <= fim:
+        if data.weekday() in expediente:
+            datas.append(data)
+        data += timedelta(days=1)
+
+    mapas = mapas_ocupacao(usuario.pk, datas)
+    resultado = []
+    for data in datas:
+        abertura, fechamento = expediente[data.weekday()]
+        livres = horarios_livres(
+            minutos(abertura),
+            minutos(fechamento),
+            mapas[data],
+            duracao,
+            passo,
+            a_partir_de=minutos(agora.time(), arredondar_para_cima=True) if data == hoje else 0,
+        )
+        resultado.append((data, [_hora(inicio_livre) for inicio_livre in livres]))
+    return resultado
@@ -0,0 +1,127 @@
+"""
+Estatísticas de clientes (agendamentos, visitas, faltas, faturamento).
+
+As mesmas expressões de agregação servem ao detalhe do cliente (uma
+consulta) e aos contadores desnormalizados em Cliente. No save()/delete()
+os signals aplicam só a diferença do agendamento (F() + delta, sem ler o
+histórico do cliente); os caminhos em massa e o comando
+reconstruir_contadores_clientes recalculam os clientes afetados.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from ..models import Agendamento, Cliente, StatusAgendamento
+from .resumo_diario import valor_efetivo
+
+CAMPOS_CONTADORES = ['total_agendamentos', 'total_visitas', 'total_faltas', 'faturamento_total', 'ultima_visita']
+
+
+def agregacoes():
+    """Expressões de aggregate()/annotate() com os totais de um conjunto de agendamentos"""
+    concluido = Q(status=StatusAgendamento.CONCLUIDO)
+    return {
+        'total_agendamentos': Count('id'),
+        'total_visitas': Count('id', filter=concluido),
+        'total_faltas': Count('id', filter=Q(status=StatusAgendamento.NAO_COMPARECEU)),
+        'total_cancelados': Count('id', filter=Q(status=StatusAgendamento.CANCELADO)),
+        'faturamento_total': Sum(valor_efetivo(), filter=concluido),
+        'ultima_visita': Max('data_agendamento', filter=concluido),
+    }
+
+
+def estatisticas_cliente(cliente):
+    """Totais do cliente em uma única consulta"""
+    totais = Agendamento.objects.filter(cliente=cliente).order_by().aggregate(**agregacoes())
+    totais['faturamento_total'] = totais['faturamento_total'] or Decimal('0')
+    return totais
+
+
+def atualizar_contadores(cliente_ids, batch_size=1000):
+    """Recalcula os contadores dos clientes informados: um SELECT agrupado e um UPDATE por lote"""
+    cliente_ids = {pk for pk in cliente_ids if pk}
+    if not cliente_ids:
+        return
+
+    expressoes = agregacoes()
+    del expressoes['total_cancelados']
+    totais = {
+        linha.pop('cliente_id'): linha
+        for linha in Agendamento.objects.filter(cliente_id__in=cliente_ids).order_by().values(
+            'cliente_id'
+        ).annotate(**expressoes)
+    }
+
+    clientes = []
+    for pk in cliente_ids:
+        linha = totais.get(pk, {})
+        clientes.append(Cliente(
+            pk=pk,
+            total_agendamentos=linha.get('total_agendamentos', 0),
+            total_visitas=linha.get('total_visitas', 0),
+            total_faltas=linha.get('total_faltas', 0),
+            faturamento_total=linha.get('faturamento_total') or Decimal('0'),
+            ultima_visita=linha.get('ultima_visita'),
+        ))
+    # bulk_update não passa pelo save(): atualizado_em e os signals de Cliente não mudam
+    Cliente.objects.bulk_update(clientes, CAMPOS_CONTADORES, batch_size=batch_size)
+
+
+def aplicar_variacao(anterior, atual):
+    """
+    Ajusta os contadores pela troca de um agendamento `anterior` pelo `atual`,
+    cada um (cliente_id, status, data, receita) ou None (criação/exclusão).
+
+    Um UPDATE com F() por cliente afetado e nenhum se a parcela não mudou.
+    ultima_visita só é relida do banco quando uma visita deixa de contar.
+    """
+    if anterior == atual:
+        return
+
+    variacoes = defaultdict(lambda: dict.fromkeys(
+        ['total_agendamentos', 'total_visitas', 'total_faltas', 'faturamento_total'], 0
+    ))
+    visita_removida, visita_nova = {}, {}
+    for sinal, parcela in ((-1, anterior), (1, atual)):
+        if not parcela or not parcela[0]:
+            continue
+        cliente_id, status, data, receita = parcela
+        variacao = variacoes[cliente_id]
+        variacao['total_agendamentos'] += sinal
+        if status == StatusAgendamento.CONCLUIDO:
+            variacao['total_visitas'] += sinal
+            variacao['faturamento_total'] += sinal * (receita or 0)
+            (visita_removida if sinal < 0 else visita_nova)[cliente_id] = data
+        elif status == StatusAgendamento.NAO_COMPARECEU:
+            variacao['total_faltas'] += sinal
+
+    for cliente_id, variacao in variacoes.items():
+        campos = {campo: F(campo) + delta for campo, delta in variacao.items() if delta}
+        if cliente_id in visita_removida:
+            if visita_removida[cliente_id] != visita_nova.get(cliente_id):
+                # A visita que saiu pode ser a última: relê a maior data (índice cliente/status)
+                campos['ultima_visita'] = Subquery(
+                    Agendamento.objects.filter(
+                        cliente_id=OuterRef('pk'), status=StatusAgendamento.CONCLUIDO
+                    ).order_by('-data_agendamento').values('data_agendamento')[:1]
+                )
+        elif cliente_id in visita_nova:
+            data = Value(visita_nova[cliente_id])
+            campos['ultima_visita'] = Coalesce(Greatest('ultima_visita', data), data)
+        if campos:
+            Cliente.objects.filter(pk=cliente_id).update(**campos)
+
+
+def reconstruir_contadores(usuario=None, batch_size=1000):
+    """Recalcula os contadores de todos os clientes (ou os de um usuário). Retorna quantos"""
+    clientes = Cliente.objects.all()
+    if usuario is not None:
+        clientes = clientes.filter(criado_por=usuario)
+
+    ids = list(clientes.values_list('pk', flat=True).order_by('pk'))
+    for inicio in range(0, len(ids), batch_size):
+        atualizar_contadores(ids[inicio:inicio + batch_size], batch_size=batch_size)
+    return len(ids)
@@ -0,0 +1,104 @@
+"""
+Exportação de dados em CSV via StreamingHttpResponse.
+
+As linhas são geradas sob demanda a partir de `QuerySet.iterator()`
+(cursor no servidor no PostgreSQL), então a memória fica constante e o
+primeiro byte sai antes de a consulta terminar de ser lida.
+"""
+
+import csv
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+CHUNK_SIZE = 2000
+
+
+class _Eco:
+    """Objeto com interface de arquivo que apenas devolve o que recebe"""
+
+    def write(self, valor):
+        return valor
+
+
+def gerar_linhas_csv(cabecalho, linhas):
+    """Gera o CSV linha a linha (com BOM para o Excel reconhecer UTF-8)"""
+    writer = csv.writer(_Eco(), delimiter=';')
+    yield '\ufeff' + writer.writerow(cabecalho)
+    for linha in linhas:
+        yield writer.writerow(linha)
+
+
+def resposta_csv(prefixo, cabecalho, linhas):
+    """StreamingHttpResponse com o CSV e nome de arquivo datado"""
+    nome_arquivo = f"{prefixo}_{timezone.localdate().strftime('%Y%m%d')}.csv"
+    response = StreamingHttpResponse(
+        gerar_linhas_csv(cabecalho, linhas),
+        content_type='text/csv; charset=utf-8',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
+    return response
+
+
+def _decimal(valor):
+    return '' if valor is None else f'{valor:.2f}'.replace('.', ',')
+
+
+def _data(valor):
+    return valor.strftime('%d/%m/%Y') if valor else ''
+
+
+def _hora(valor):
+    return valor.strftime('%H:%M') if valor else ''
+
+
+CABECALHO_AGENDAMENTOS = [
+    'Data', 'Início', 'Fim', 'Cliente', 'Telefone', 'Serviço', 'Status', 'Valor Cobrado', 'Observações',
+]
+
+
+def linhas_agendamentos(agendamentos):
+    """Linhas do CSV de agendamentos (cliente e serviço vêm no mesmo SELECT)"""
+    agendamentos = agendamentos.select_related('cliente', 'servico')
+    for agendamento in agendamentos.iterator(chunk_size=CHUNK_SIZE):
+        yield [
+            _data(agendamento.data_agendamento),
+            _hora(agendamento.hora_inicio),
+            _hora(agendamento.hora_fim),
+            agendamento.cliente.nome,
+            agendamento.cliente.telefone,
+            agendamento.servico.nome,
+            agendamento.get_status_display(),
+            _decimal(agendamento.valor_cobrado if agendamento.valor_cobrado is not None
+                     else agendamento.servico.preco),
+            agendamento.observacoes or '',
+        ]
+
+
+CABECALHO_CLIENTES = [
+    'Nome', 'Email', 'Telefone', 'CPF', 'Data de Nascimento', 'Endereço', 'Ativo', 'Criado em',
+]
+
+
+def linhas_clientes(clientes):
+    """Linhas do CSV de clientes"""
+    for cliente in clientes.iterator(chunk_size=CHUNK_SIZE):
+        yield [
+            cliente.nome,
+            cliente.email,
+            cliente.telefone,
+            cliente.cpf,
+            _data(cliente.data_nascimento),
+            cliente.endereco or '',
+            'Sim' if cliente.ativo else 'Não',
+            timezone.localtime(cliente.criado_em).strftime('%d/%m/%Y %H:%M'),
+        ]
+
+
+CABECALHO_FATURAMENTO = ['Data', 'Agendamentos Concluídos', 'Faturamento']
+
+
+def linhas_faturamento(dias):
+    """Linhas do CSV da série diária do relatório: iterável de (data, quantidade, faturamento)"""
+    for data, quantidade, faturamento in dias:
+        yield [_data(data), quantidade, _decimal(faturamento)]
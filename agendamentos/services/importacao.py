@@ -0,0 +1,299 @@
+"""
+Importação em massa de agendamentos e clientes.
+
+Em vez de um save() por linha (full_clean com SELECTs de unicidade,
+signals e, nos agendamentos, recálculo do resumo a cada registro), os
+dados necessários para validar são lidos uma vez, os campos calculados
+são preenchidos em memória e as linhas válidas entram com bulk_create em
+lotes. Resumo diário, contadores dos clientes e caches são atualizados no
+final, uma única vez.
+"""
+
+import csv
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from ..models import STATUS_ATIVOS, Agendamento, Cliente, StatusAgendamento, TipoServico, somente_digitos
+from ..validators import validar_cpf, validar_data_nascimento
+from .cache_dashboard import invalidar_dashboard
+from .contagem import invalidar_total
+from .estatisticas_cliente import atualizar_contadores
+from .ocupacao import invalidar_ocupacao
+from .resumo_diario import chave_resumo, recalcular_chaves_em_lote
+
+CABECALHO_ERROS = ['Linha', 'Erro']
+
+# Linhas recusadas guardadas para download após a importação pela interface. O
+# download pode cair em outro worker: o cache precisa ser compartilhado entre os
+# processos (DatabaseCache em settings_production)
+CHAVE_ERROS_IMPORTACAO = 'importacao:clientes:erros:{user_id}:{token}'
+TIMEOUT_ERROS_IMPORTACAO = 60 * 60
+
+
+def guardar_relatorio_erros(user_id, erros):
+    """Guarda as linhas recusadas do usuário e retorna o token de download"""
+    token = uuid.uuid4().hex
+    cache.set(CHAVE_ERROS_IMPORTACAO.format(user_id=user_id, token=token), erros,
+              timeout=TIMEOUT_ERROS_IMPORTACAO)
+    return token
+
+
+def relatorio_erros(user_id, token):
+    """Linhas recusadas guardadas com o token (None se expirou ou é de outro usuário)"""
+    return cache.get(CHAVE_ERROS_IMPORTACAO.format(user_id=user_id, token=token))
+
+# Colunas aceitas no CSV de clientes (as mesmas da exportação); "Criado em" é ignorada
+COLUNAS_CLIENTES = {
+    'nome': 'nome',
+    'email': 'email',
+    'telefone': 'telefone',
+    'cpf': 'cpf',
+    'data de nascimento': 'data_nascimento',
+    'endereço': 'endereco',
+    'observações': 'observacoes',
+    'ativo': 'ativo',
+}
+COLUNAS_OBRIGATORIAS = ('nome', 'email', 'telefone', 'cpf', 'data_nascimento')
+VALORES_FALSOS = {'não', 'nao', 'n', 'false', '0', 'inativo'}
+
+
+@dataclass
+class ResultadoImportacao:
+    """Quantidade gravada e erros por linha (número da linha, mensagem)"""
+    criados: int = 0
+    erros: list = field(default_factory=list)
+
+
+def _sobrepoe(intervalos, hora_inicio, hora_fim):
+    return any(inicio < hora_fim and fim > hora_inicio for inicio, fim in intervalos)
+
+
+def importar_agendamentos(usuario, registros, batch_size=1000):
+    """
+    Importa agendamentos do usuário a partir de dicionários com cliente_id,
+    servico_id, data_agendamento e hora_inicio (e, opcionais, status,
+    valor_cobrado e observacoes). Datas passadas são aceitas (histórico).
+
+    Linhas inválidas ou em conflito (com o banco ou com linhas anteriores
+    do próprio arquivo) entram em `erros` e não impedem as demais.
+    """
+    registros = list(registros)
+    resultado = ResultadoImportacao()
+    if not registros:
+        return resultado
+
+    servicos = {
+        pk: (duracao, preco)
+        for pk, duracao, preco in TipoServico.objects.filter(criado_por=usuario).values_list(
+            'pk', 'duracao', 'preco'
+        ).order_by()
+    }
+    clientes = set(Cliente.objects.filter(criado_por=usuario).values_list('pk', flat=True).order_by())
+
+    # Horários já ocupados no período do arquivo, em uma consulta
+    datas = [registro['data_agendamento'] for registro in registros]
+    inicios = defaultdict(set)
+    ocupados = defaultdict(list)
+    existentes = Agendamento.objects.filter(
+        criado_por=usuario, data_agendamento__range=(min(datas), max(datas))
+    ).values_list('data_agendamento', 'hora_inicio', 'hora_fim', 'status').order_by()
+    for data, hora_inicio, hora_fim, status in existentes:
+        inicios[data].add(hora_inicio)
+        if status in STATUS_ATIVOS:
+            ocupados[data].append((hora_inicio, hora_fim))
+
+    novos = []
+    for numero, registro in enumerate(registros, start=1):
+        data = registro['data_agendamento']
+        hora_inicio = registro['hora_inicio']
+        status = registro.get('status') or StatusAgendamento.AGENDADO
+        servico = servicos.get(registro['servico_id'])
+
+        if servico is None:
+            resultado.erros.append((numero, "Serviço não encontrado."))
+            continue
+        if registro['cliente_id'] not in clientes:
+            resultado.erros.append((numero, "Cliente não encontrado."))
+            continue
+        if status not in StatusAgendamento.values:
+            resultado.erros.append((numero, f"Status inválido: {status}."))
+            continue
+
+        duracao, preco = servico
+        fim = datetime.combine(data, hora_inicio) + duracao
+        if fim.date() > data:
+            resultado.erros.append((numero, "O agendamento não pode passar da meia-noite."))
+            continue
+        hora_fim = fim.time()
+
+        if hora_inicio in inicios[data]:
+            resultado.erros.append((numero, "Já existe um agendamento neste dia e horário."))
+            continue
+        ativo = status in STATUS_ATIVOS
+        if ativo and _sobrepoe(ocupados[data], hora_inicio, hora_fim):
+            resultado.erros.append((numero, "Conflito de horário com outro agendamento ativo."))
+            continue
+
+        inicios[data].add(hora_inicio)
+        if ativo:
+            ocupados[data].append((hora_inicio, hora_fim))
+        novos.append(Agendamento(
+            cliente_id=registro['cliente_id'],
+            servico_id=registro['servico_id'],
+            data_agendamento=data,
+            hora_inicio=hora_inicio,
+            hora_fim=hora_fim,
+            status=status,
+            observacoes=registro.get('observacoes') or None,
+            valor_cobrado=registro.get('valor_cobrado') or preco,
+            criado_por=usuario,
+        ))
+
+    if not novos:
+        return resultado
+
+    try:
+        with transaction.atomic():
+            Agendamento.objects.bulk_create(novos, batch_size=batch_size)
+            recalcular_chaves_em_lote(chave_resumo(agendamento) for agendamento in novos)
+            atualizar_contadores({agendamento.cliente_id for agendamento in novos})
+    except IntegrityError:
+        # Outro agendamento gravado durante a importação ocupou algum dos horários
+        raise ValidationError("Conflito de horário: a agenda mudou durante a importação; tente novamente.")
+
+    resultado.criados = len(novos)
+    invalidar_dashboard(usuario.pk)
+    invalidar_total(Agendamento, usuario.pk)
+    invalidar_ocupacao(usuario.pk, {agendamento.data_agendamento for agendamento in novos})
+    return resultado
+
+
+def _data_csv(valor):
+    """Data em dd/mm/aaaa (formato da exportação) ou aaaa-mm-dd"""
+    try:
+        if '/' in valor:
+            dia, mes, ano = valor.split('/')
+            return date(int(ano), int(mes), int(dia))
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise ValidationError("Data inválida (use dd/mm/aaaa).")
+
+
+def _cliente_da_linha(dados, usuario):
+    """Cliente (não salvo) montado e validado a partir da linha; ValidationError com todos os erros"""
+    erros = {}
+    valores = {}
+    for campo in ('nome', 'email', 'telefone', 'cpf', 'endereco', 'observacoes'):
+        modelo_campo = Cliente._meta.get_field(campo)
+        valor = dados.get(campo, '')
+        try:
+            # Mesmas validações de campo do full_clean(), sem as consultas de unicidade
+            valores[campo] = modelo_campo.clean(valor or (None if modelo_campo.null else ''), None)
+        except ValidationError as erro:
+            erros[campo] = erro.messages
+    try:
+        data_nascimento = _data_csv(dados.get('data_nascimento', ''))
+        validar_data_nascimento(data_nascimento)
+        valores['data_nascimento'] = data_nascimento
+    except ValidationError as erro:
+        erros['data_nascimento'] = erro.messages
+    if valores.get('cpf'):
+        try:
+            validar_cpf(valores['cpf'])
+        except ValidationError as erro:
+            erros['cpf'] = erro.messages
+    if erros:
+        raise ValidationError(erros)
+
+    return Cliente(
+        **valores,
+        # save() não é chamado no bulk_create: as cópias sem máscara são preenchidas aqui
+        cpf_digitos=somente_digitos(valores['cpf']),
+        telefone_digitos=somente_digitos(valores['telefone']),
+        ativo=(dados.get('ativo') or '').strip().lower() not in VALORES_FALSOS,
+        criado_por_id=usuario.pk,
+    )
+
+
+def _mensagem(erro):
+    """Texto único com os erros de uma linha ("CPF: CPF inválido.; Email: ...")"""
+    if hasattr(erro, 'error_dict'):
+        return '; '.join(
+            f"{Cliente._meta.get_field(campo).verbose_name}: {' '.join(mensagens)}"
+            for campo, mensagens in erro.message_dict.items()
+        )
+    return ' '.join(erro.messages)
+
+
+def importar_clientes(usuario, arquivo, batch_size=1000):
+    """
+    Importa clientes de um CSV (arquivo de texto, lido em streaming) com o
+    cabeçalho da exportação, separado por ';' ou ','.
+
+    As regras são as do ClienteForm; emails e CPFs duplicados (no banco ou
+    no próprio arquivo) são detectados em conjuntos carregados uma única
+    vez. As linhas com erro vão para `erros` e não impedem as demais.
+    """
+    resultado = ResultadoImportacao()
+    primeira = arquivo.readline().lstrip('\ufeff')
+    delimitador = ';' if primeira.count(';') >= primeira.count(',') else ','
+    cabecalho = [
+        COLUNAS_CLIENTES.get(coluna.strip().lower()) for coluna in next(csv.reader([primeira], delimiter=delimitador), [])
+    ]
+    faltando = [campo for campo in COLUNAS_OBRIGATORIAS if campo not in cabecalho]
+    if faltando:
+        nomes = ', '.join(Cliente._meta.get_field(campo).verbose_name for campo in faltando)
+        raise ValidationError(f"Colunas obrigatórias ausentes no cabeçalho: {nomes}.")
+
+    # Email e CPF são únicos na tabela toda, não só entre os clientes do usuário
+    emails = set()
+    cpfs = set()
+    for email, cpf_digitos in Cliente.objects.values_list('email', 'cpf_digitos').order_by().iterator(chunk_size=5000):
+        emails.add(email.lower())
+        cpfs.add(cpf_digitos)
+
+    lote = []
+    try:
+        with transaction.atomic():
+            for numero, linha in enumerate(csv.reader(arquivo, delimiter=delimitador), start=2):
+                if not any(valor.strip() for valor in linha):
+                    continue
+                dados = {campo: valor.strip() for campo, valor in zip(cabecalho, linha) if campo}
+                try:
+                    cliente = _cliente_da_linha(dados, usuario)
+                except ValidationError as erro:
+                    resultado.erros.append((numero, _mensagem(erro)))
+                    continue
+
+                email = cliente.email.lower()
+                if email in emails:
+                    resultado.erros.append((numero, f"Email já cadastrado: {cliente.email}."))
+                    continue
+                if cliente.cpf_digitos in cpfs:
+                    resultado.erros.append((numero, f"CPF já cadastrado: {cliente.cpf}."))
+                    continue
+                emails.add(email)
+                cpfs.add(cliente.cpf_digitos)
+
+                lote.append(cliente)
+                if len(lote) >= batch_size:
+                    Cliente.objects.bulk_create(lote)
+                    resultado.criados += len(lote)
+                    lote = []
+            if lote:
+                Cliente.objects.bulk_create(lote)
+                resultado.criados += len(lote)
+    except IntegrityError:
+        # Email/CPF cadastrado por outra requisição durante a importação
+        raise ValidationError("Um email ou CPF do arquivo foi cadastrado durante a importação; tente novamente.")
+
+    if resultado.criados:
+        invalidar_dashboard(usuario.pk)
+        invalidar_total(Cliente, usuario.pk)
+    return resultado
@@ -0,0 +1,69 @@
+"""
+KPIs do dashboard calculados com agregações condicionais.
+
+Todos os contadores de agendamentos saem de uma única consulta
+(COUNT ... FILTER / CASE WHEN) e o total de clientes de outra.
+"""
+
+from dataclasses import asdict, dataclass
+from datetime import timedelta
+
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from ..models import Agendamento, Cliente, StatusAgendamento
+
+
+@dataclass(frozen=True)
+class KpisDashboard:
+    """Resultado tipado dos contadores exibidos no dashboard"""
+    agendamentos_hoje: int = 0
+    agendamentos_semana: int = 0
+    agendamentos_pendentes: int = 0
+    agendamentos_mes_total: int = 0
+    agendamentos_mes_realizados: int = 0
+    agendamentos_mes_cancelados: int = 0
+    total_clientes: int = 0
+
+    @property
+    def taxa_comparecimento(self):
+        """Percentual de agendamentos concluídos no mês"""
+        if self.agendamentos_mes_total > 0:
+            return round((self.agendamentos_mes_realizados / self.agendamentos_mes_total) * 100, 1)
+        return 0
+
+    def as_context(self):
+        """Dicionário pronto para ser mesclado no contexto do template"""
+        dados = asdict(self)
+        dados['taxa_comparecimento'] = self.taxa_comparecimento
+        return dados
+
+
+def calcular_kpis_dashboard(user, hoje=None):
+    """Calcula os KPIs do dashboard do usuário em duas consultas"""
+    hoje = hoje or timezone.localdate()
+    inicio_semana = hoje - timedelta(days=hoje.weekday())
+    fim_semana = inicio_semana + timedelta(days=6)
+    inicio_mes = hoje.replace(day=1)
+
+    no_mes = Q(data_agendamento__gte=inicio_mes)
+
+    totais = Agendamento.objects.filter(criado_por=user).aggregate(
+        agendamentos_hoje=Count('id', filter=Q(data_agendamento=hoje)),
+        agendamentos_semana=Count('id', filter=Q(data_agendamento__range=[inicio_semana, fim_semana])),
+        agendamentos_pendentes=Count('id', filter=Q(status=StatusAgendamento.AGENDADO)),
+        agendamentos_mes_total=Count('id', filter=no_mes),
+        agendamentos_mes_realizados=Count(
+            'id', filter=no_mes & Q(status=StatusAgendamento.CONCLUIDO)
+        ),
+        agendamentos_mes_cancelados=Count(
+            'id', filter=no_mes & Q(status__in=[
+                StatusAgendamento.CANCELADO, StatusAgendamento.NAO_COMPARECEU
+            ])
+        ),
+    )
+
+    return KpisDashboard(
+        total_clientes=Cliente.objects.filter(criado_por=user).count(),
+        **totais
+    )
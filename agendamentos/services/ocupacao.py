@@ -0,0 +1,74 @@
+"""
+Mapa de ocupação por (usuário, dia) em bits.
+
+O dia é dividido em 288 faixas de 5 minutos; o bit i fica ligado se
+algum agendamento ativo ocupa a faixa i. O mapa (um int) fica em cache e
+é reconstruído sob demanda a partir de Agendamento quando falta; os
+signals o descartam quando um agendamento do dia muda.
+
+Horários fora da grade de 5 minutos são arredondados para fora, então o
+mapa não diz "livre" para um intervalo ocupado enquanto estiver em dia.
+Ele alimenta a listagem de horários livres; a validação de um
+agendamento consulta sempre o banco (um mapa em cache pode ficar
+atrasado até a invalidação chegar), e a restrição de sobreposição do
+banco continua sendo a garantia final.
+"""
+
+import math
+
+from django.core.cache import cache
+
+from ..models import Agendamento
+
+MINUTOS_POR_FAIXA = 5
+FAIXAS_POR_DIA = 24 * 60 // MINUTOS_POR_FAIXA
+
+CHAVE_OCUPACAO = 'ocupacao:{user_id}:{data}'
+TIMEOUT_OCUPACAO = 60 * 60 * 24
+
+
+def minutos(hora, arredondar_para_cima=False):
+    """Minutos desde a meia-noite (segundos contam como um minuto a mais se pedido)"""
+    total = hora.hour * 60 + hora.minute
+    if arredondar_para_cima and (hora.second or hora.microsecond):
+        total += 1
+    return total
+
+
+def mascara(inicio, fim):
+    """Bits das faixas tocadas pelo intervalo [inicio, fim) em minutos"""
+    primeira = inicio // MINUTOS_POR_FAIXA
+    ultima = min(math.ceil(fim / MINUTOS_POR_FAIXA), FAIXAS_POR_DIA)
+    if ultima <= primeira:
+        return 0
+    return ((1 << (ultima - primeira)) - 1) << primeira
+
+
+def _chave(user_id, data):
+    return CHAVE_OCUPACAO.format(user_id=user_id, data=data.isoformat())
+
+
+def mapas_ocupacao(user_id, datas):
+    """{data: mapa} dos dias pedidos; os que faltam no cache vêm em uma única consulta"""
+    chaves = {_chave(user_id, data): data for data in datas}
+    mapas = {chaves[chave]: mapa for chave, mapa in cache.get_many(list(chaves)).items()}
+
+    faltando = [data for data in datas if data not in mapas]
+    if faltando:
+        novos = dict.fromkeys(faltando, 0)
+        linhas = Agendamento.objects.ativos().filter(
+            criado_por_id=user_id, data_agendamento__in=faltando
+        ).values_list('data_agendamento', 'hora_inicio', 'hora_fim').order_by()
+        for data, hora_inicio, hora_fim in linhas:
+            novos[data] |= mascara(minutos(hora_inicio), minutos(hora_fim, arredondar_para_cima=True))
+        cache.set_many({_chave(user_id, data): mapa for data, mapa in novos.items()},
+                       timeout=TIMEOUT_OCUPACAO)
+        mapas.update(novos)
+    return mapas
+
+
+def invalidar_ocupacao(user_id, datas):
+    """Descarta o mapa em cache dos dias informados"""
+    datas = [data for data in datas if data]
+    if user_id and datas:
+        cache.delete_many([_chave(user_id, data) for data in datas])
@@ -0,0 +1,133 @@
+"""
+Criação de séries recorrentes de agendamentos.
+
+Todas as ocorrências são verificadas com uma única consulta de conflitos
+e gravadas com bulk_create; como bulk_create não dispara signals, o
+resumo diário, os contadores do cliente, os totais e os mapas de
+ocupação são atualizados aqui, em lote. O custo em queries não depende do tamanho da série.
+"""
+
+import calendar
+from datetime import date, datetime, timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from ..models import STATUS_ATIVOS, Agendamento, StatusAgendamento
+from .cache_dashboard import invalidar_dashboard
+from .contagem import invalidar_total
+from .estatisticas_cliente import atualizar_contadores
+from .ocupacao import invalidar_ocupacao
+from .resumo_diario import chave_resumo, recalcular_chaves_em_lote
+
+INTERVALO_DIAS = {'semanal': 7, 'quinzenal': 14}
+
+
+def _somar_meses(data, meses, dia):
+    """Mesmo dia `dia` `meses` depois, limitado ao último dia do mês (31/01 -> 28/02)"""
+    ano, mes = divmod(data.month - 1 + meses, 12)
+    ano, mes = data.year + ano, mes + 1
+    return date(ano, mes, min(dia, calendar.monthrange(ano, mes)[1]))
+
+
+def datas_da_serie(frequencia, data_inicio, quantidade=None, data_fim=None, limite=None):
+    """
+    Datas das ocorrências, a partir de `data_inicio`, até completar
+    `quantidade` ou passar de `data_fim`. Para no máximo `limite` datas.
+    """
+    datas = []
+    while True:
+        indice = len(datas)
+        if frequencia == 'mensal':
+            data = _somar_meses(data_inicio, indice, data_inicio.day)
+        else:
+            data = data_inicio + timedelta(days=INTERVALO_DIAS[frequencia] * indice)
+
+        if quantidade is not None and indice >= quantidade:
+            break
+        if data_fim is not None and data > data_fim:
+            break
+        if limite is not None and indice >= limite:
+            break
+        datas.append(data)
+    return datas
+
+
+def conflitos_da_serie(usuario, datas, hora_inicio, hora_fim):
+    """
+    (data, hora_inicio, hora_fim, nome do cliente) de todos os agendamentos
+    que impedem alguma ocorrência: ativos sobrepostos ao intervalo ou com a
+    mesma hora de início (RESTRICAO_HORARIO_UNICO), em uma única consulta.
+    """
+    if not datas:
+        return []
+    return list(
+        Agendamento.objects.filter(criado_por=usuario, data_agendamento__in=datas).filter(
+            Q(status__in=STATUS_ATIVOS, hora_inicio__lt=hora_fim, hora_fim__gt=hora_inicio) |
+            Q(hora_inicio=hora_inicio)
+        ).order_by('data_agendamento', 'hora_inicio').values_list(
+            'data_agendamento', 'hora_inicio', 'hora_fim', 'cliente__nome'
+        )
+    )
+
+
+def criar_serie(serie):
+    """
+    Grava a série (ainda não salva) e todas as suas ocorrências.
+
+    Levanta ValidationError listando todos os conflitos de uma vez; nesse
+    caso nada é gravado. Retorna a lista de agendamentos criados.
+    """
+    servico = serie.servico
+    datas = datas_da_serie(
+        serie.frequencia, serie.data_inicio, serie.quantidade, serie.data_fim,
+        limite=serie.LIMITE_OCORRENCIAS,
+    )
+    if not datas:
+        raise ValidationError("A série não possui nenhuma ocorrência.")
+
+    fim = datetime.combine(serie.data_inicio, serie.hora_inicio) + servico.duracao
+    if fim.date() > serie.data_inicio:
+        raise ValidationError({'hora_inicio': "O agendamento não pode passar da meia-noite."})
+    hora_fim = fim.time()
+
+    conflitos = conflitos_da_serie(serie.criado_por, datas, serie.hora_inicio, hora_fim)
+    if conflitos:
+        raise ValidationError([
+            f"{data:%d/%m/%Y}: conflito com {cliente_nome} das {inicio:%H:%M} às {termino:%H:%M}"
+            for data, inicio, termino, cliente_nome in conflitos
+        ])
+
+    valor = serie.valor_cobrado or servico.preco
+    try:
+        with transaction.atomic():
+            serie.save()
+            agendamentos = Agendamento.objects.bulk_create([
+                Agendamento(
+                    cliente_id=serie.cliente_id,
+                    servico=servico,
+                    data_agendamento=data,
+                    hora_inicio=serie.hora_inicio,
+                    hora_fim=hora_fim,
+                    status=StatusAgendamento.AGENDADO,
+                    observacoes=serie.observacoes,
+                    valor_cobrado=valor,
+                    criado_por_id=serie.criado_por_id,
+                    serie=serie,
+                )
+                for data in datas
+            ])
+            recalcular_chaves_em_lote(chave_resumo(agendamento) for agendamento in agendamentos)
+            atualizar_contadores([serie.cliente_id])
+    except IntegrityError:
+        # Outro agendamento ocupou um dos horários entre a verificação e a gravação
+        serie.pk = None
+        raise ValidationError({
+            'hora_inicio': "Conflito de horário: outro agendamento ativo acabou de ocupar um dos horários da série."
+        })
+
+    invalidar_dashboard(serie.criado_por_id)
+    invalidar_total(Agendamento, serie.criado_por_id)
+    invalidar_ocupacao(serie.criado_por_id, datas)
+    return agendamentos
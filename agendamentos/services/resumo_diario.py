@@ -0,0 +1,207 @@
+"""
+Manutenção e leitura do resumo diário de agendamentos.
+
+Cada linha de ResumoDiarioAgendamento agrega os agendamentos de um
+(usuário, data, status, serviço). As escritas em Agendamento (e as
+mudanças de preço de TipoServico, para agendamentos sem valor_cobrado)
+recalculam apenas as chaves afetadas; os gráficos leem o resumo e passam a custar
+O(dias no período) em vez de O(agendamentos).
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+from ..models import Agendamento, ResumoDiarioAgendamento
+
+
+def valor_efetivo():
+    """Receita do agendamento: valor cobrado ou, na falta dele, o preço do serviço"""
+    return Coalesce('valor_cobrado', 'servico__preco')
+
+
+def chave_resumo(agendamento):
+    """Chave (usuário, data, status, serviço) de um agendamento"""
+    return (
+        agendamento.criado_por_id,
+        agendamento.data_agendamento,
+        agendamento.status,
+        agendamento.servico_id,
+    )
+
+
+def minutos_agendados(data, hora_inicio, hora_fim):
+    """Minutos entre hora_inicio e hora_fim (0 se algum estiver vazio)"""
+    if not hora_inicio or not hora_fim:
+        return 0
+    delta = datetime.combine(data, hora_fim) - datetime.combine(data, hora_inicio)
+    return max(int(delta.total_seconds() // 60), 0)
+
+
+def recalcular_resumo(usuario_id, data, status, servico_id):
+    """Recalcula uma única linha do resumo a partir dos agendamentos da chave"""
+    if not (usuario_id and data and status and servico_id):
+        return
+
+    linhas = Agendamento.objects.filter(
+        criado_por_id=usuario_id,
+        data_agendamento=data,
+        status=status,
+        servico_id=servico_id,
+    ).annotate(receita=valor_efetivo()).values_list('hora_inicio', 'hora_fim', 'receita')
+
+    quantidade, minutos, faturamento = 0, 0, Decimal('0')
+    for hora_inicio, hora_fim, receita in linhas:
+        quantidade += 1
+        minutos += minutos_agendados(data, hora_inicio, hora_fim)
+        faturamento += receita or 0
+
+    filtro = {'usuario_id': usuario_id, 'data': data, 'status': status, 'servico_id': servico_id}
+    if quantidade == 0:
+        ResumoDiarioAgendamento.objects.filter(**filtro).delete()
+        return
+
+    ResumoDiarioAgendamento.objects.update_or_create(
+        **filtro,
+        defaults={'quantidade': quantidade, 'minutos': minutos, 'faturamento': faturamento},
+    )
+
+
+def recalcular_chaves(chaves):
+    """Recalcula um conjunto de chaves, ignorando repetidas"""
+    for chave in set(chaves):
+        recalcular_resumo(*chave)
+
+
+def recalcular_chaves_em_lote(chaves, batch_size=1000):
+    """
+    Recalcula várias chaves com um número fixo de consultas (para escritas
+    em massa, que não disparam signals): uma leitura dos agendamentos, uma
+    dos resumos existentes e as gravações em lote.
+    """
+    chaves = {chave for chave in chaves if all(chave)}
+    if not chaves:
+        return
+
+    usuarios, datas, status_, servicos = (set(parte) for parte in zip(*chaves))
+    acumulado = {chave: [0, 0, Decimal('0')] for chave in chaves}
+    linhas = Agendamento.objects.filter(
+        criado_por_id__in=usuarios,
+        data_agendamento__in=datas,
+        status__in=status_,
+        servico_id__in=servicos,
+    ).annotate(receita=valor_efetivo()).values_list(
+        'criado_por_id', 'data_agendamento', 'status', 'servico_id',
+        'hora_inicio', 'hora_fim', 'receita',
+    ).order_by()
+    for usuario_id, data, status, servico_id, hora_inicio, hora_fim, receita in linhas:
+        totais = acumulado.get((usuario_id, data, status, servico_id))
+        if totais is None:
+            continue
+        totais[0] += 1
+        totais[1] += minutos_agendados(data, hora_inicio, hora_fim)
+        totais[2] += receita or 0
+
+    existentes = {
+        (resumo.usuario_id, resumo.data, resumo.status, resumo.servico_id): resumo
+        for resumo in ResumoDiarioAgendamento.objects.filter(
+            usuario_id__in=usuarios, data__in=datas, status__in=status_, servico_id__in=servicos,
+        ).order_by()
+    }
+
+    novos, alterados, vazios = [], [], []
+    for chave, (quantidade, minutos, faturamento) in acumulado.items():
+        resumo = existentes.get(chave)
+        if quantidade == 0:
+            if resumo is not None:
+                vazios.append(resumo.pk)
+        elif resumo is None:
+            usuario_id, data, status, servico_id = chave
+            novos.append(ResumoDiarioAgendamento(
+                usuario_id=usuario_id, data=data, status=status, servico_id=servico_id,
+                quantidade=quantidade, minutos=minutos, faturamento=faturamento,
+            ))
+        else:
+            resumo.quantidade, resumo.minutos, resumo.faturamento = quantidade, minutos, faturamento
+            alterados.append(resumo)
+
+    with transaction.atomic():
+        if vazios:
+            ResumoDiarioAgendamento.objects.filter(pk__in=vazios).delete()
+        if alterados:
+            ResumoDiarioAgendamento.objects.bulk_update(
+                alterados, ['quantidade', 'minutos', 'faturamento'], batch_size=batch_size
+            )
+        if novos:
+            ResumoDiarioAgendamento.objects.bulk_create(novos, batch_size=batch_size)
+
+
+def reconstruir_resumos(usuario=None, chunk_size=2000, batch_size=1000):
+    """Reconstrói o resumo do zero (de um usuário ou de todos). Retorna o nº de linhas"""
+    agendamentos = Agendamento.objects.all()
+    resumos = ResumoDiarioAgendamento.objects.all()
+    if usuario is not None:
+        agendamentos = agendamentos.filter(criado_por=usuario)
+        resumos = resumos.filter(usuario=usuario)
+
+    acumulado = defaultdict(lambda: [0, 0, Decimal('0')])
+    linhas = agendamentos.annotate(receita=valor_efetivo()).values_list(
+        'criado_por_id', 'data_agendamento', 'status', 'servico_id',
+        'hora_inicio', 'hora_fim', 'receita',
+    ).order_by()
+
+    for usuario_id, data, status, servico_id, hora_inicio, hora_fim, receita in linhas.iterator(chunk_size=chunk_size):
+        totais = acumulado[(usuario_id, data, status, servico_id)]
+        totais[0] += 1
+        totais[1] += minutos_agendados(data, hora_inicio, hora_fim)
+        totais[2] += receita or 0
+
+    novos = [
+        ResumoDiarioAgendamento(
+            usuario_id=usuario_id, data=data, status=status, servico_id=servico_id,
+            quantidade=quantidade, minutos=minutos, faturamento=faturamento,
+        )
+        for (usuario_id, data, status, servico_id), (quantidade, minutos, faturamento) in acumulado.items()
+    ]
+
+    with transaction.atomic():
+        resumos.delete()
+        ResumoDiarioAgendamento.objects.bulk_create(novos, batch_size=batch_size)
+
+    return len(novos)
+
+
+def totais_por_dia(usuario, inicio, fim, campo='quantidade', status=None):
+    """Soma de `campo` por dia no período, lida do resumo: {data: total}"""
+    resumos = ResumoDiarioAgendamento.objects.filter(usuario=usuario, data__range=[inicio, fim])
+    if status:
+        resumos = resumos.filter(status=status)
+
+    return {
+        item['data']: item['total']
+        for item in resumos.values('data').annotate(total=Sum(campo)).order_by()
+    }
+
+
+def serie_diaria(usuario, inicio, fim, status=None):
+    """Gera (data, quantidade, faturamento) para cada dia do período, com zeros nos dias vazios"""
+    resumos = ResumoDiarioAgendamento.objects.filter(usuario=usuario, data__range=[inicio, fim])
+    if status:
+        resumos = resumos.filter(status=status)
+
+    totais = {
+        item['data']: (item['quantidade'], item['faturamento'])
+        for item in resumos.values('data').annotate(
+            quantidade=Sum('quantidade'), faturamento=Sum('faturamento')
+        ).order_by()
+    }
+
+    data = inicio
+    while data <= fim:
+        quantidade, faturamento = totais.get(data, (0, Decimal('0')))
+        yield data, quantidade, faturamento
+        data += timedelta(days=1)
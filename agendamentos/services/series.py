@@ -0,0 +1,92 @@
+"""
+Séries temporais densas para os gráficos (dia, semana ou mês).
+
+Os valores são acumulados em uma lista pré-dimensionada com uma única
+passada sobre os dados; dias/semanas/meses sem registro ficam com zero.
+Para períodos longos a granularidade sobe automaticamente, mantendo o
+número de pontos do gráfico sob controle.
+"""
+
+import json
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+DIA = 'dia'
+SEMANA = 'semana'
+MES = 'mes'
+GRANULARIDADES = (DIA, SEMANA, MES)
+
+# Limites (em dias) para a escolha automática da granularidade
+LIMITE_DIARIO = 92
+LIMITE_SEMANAL = 730
+
+
+@dataclass
+class SerieTemporal:
+    """Rótulos e valores prontos para serializar"""
+    granularidade: str
+    categorias: list = field(default_factory=list)
+    valores: list = field(default_factory=list)
+
+    def as_json(self):
+        """Formato esperado pelos templates (listas já serializadas em JSON)"""
+        return {
+            'categorias': json.dumps(self.categorias),
+            'valores': json.dumps(self.valores),
+            'granularidade': self.granularidade,
+        }
+
+
+def escolher_granularidade(inicio, fim, granularidade=None):
+    """Usa a granularidade pedida se válida; senão escolhe pelo tamanho do período"""
+    if granularidade in GRANULARIDADES:
+        return granularidade
+    dias = (fim - inicio).days + 1
+    if dias <= LIMITE_DIARIO:
+        return DIA
+    if dias <= LIMITE_SEMANAL:
+        return SEMANA
+    return MES
+
+
+def _inicio_semana(data):
+    return data - timedelta(days=data.weekday())
+
+
+def _indice(data, inicio, granularidade):
+    if granularidade == DIA:
+        return (data - inicio).days
+    if granularidade == SEMANA:
+        return (_inicio_semana(data) - _inicio_semana(inicio)).days // 7
+    return (data.year - inicio.year) * 12 + data.month - inicio.month
+
+
+def _rotulos(inicio, total, granularidade):
+    if granularidade == DIA:
+        return [(inicio + timedelta(days=i)).strftime('%d/%m') for i in range(total)]
+    if granularidade == SEMANA:
+        semana = _inicio_semana(inicio)
+        return [(semana + timedelta(weeks=i)).strftime('%d/%m') for i in range(total)]
+    rotulos = []
+    ano, mes = inicio.year, inicio.month
+    for _ in range(total):
+        rotulos.append(f'{mes:02d}/{ano}')
+        ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+    return rotulos
+
+
+def montar_serie(inicio, fim, totais, granularidade=None):
+    """
+    Agrupa `totais` ({data: valor}) em buckets de `inicio` a `fim`.
+
+    Datas fora do período são ignoradas.
+    """
+    granularidade = escolher_granularidade(inicio, fim, granularidade)
+    total = _indice(fim, inicio, granularidade) + 1
+    valores = [0] * total
+
+    for data, valor in totais.items():
+        if inicio <= data <= fim and valor:
+            valores[_indice(data, inicio, granularidade)] += valor
+
+    return SerieTemporal(granularidade, _rotulos(inicio, total, granularidade), valores)
@@ -0,0 +1,60 @@
+"""
+Alteração de status de vários agendamentos de uma vez.
+
+Um único UPDATE aplica o novo status e atualiza atualizado_em; as regras
+de pode_editar() e pode_cancelar() entram no WHERE
+(AgendamentoQuerySet.podem_mudar_para). Cada transição ganha uma linha em
+AgendamentoStatusHistorico, gravadas com um bulk_create. Como update() não
+dispara signals, o resumo diário, os contadores dos clientes, o dashboard
+e os mapas de ocupação são atualizados aqui uma única vez.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Agendamento, AgendamentoStatusHistorico
+from .cache_dashboard import invalidar_dashboard
+from .estatisticas_cliente import atualizar_contadores
+from .ocupacao import invalidar_ocupacao
+from .resumo_diario import recalcular_chaves_em_lote
+
+
+def alterar_status_em_lote(usuario, queryset, status, observacao='', batch_size=1000):
+    """
+    Passa para `status` os agendamentos do usuário em `queryset` que
+    permitem a mudança. Retorna quantos foram alterados.
+    """
+    alvo = queryset.filter(criado_por=usuario).podem_mudar_para(status).order_by()
+
+    with transaction.atomic():
+        # Trava as linhas para que o status anterior registrado seja o substituído
+        linhas = list(alvo.select_for_update(of=('self',)).values_list(
+            'pk', 'status', 'data_agendamento', 'servico_id', 'cliente_id'
+        ))
+        if not linhas:
+            return 0
+
+        agora = timezone.now()
+        alterados = Agendamento.objects.filter(pk__in=[linha[0] for linha in linhas]).update(
+            status=status, atualizado_em=agora
+        )
+        AgendamentoStatusHistorico.objects.bulk_create(
+            [
+                AgendamentoStatusHistorico(
+                    agendamento_id=pk, status_anterior=status_anterior, status_novo=status,
+                    observacao=observacao, criado_em=agora, criado_por=usuario,
+                )
+                for pk, status_anterior, _, _, _ in linhas
+            ],
+            batch_size=batch_size,
+        )
+        recalcular_chaves_em_lote(
+            (usuario.pk, data, status_chave, servico_id)
+            for _, status_anterior, data, servico_id, _ in linhas
+            for status_chave in (status_anterior, status)
+        )
+        atualizar_contadores({linha[4] for linha in linhas})
+
+    invalidar_dashboard(usuario.pk)
+    invalidar_ocupacao(usuario.pk, {linha[2] for linha in linhas})
+    return alterados
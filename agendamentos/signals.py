@@ -0,0 +1,141 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Agendamento, Cliente, TipoServico
+from .services.cache_dashboard import invalidar_dashboard
+from .services.contagem import invalidar_total
+from .services.estatisticas_cliente import aplicar_variacao, atualizar_contadores
+from .services.ocupacao import invalidar_ocupacao
+from .services.resumo_diario import chave_resumo, recalcular_chaves, recalcular_chaves_em_lote, valor_efetivo
+
+
+@receiver(pre_save, sender=Agendamento)
+def guardar_chave_anterior(sender, instance, raw=False, **kwargs):
+    """Guarda a chave de resumo atual do registro antes de ser alterado"""
+    instance._chave_resumo_anterior = None
+    instance._parcela_anterior = None
+    if raw or not instance.pk:
+        return
+    anterior = Agendamento.objects.filter(pk=instance.pk).annotate(receita=valor_efetivo()).values_list(
+        'criado_por_id', 'data_agendamento', 'status', 'servico_id', 'cliente_id', 'receita'
+    ).first()
+    if anterior:
+        usuario_id, data, status, servico_id, cliente_id, receita = anterior
+        instance._chave_resumo_anterior = (usuario_id, data, status, servico_id)
+        instance._parcela_anterior = (cliente_id, status, data, receita)
+
+
+@receiver(post_save, sender=Agendamento)
+def atualizar_resumo_apos_salvar(sender, instance, raw=False, **kwargs):
+    """Mantém o resumo diário em dia quando um agendamento é criado ou editado"""
+    if raw:
+        return
+    chaves = [chave_resumo(instance)]
+    anterior = getattr(instance, '_chave_resumo_anterior', None)
+    if anterior:
+        chaves.append(anterior)
+    recalcular_chaves(chaves)
+
+
+@receiver(post_delete, sender=Agendamento)
+def atualizar_resumo_apos_excluir(sender, instance, **kwargs):
+    """Remove a contribuição de um agendamento excluído do resumo diário"""
+    recalcular_chaves([chave_resumo(instance)])
+
+
+@receiver(pre_save, sender=TipoServico)
+def guardar_preco_anterior(sender, instance, raw=False, **kwargs):
+    """Guarda o preço atual do serviço antes de ser alterado"""
+    instance._preco_anterior = None
+    if raw or not instance.pk:
+        return
+    instance._preco_anterior = TipoServico.objects.filter(pk=instance.pk).values_list('preco', flat=True).first()
+
+
+@receiver(post_save, sender=TipoServico)
+def recalcular_apos_mudar_preco(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Agendamentos sem valor_cobrado faturam pelo preço do serviço: se ele
+    mudou, recalcula as chaves de resumo e os contadores dos clientes
+    desses agendamentos
+    """
+    anterior = getattr(instance, '_preco_anterior', None)
+    if created or raw or anterior is None or anterior == instance.preco:
+        return
+    linhas = list(Agendamento.objects.filter(
+        servico=instance, valor_cobrado__isnull=True
+    ).values_list('criado_por_id', 'data_agendamento', 'status', 'servico_id', 'cliente_id').distinct().order_by())
+    recalcular_chaves_em_lote(linha[:4] for linha in linhas)
+    atualizar_contadores(linha[4] for linha in linhas)
+
+
+def parcela_contadores(agendamento):
+    """(cliente_id, status, data, receita) do agendamento, como guardado no pre_save"""
+    receita = agendamento.valor_cobrado
+    if receita is None and agendamento.servico_id:
+        receita = agendamento.servico.preco
+    return (agendamento.cliente_id, agendamento.status, agendamento.data_agendamento, receita)
+
+
+@receiver(post_save, sender=Agendamento)
+def atualizar_contadores_apos_salvar(sender, instance, raw=False, **kwargs):
+    """Aplica nos contadores do cliente a diferença entre o agendamento antes e depois"""
+    if raw:
+        return
+    aplicar_variacao(getattr(instance, '_parcela_anterior', None), parcela_contadores(instance))
+
+
+@receiver(pre_delete, sender=Agendamento)
+def guardar_parcela_excluida(sender, instance, **kwargs):
+    """Parcela gravada no banco (a instância em memória pode estar desatualizada)"""
+    instance._parcela_anterior = Agendamento.objects.filter(pk=instance.pk).annotate(
+        receita=valor_efetivo()
+    ).values_list('cliente_id', 'status', 'data_agendamento', 'receita').first()
+
+
+@receiver(post_delete, sender=Agendamento)
+def atualizar_contadores_apos_excluir(sender, instance, **kwargs):
+    """Retira o agendamento excluído dos contadores do cliente"""
+    aplicar_variacao(getattr(instance, '_parcela_anterior', None), None)
+
+
+@receiver(post_save, sender=Agendamento)
+@receiver(post_delete, sender=Agendamento)
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+@receiver(post_save, sender=TipoServico)
+@receiver(post_delete, sender=TipoServico)
+def invalidar_cache_dashboard(sender, instance, raw=False, **kwargs):
+    """Qualquer escrita do usuário invalida o dashboard em cache"""
+    if raw:
+        return
+    invalidar_dashboard(instance.criado_por_id)
+
+
+@receiver(post_save, sender=Agendamento)
+@receiver(post_save, sender=Cliente)
+@receiver(post_save, sender=TipoServico)
+def invalidar_total_apos_criar(sender, instance, created=False, raw=False, **kwargs):
+    """Novos registros mudam o total (sem filtros) das listagens do usuário"""
+    if created and not raw:
+        invalidar_total(sender, instance.criado_por_id)
+
+
+@receiver(post_delete, sender=Agendamento)
+@receiver(post_delete, sender=Cliente)
+@receiver(post_delete, sender=TipoServico)
+def invalidar_total_apos_excluir(sender, instance, **kwargs):
+    invalidar_total(sender, instance.criado_por_id)
+
+
+@receiver(post_save, sender=Agendamento)
+@receiver(post_delete, sender=Agendamento)
+def invalidar_disponibilidade(sender, instance, raw=False, **kwargs):
+    """Descarta o mapa de ocupação do dia do agendamento (e do dia anterior à edição)"""
+    if raw:
+        return
+    datas = [instance.data_agendamento]
+    anterior = getattr(instance, '_chave_resumo_anterior', None)
+    if anterior:
+        datas.append(anterior[1])
+    invalidar_ocupacao(instance.criado_por_id, datas)
@@ -1,3 +1,1392 @@
-from django.test import TestCase
+import importlib
+import threading
+import time as relogio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+import os
+import tempfile
+from io import StringIO
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, models, transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .forms import AgendamentoForm, AgendamentoStatusForm
+from .models import (
+    RESTRICAO_HORARIO_UNICO, STATUS_ATIVOS, Agendamento, AgendamentoStatusHistorico, Cliente, ConfiguracaoHorario, ResumoDiarioAgendamento, SerieRecorrente,
+    TipoServico, restricao_violada,
+)
+from .services.busca import BuscaClientesTrigram, buscar_por_digitos, escapar_like
+from .services.cache_dashboard import (
+    CHAVE_HITS, CHAVE_MISSES, estatisticas_cache_dashboard, segundos_ate_meia_noite,
+)
+from .services.contagem import estimativa_planejador
+from .services.estatisticas_cliente import atualizar_contadores
+from .services.disponibilidade import disponibilidade, horario_funcionamento, horarios_livres
+from .services.ocupacao import FAIXAS_POR_DIA, mapas_ocupacao, mascara
+from .services.importacao import importar_agendamentos, importar_clientes
+from .services.kpis import calcular_kpis_dashboard
+from .services.recorrencia import criar_serie, datas_da_serie
+from .services.status_lote import alterar_status_em_lote
+from .services.series import escolher_granularidade, montar_serie
+from .paginacao import codificar_cursor
+from .views import ClienteListView, RelatoriosView
+
+
+class AgendamentosTestMixin:
+    """Fixtures compartilhadas pelos testes do app"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='recepcao', password='senha-teste-123')
+        cls.outro_user = User.objects.create_user(username='outro', password='senha-teste-123')
+        cls.cliente = cls.criar_cliente(cls.user, 'Maria Silva', '123.456.789-01')
+        cls.servico = TipoServico.objects.create(
+            nome='Corte', duracao=timedelta(minutes=30), preco=Decimal('50.00'), criado_por=cls.user
+        )
+
+    @staticmethod
+    def criar_cliente(user, nome, cpf, email=None, telefone='(11) 99999-9999'):
+        return Cliente.objects.create(
+            nome=nome,
+            email=email or f"{cpf.replace('.', '').replace('-', '')}@exemplo.com",
+            telefone=telefone,
+            cpf=cpf,
+            data_nascimento=date(1990, 1, 1),
+            criado_por=user,
+        )
+
+    def criar_agendamento(self, data, hora, status='agendado', servico=None, cliente=None,
+                          valor_cobrado=None, user=None):
+        """Cria o agendamento sem passar por full_clean (permite datas passadas)"""
+        servico = servico or self.servico
+        agendamento = Agendamento(
+            cliente=cliente or self.cliente,
+            servico=servico,
+            data_agendamento=data,
+            hora_inicio=hora,
+            hora_fim=(datetime.combine(data, hora) + servico.duracao).time(),
+            status=status,
+            valor_cobrado=valor_cobrado,
+            criado_por=user or self.user,
+        )
+        models.Model.save(agendamento)
+        return agendamento
+
+
+class KpisDashboardTests(AgendamentosTestMixin, TestCase):
+
+    def test_kpis_batem_com_contagens_individuais(self):
+        hoje = timezone.now().date()
+        inicio_mes = hoje.replace(day=1)
+        self.criar_agendamento(hoje, time(9, 0))
+        self.criar_agendamento(hoje, time(10, 0), status='concluido')
+        self.criar_agendamento(inicio_mes, time(11, 0), status='cancelado')
+        self.criar_agendamento(hoje + timedelta(days=40), time(9, 0), status='nao_compareceu')
+        self.criar_agendamento(hoje - timedelta(days=60), time(9, 0), status='concluido')
+        self.criar_agendamento(hoje, time(12, 0), user=self.outro_user)
+
+        agendamentos = Agendamento.objects.filter(criado_por=self.user)
+        inicio_semana = hoje - timedelta(days=hoje.weekday())
+        mes = agendamentos.filter(data_agendamento__gte=inicio_mes)
+
+        with self.assertNumQueries(2):
+            kpis = calcular_kpis_dashboard(self.user, hoje)
+
+        self.assertEqual(kpis.agendamentos_hoje, agendamentos.filter(data_agendamento=hoje).count())
+        self.assertEqual(kpis.agendamentos_semana, agendamentos.filter(
+            data_agendamento__range=[inicio_semana, inicio_semana + timedelta(days=6)]
+        ).count())
+        self.assertEqual(kpis.agendamentos_pendentes, agendamentos.filter(status='agendado').count())
+        self.assertEqual(kpis.agendamentos_mes_total, mes.count())
+        self.assertEqual(kpis.agendamentos_mes_realizados, mes.filter(status='concluido').count())
+        self.assertEqual(kpis.agendamentos_mes_cancelados, mes.filter(
+            status__in=['cancelado', 'nao_compareceu']
+        ).count())
+        self.assertEqual(kpis.total_clientes, 1)
+        self.assertEqual(kpis.taxa_comparecimento, round(1 / mes.count() * 100, 1))
+
+    def test_dashboard_usa_kpis(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.criar_agendamento(timezone.localdate(), time(9, 0))
+
+        response = self.client.get('/dashboard/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['agendamentos_hoje'], 1)
+        self.assertEqual(response.context['total_clientes'], 1)
+        self.assertEqual(response.context['taxa_comparecimento'], 0)
+
+
+class ResumoDiarioTests(AgendamentosTestMixin, TestCase):
+
+    def resumo(self):
+        return {
+            (r.data, r.status, r.servico_id): (r.quantidade, r.minutos, r.faturamento)
+            for r in ResumoDiarioAgendamento.objects.filter(usuario=self.user)
+        }
+
+    def test_resumo_acompanha_criacao_edicao_e_exclusao(self):
+        dia = timezone.now().date() + timedelta(days=1)
+        primeiro = self.criar_agendamento(dia, time(9, 0))
+        self.criar_agendamento(dia, time(10, 0), valor_cobrado=Decimal('80.00'))
+
+        self.assertEqual(self.resumo(), {
+            (dia, 'agendado', self.servico.pk): (2, 60, Decimal('130.00')),
+        })
+
+        primeiro.status = 'concluido'
+        primeiro.save()
+        self.assertEqual(self.resumo(), {
+            (dia, 'agendado', self.servico.pk): (1, 30, Decimal('80.00')),
+            (dia, 'concluido', self.servico.pk): (1, 30, Decimal('50.00')),
+        })
+
+        primeiro.delete()
+        self.assertEqual(self.resumo(), {
+            (dia, 'agendado', self.servico.pk): (1, 30, Decimal('80.00')),
+        })
+
+    def test_reconstruir_resumo_gera_o_mesmo_resultado(self):
+        dia = timezone.now().date()
+        self.criar_agendamento(dia, time(9, 0), status='concluido')
+        self.criar_agendamento(dia - timedelta(days=3), time(9, 0))
+        esperado = self.resumo()
+
+        ResumoDiarioAgendamento.objects.all().delete()
+        call_command('reconstruir_resumo_diario', stdout=StringIO())
+
+        self.assertEqual(self.resumo(), esperado)
+
+    def test_migracao_preenche_resumo_existente(self):
+        dia = timezone.now().date()
+        self.criar_agendamento(dia, time(9, 0), status='concluido')
+        self.criar_agendamento(dia, time(10, 0), valor_cobrado=Decimal('80.00'))
+        esperado = self.resumo()
+
+        ResumoDiarioAgendamento.objects.all().delete()
+        migracao = importlib.import_module('agendamentos.migrations.0003_resumodiarioagendamento')
+        migracao.preencher_resumos(django_apps, None)
+
+        self.assertEqual(self.resumo(), esperado)
+
+    def test_mudanca_de_preco_recalcula_agendamentos_sem_valor_cobrado(self):
+        dia = timezone.now().date()
+        self.criar_agendamento(dia, time(9, 0), status='concluido')
+        self.criar_agendamento(dia, time(10, 0), status='concluido', valor_cobrado=Decimal('80.00'))
+
+        self.servico.preco = Decimal('70.00')
+        self.servico.save()
+        self.assertEqual(self.resumo(), {
+            (dia, 'concluido', self.servico.pk): (2, 60, Decimal('150.00')),
+        })
+
+
+@override_settings(AGENDAMENTOS_ESTATISTICAS_CACHE=True)
+class CacheDashboardTests(AgendamentosTestMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    @override_settings(AGENDAMENTOS_ESTATISTICAS_CACHE=False)
+    def test_sem_estatisticas_leitura_nao_escreve_no_cache(self):
+        self.client.get('/dashboard/')
+        self.client.get('/dashboard/')
+        self.assertIsNone(cache.get(CHAVE_HITS))
+        self.assertIsNone(cache.get(CHAVE_MISSES))
+        self.assertFalse(estatisticas_cache_dashboard()['habilitadas'])
+
+    def test_segunda_visita_usa_cache_e_escrita_invalida(self):
+        self.client.get('/dashboard/')
+        self.client.get('/dashboard/')
+        self.assertEqual(estatisticas_cache_dashboard()['hits'], 1)
+        self.assertEqual(estatisticas_cache_dashboard()['misses'], 1)
+
+        self.criar_agendamento(timezone.localdate(), time(9, 0))
+        response = self.client.get('/dashboard/')
+
+        self.assertEqual(response.context['agendamentos_hoje'], 1)
+        self.assertEqual(estatisticas_cache_dashboard()['misses'], 2)
+
+    def test_escrita_de_outro_usuario_nao_invalida(self):
+        self.client.get('/dashboard/')
+        self.criar_agendamento(timezone.localdate(), time(9, 0), user=self.outro_user)
+        self.client.get('/dashboard/')
+        self.assertEqual(estatisticas_cache_dashboard()['hits'], 1)
+
+    def test_expira_na_meia_noite_local(self):
+        agora = timezone.make_aware(datetime(2025, 3, 10, 23, 0))
+        self.assertEqual(segundos_ate_meia_noite(agora), 3600)
+
+
+class RelatoriosTests(AgendamentosTestMixin, TestCase):
+
+    def contexto_relatorio(self, **params):
+        request = RequestFactory().get('/relatorios/', params)
+        request.user = self.user
+        view = RelatoriosView()
+        view.setup(request)
+        return view.get_context_data()
+
+    def test_receita_usa_preco_do_servico_quando_sem_valor_cobrado(self):
+        hoje = timezone.localdate()
+        agendamento = self.criar_agendamento(hoje, time(9, 0), status='concluido')
+        Agendamento.objects.filter(pk=agendamento.pk).update(valor_cobrado=None)
+        self.criar_agendamento(hoje, time(10, 0), status='concluido', valor_cobrado=Decimal('80.00'))
+
+        kpis = self.contexto_relatorio()['kpis_financeiros']
+
+        self.assertEqual(kpis['faturamento_total'], 130.0)
+        self.assertEqual(kpis['ticket_medio'], 65.0)
+        self.assertEqual(kpis['faturamento_mensal'][-1]['valor'], 130.0)
+
+    def test_numero_de_consultas_independe_do_periodo(self):
+        hoje = timezone.localdate()
+        for dias in range(0, 400, 7):
+            agendamento = self.criar_agendamento(hoje - timedelta(days=dias), time(9, 0), status='concluido')
+            if dias % 2:
+                Agendamento.objects.filter(pk=agendamento.pk).update(valor_cobrado=None)
+
+        inicio_longo = (hoje - timedelta(days=400)).isoformat()
+        with self.assertNumQueries(5):
+            self.contexto_relatorio(data_inicio=inicio_longo, data_fim=hoje.isoformat())
+        with self.assertNumQueries(5):
+            self.contexto_relatorio()
+
+
+class ExportacaoCsvTests(AgendamentosTestMixin, TestCase):
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def conteudo(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+
+    def test_exporta_agendamentos_respeitando_filtros(self):
+        hoje = timezone.localdate()
+        self.criar_agendamento(hoje, time(9, 0), status='concluido')
+        self.criar_agendamento(hoje, time(10, 0))
+
+        response = self.client.get('/agendamentos/exportar/', {'status': 'concluido'})
+        linhas = self.conteudo(response)
+
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(len(linhas), 2)
+        self.assertIn('Maria Silva', linhas[1])
+        self.assertIn('Concluído', linhas[1])
+
+    def test_exporta_clientes_e_serie_do_relatorio(self):
+        hoje = timezone.localdate()
+        self.criar_agendamento(hoje, time(9, 0), status='concluido')
+
+        clientes = self.conteudo(self.client.get('/clientes/exportar/'))
+        serie = self.conteudo(self.client.get('/relatorios/exportar/', {
+            'data_inicio': hoje.isoformat(), 'data_fim': hoje.isoformat(),
+        }))
+
+        self.assertEqual(len(clientes), 2)
+        self.assertEqual(serie[1], f"{hoje.strftime('%d/%m/%Y')};1;50,00")
+
+
+class SeriesTemporaisTests(TestCase):
+
+    def test_preenche_dias_vazios_com_zero(self):
+        serie = montar_serie(date(2025, 1, 30), date(2025, 2, 2), {date(2025, 1, 31): 3})
+
+        self.assertEqual(serie.granularidade, 'dia')
+        self.assertEqual(serie.categorias, ['30/01', '31/01', '01/02', '02/02'])
+        self.assertEqual(serie.valores, [0, 3, 0, 0])
+
+    def test_granularidade_automatica_por_tamanho_do_periodo(self):
+        self.assertEqual(escolher_granularidade(date(2025, 1, 1), date(2025, 3, 31)), 'dia')
+        self.assertEqual(escolher_granularidade(date(2024, 1, 1), date(2025, 6, 30)), 'semana')
+        self.assertEqual(escolher_granularidade(date(2020, 1, 1), date(2025, 1, 1)), 'mes')
+        self.assertEqual(escolher_granularidade(date(2020, 1, 1), date(2025, 1, 1), 'dia'), 'dia')
+
+    def test_agrupa_por_semana_e_mes(self):
+        totais = {date(2025, 1, 6): 1, date(2025, 1, 12): 2, date(2025, 1, 13): 4, date(2025, 3, 1): 8}
+
+        semanal = montar_serie(date(2025, 1, 8), date(2025, 1, 20), totais, 'semana')
+        mensal = montar_serie(date(2024, 12, 15), date(2025, 3, 1), totais, 'mes')
+
+        self.assertEqual(semanal.categorias, ['06/01', '13/01', '20/01'])
+        self.assertEqual(semanal.valores, [2, 4, 0])
+        self.assertEqual(mensal.categorias, ['12/2024', '01/2025', '02/2025', '03/2025'])
+        self.assertEqual(mensal.valores, [0, 7, 0, 8])
+
+
+class PaginacaoCursorTests(AgendamentosTestMixin, TestCase):
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def percorrer(self, url, parametros=''):
+        """Segue os links de próxima página e devolve as páginas visitadas"""
+        paginas = []
+        proxima = f'{url}?paginacao=cursor{parametros}'
+        while proxima:
+            response = self.client.get(proxima if proxima.startswith('/') else f'{url}{proxima}')
+            paginas.append(response)
+            proxima = response.context['cursor_proximo_url']
+        return paginas
+
+    def test_percorre_agendamentos_sem_repetir_nem_pular(self):
+        hoje = timezone.localdate()
+        for i in range(45):
+            self.criar_agendamento(hoje - timedelta(days=i // 3), time(8 + i % 3, 0))
+
+        paginas = self.percorrer('/agendamentos/')
+        ids = [a.pk for pagina in paginas for a in pagina.context['agendamentos']]
+
+        esperado = list(Agendamento.objects.filter(criado_por=self.user).order_by(
+            '-data_agendamento', '-hora_inicio', '-id'
+        ).values_list('pk', flat=True))
+        self.assertEqual(len(paginas), 3)
+        self.assertEqual(ids, esperado)
+        self.assertNotIn('total_agendamentos', paginas[-1].context)
+
+        anterior = self.client.get(f"/agendamentos/{paginas[-1].context['cursor_anterior_url']}")
+        self.assertEqual(
+            [a.pk for a in anterior.context['agendamentos']],
+            [a.pk for a in paginas[1].context['agendamentos']],
+        )
+
+    def test_pagina_profunda_custa_o_mesmo_que_a_primeira(self):
+        for i in range(60):
+            self.criar_cliente(self.user, f'Cliente {i:03d}', f'{i:03d}.000.000-00')
+
+        primeira = self.client.get('/clientes/?paginacao=cursor')
+        with CaptureQueriesContext(connection) as consultas_primeira:
+            self.client.get('/clientes/?paginacao=cursor')
+        with CaptureQueriesContext(connection) as consultas_segunda:
+            self.client.get(f"/clientes/{primeira.context['cursor_proximo_url']}")
+
+        self.assertEqual(len(consultas_primeira), len(consultas_segunda))
+        self.assertFalse(any('COUNT' in q['sql'] and 'agendamentos_cliente' in q['sql'].split('WHERE')[0]
+                             for q in consultas_segunda))
+
+    def test_token_de_outra_listagem_ou_adulterado_volta_a_primeira_pagina(self):
+        for i in range(25):
+            self.criar_cliente(self.user, f'Cliente {i:03d}', f'{i:03d}.000.000-00')
+        token_clientes = self.client.get('/clientes/?paginacao=cursor').context['cursor_proximo_url']
+
+        response = self.client.get(f'/agendamentos/{token_clientes}')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['cursor_anterior_url'])
+
+        visao = ClienteListView()
+        visao.request = RequestFactory().get('/clientes/')
+        for valores in (['Cliente 001', 'abc'], ['Cliente 001']):
+            token = codificar_cursor(valores, 'proxima', salt=visao.salt_cursor())
+            response = self.client.get(f'/clientes/?paginacao=cursor&cursor={token}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context['clientes'][0].nome, 'Cliente 000')
+
+    def test_clientes_por_cursor_em_cada_ordenacao_e_na_busca(self):
+        for i in range(25):
+            cliente = self.criar_cliente(self.user, f'Cliente {i:03d}', f'{i:03d}.000.000-00')
+            Cliente.objects.filter(pk=cliente.pk).update(faturamento_total=Decimal(i % 4), total_visitas=i % 3)
+
+        for ordenar in ('nome', 'visitas', 'faturamento', 'ultima_visita'):
+            paginas = self.percorrer('/clientes/', f'&ordenar={ordenar}')
+            ids = [c.pk for pagina in paginas for c in pagina.context['clientes']]
+            self.assertEqual(len(paginas), 2)
+            self.assertEqual(sorted(ids), sorted(Cliente.objects.filter(criado_por=self.user).values_list('pk', flat=True)))
+
+        # Token da ordenação por nome reenviado com outra ordenação: volta à primeira página
+        token = self.client.get('/clientes/?paginacao=cursor').context['cursor_proximo_url']
+        response = self.client.get(f'/clientes/{token}&ordenar=visitas')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['cursor_anterior_url'])
+
+        # Na busca o cursor segue a ordem de relevância
+        busca = self.client.get('/clientes/', {'search': 'cliente'}).context['clientes']
+        paginas = self.percorrer('/clientes/', '&search=cliente')
+        self.assertEqual(
+            [c.pk for pagina in paginas for c in pagina.context['clientes']][:20],
+            [c.pk for c in busca],
+        )
+
+
+class IndicesAgendamentoTests(AgendamentosTestMixin, TestCase):
+    """Garante (via EXPLAIN) que cada consulta quente usa o índice criado para ela"""
+
+    # consulta -> índices aceitos por banco
+    INDICES_ESPERADOS = {
+        'listagem': {'sqlite': ('agend_usuario_data_idx',), 'postgresql': ('agend_usuario_data_idx',)},
+        'pendentes': {'sqlite': ('agend_usuario_status_idx',), 'postgresql': ('agend_usuario_status_idx',)},
+        'relatorio': {'sqlite': ('agend_usuario_status_idx',), 'postgresql': ('agend_usuario_status_idx',)},
+        # No SQLite o índice parcial só é usado com literais; com parâmetros o IN é expandido sobre
+        # (criado_por, status, data)
+        'conflito': {
+            'sqlite': ('agend_ativos_idx', 'agend_usuario_status_idx'),
+            'postgresql': ('agend_ativos_idx',),
+        },
+        'cliente': {'sqlite': ('agend_cliente_status_idx',), 'postgresql': ('agend_cliente_status_idx',)},
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        clientes = [
+            cls.criar_cliente(cls.user, f'Cliente {i}', f'{i:03d}.111.111-11') for i in range(20)
+        ]
+        status = ['concluido'] * 6 + ['agendado', 'confirmado', 'cancelado', 'nao_compareceu']
+        Agendamento.objects.bulk_create([
+            Agendamento(
+                cliente=clientes[i % 20], servico=cls.servico, criado_por=cls.user,
+                data_agendamento=date(2024, 1, 1) + timedelta(days=i // 10),
+                hora_inicio=time(8 + i % 10), hora_fim=time(8 + i % 10, 30),
+                status=status[i % 10],
+            )
+            for i in range(2000)
+        ])
+        cls.cliente_consulta = clientes[0]
+
+    def consultas_quentes(self):
+        agendamentos = Agendamento.objects.filter(criado_por=self.user)
+        return {
+            'listagem': agendamentos.order_by('-data_agendamento', '-hora_inicio'),
+            'pendentes': agendamentos.filter(status='agendado').order_by(),
+            'relatorio': agendamentos.filter(
+                status='concluido', data_agendamento__range=[date(2024, 3, 1), date(2024, 6, 1)]
+            ).order_by(),
+            'conflito': agendamentos.filter(
+                data_agendamento=date(2024, 3, 1), status__in=STATUS_ATIVOS
+            ).order_by(),
+            'cliente': Agendamento.objects.filter(cliente=self.cliente_consulta, status='concluido').order_by(),
+        }
+
+    def test_consultas_quentes_usam_seus_indices(self):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest('EXPLAIN verificado apenas em SQLite e PostgreSQL')
+
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('ANALYZE')
+            else:
+                # Em tabelas pequenas o Postgres preferiria seq scan
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+        for nome, queryset in self.consultas_quentes().items():
+            plano = queryset.explain()
+            aceitos = self.INDICES_ESPERADOS[nome][connection.vendor]
+            with self.subTest(consulta=nome):
+                self.assertTrue(any(indice in plano for indice in aceitos), plano)
+
+
+class ConsultasPorPaginaTests(AgendamentosTestMixin, TestCase):
+    """O número de consultas das telas não pode crescer com a quantidade de agendamentos exibidos"""
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        # Primeira requisição cria as preferências do usuário; não entra na contagem
+        self.client.get('/dashboard/')
+
+    def criar_varios(self, quantidade, inicio=0):
+        hoje = timezone.localdate()
+        for i in range(inicio, inicio + quantidade):
+            cliente = self.criar_cliente(self.user, f'Cliente {i}', f'{i:03d}.222.222-22')
+            self.criar_agendamento(hoje + timedelta(days=i // 10), time(8 + i % 10), cliente=cliente)
+
+    def contar_consultas(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(consultas)
+
+    def test_listagem_e_dashboard_com_consultas_constantes(self):
+        self.criar_varios(2)
+        poucos = {url: self.contar_consultas(url) for url in ('/agendamentos/', '/dashboard/')}
+
+        self.criar_varios(18, inicio=2)
+        muitos = {url: self.contar_consultas(url) for url in ('/agendamentos/', '/dashboard/')}
+
+        self.assertEqual(poucos, muitos)
+
+    def test_historico_do_cliente_com_consultas_constantes(self):
+        hoje = timezone.localdate()
+        self.criar_agendamento(hoje, time(8, 0))
+        poucos = self.contar_consultas(f'/clientes/{self.cliente.pk}/')
+
+        for i in range(1, 10):
+            self.criar_agendamento(hoje + timedelta(days=i), time(8, 0))
+        muitos = self.contar_consultas(f'/clientes/{self.cliente.pk}/')
+
+        self.assertEqual(poucos, muitos)
+
+
+class BuscaClientesTests(AgendamentosTestMixin, TestCase):
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def buscar(self, termo, **params):
+        response = self.client.get('/clientes/', {'search': termo, **params})
+        self.assertEqual(response.status_code, 200)
+        return [cliente.nome for cliente in response.context['clientes']]
+
+    def test_busca_ignora_acentos_e_aceita_prefixo(self):
+        self.criar_cliente(self.user, 'José Conceição', '111.111.111-11')
+        self.criar_cliente(self.user, 'Joana Lima', '222.222.222-22')
+        self.criar_cliente(self.outro_user, 'José Outro', '333.333.333-33')
+
+        self.assertEqual(self.buscar('jose conceicao'), ['José Conceição'])
+        self.assertEqual(sorted(self.buscar('jo')), ['Joana Lima', 'José Conceição'])
+        self.assertEqual(self.buscar('JOSÉ', status='inativo'), [])
+
+    def test_busca_por_email_e_telefone(self):
+        self.criar_cliente(self.user, 'Ana', '111.111.111-11', email='ana.paula@clinica.com',
+                           telefone='(21) 98888-7777')
+
+        self.assertEqual(self.buscar('ana.paula@clinica'), ['Ana'])
+        self.assertEqual(self.buscar('(21) 98888-7777'), ['Ana'])
+
+    def test_resultados_ordenados_por_relevancia(self):
+        self.criar_cliente(self.user, 'Maria Carvalho', '111.111.111-11')
+        self.criar_cliente(self.user, 'Carvalho Carvalho', '222.222.222-22', email='carvalho@exemplo.com')
+
+        self.assertEqual(self.buscar('carvalho'), ['Carvalho Carvalho', 'Maria Carvalho'])
+
+    def test_busca_trecho_no_meio_da_palavra(self):
+        self.criar_cliente(self.user, 'Pedro Santos', '222.222.222-22')
+        self.criar_cliente(self.outro_user, 'Paulo Santana', '333.333.333-33')
+
+        self.assertEqual(self.buscar('ilva'), ['Maria Silva'])
+        self.assertEqual(self.buscar('anto'), ['Pedro Santos'])
+        self.assertEqual(self.buscar('anto', status='inativo'), [])
+
+    def test_indice_acompanha_edicoes_e_exclusoes(self):
+        cliente = self.criar_cliente(self.user, 'Pedro Alves', '111.111.111-11')
+        cliente.nome = 'Pedro Álvares'
+        cliente.save()
+
+        self.assertEqual(self.buscar('alvares'), ['Pedro Álvares'])
+        self.assertEqual(self.buscar('alves'), [])
+
+        Cliente.objects.filter(pk=cliente.pk).delete()
+        self.assertEqual(self.buscar('pedro'), [])
+
+    def test_termo_numerico_busca_prefixo_de_cpf_e_telefone(self):
+        self.criar_cliente(self.user, 'Bruno', '321.654.987-00', telefone='(11) 98123-4567')
+        self.criar_cliente(self.user, 'Carla', '987.654.321-00', telefone='(21) 3456-7890')
+        self.criar_cliente(self.user, 'Diego', '329.999.999-99', telefone='(31) 4002-8922')
+
+        self.assertEqual(self.buscar('321654'), ['Bruno'])
+        self.assertEqual(self.buscar('321.654'), ['Bruno'])
+        self.assertEqual(self.buscar('11981'), ['Bruno'])
+        self.assertEqual(self.buscar('(21)'), ['Carla'])
+        self.assertEqual(self.buscar('32'), ['Bruno', 'Diego'])
+        self.assertEqual(self.buscar('3299'), ['Diego'])
+
+    def test_termo_numerico_sem_prefixo_busca_em_qualquer_posicao(self):
+        self.criar_cliente(self.user, 'Bruno', '321.654.987-00', telefone='(11) 98123-4567')
+        self.criar_cliente(self.user, 'Carla', '987.654.321-00', telefone='(21) 3456-7890')
+        self.criar_cliente(self.outro_user, 'Diego', '329.999.999-99', telefone='(31) 98123-4567')
+
+        # Telefone sem DDD e trecho do meio do CPF
+        self.assertEqual(self.buscar('98123-4567'), ['Bruno'])
+        self.assertEqual(self.buscar('654'), ['Bruno', 'Carla'])
+        self.assertEqual(self.buscar('000'), [])
+
+    def test_digitos_atualizados_ao_salvar(self):
+        cliente = self.criar_cliente(self.user, 'Elisa', '111.222.333-44', telefone='(31) 98765-4321')
+        self.assertEqual((cliente.cpf_digitos, cliente.telefone_digitos), ('11122233344', '31987654321'))
+
+        cliente.telefone = '(31) 3333-4444'
+        cliente.save(update_fields=['telefone'])
+        cliente.refresh_from_db()
+        self.assertEqual(cliente.telefone_digitos, '3133334444')
+
+    def test_trigram_trata_curingas_do_like_como_texto(self):
+        self.assertEqual(escapar_like('50%_a\\b'), '50\\%\\_a\\\\b')
+
+        # Só monta o SQL: o backend depende de pg_trgm/unaccent
+        sql, params = BuscaClientesTrigram().buscar(Cliente.objects.all(), '100%').query.sql_with_params()
+        self.assertIn("ESCAPE '\\'", sql)
+        self.assertIn('100\\%', params)
+
+    def test_busca_numerica_usa_indice(self):
+        sql = str(buscar_por_digitos(Cliente.objects.all(), '1199').query)
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}' if connection.vendor == 'sqlite' else f'EXPLAIN {sql}')
+            plano = ' '.join(str(linha) for linha in cursor.fetchall())
+        self.assertIn('cpf_digitos', plano)
+        self.assertIn('telefone_digitos', plano)
+
+
+class ContagemListasTests(AgendamentosTestMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.client.get('/dashboard/')
+
+    def contagens(self, url, tabela):
+        """(resposta, nº de COUNTs na tabela) de um GET"""
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        total = sum(
+            1 for consulta in consultas.captured_queries
+            if 'COUNT(' in consulta['sql'] and f'FROM "{tabela}"' in consulta['sql']
+        )
+        return response, total
+
+    def test_total_sem_filtros_vem_do_cache_e_e_invalidado(self):
+        self.criar_agendamento(timezone.localdate(), time(9, 0))
+
+        response, contagens = self.contagens('/agendamentos/', 'agendamentos_agendamento')
+        self.assertEqual((response.context['total_agendamentos'], contagens), (1, 1))
+
+        response, contagens = self.contagens('/agendamentos/', 'agendamentos_agendamento')
+        self.assertEqual((response.context['total_agendamentos'], contagens), (1, 0))
+
+        self.criar_agendamento(timezone.localdate(), time(10, 0))
+        response, contagens = self.contagens('/agendamentos/', 'agendamentos_agendamento')
+        self.assertEqual((response.context['total_agendamentos'], contagens), (2, 1))
+
+        Agendamento.objects.filter(criado_por=self.user).first().delete()
+        response, _ = self.contagens('/agendamentos/', 'agendamentos_agendamento')
+        self.assertEqual(response.context['total_agendamentos'], 1)
+        self.assertFalse(response.context['total_aproximado'])
+
+    def test_listagem_filtrada_conta_uma_unica_vez(self):
+        self.criar_cliente(self.user, 'Joana Prado', '222.222.222-22')
+
+        response, contagens = self.contagens('/clientes/?search=joana&status=ativo', 'agendamentos_cliente')
+        self.assertEqual((response.context['total_clientes'], contagens), (1, 1))
+
+        response, _ = self.contagens('/servicos/?status=ativo', 'agendamentos_tiposervico')
+        self.assertEqual(response.context['total_servicos'], 1)
+
+    def test_estimativa_do_planejador_so_no_postgres(self):
+        estimativa = estimativa_planejador(Cliente.objects.filter(nome__icontains='a'))
+        if connection.vendor == 'postgresql':
+            self.assertIsInstance(estimativa, int)
+        else:
+            self.assertIsNone(estimativa)
+
+
+class ConflitoHorarioTests(AgendamentosTestMixin, TestCase):
+
+    def setUp(self):
+        self.amanha = timezone.localdate() + timedelta(days=1)
+
+    def formulario(self, hora, instance=None):
+        return AgendamentoForm(data={
+            'cliente': self.cliente.pk,
+            'servico': self.servico.pk,
+            'data_agendamento': self.amanha.isoformat(),
+            'hora_inicio': hora,
+        }, user=self.user, instance=instance)
+
+    def test_detecta_sobreposicao_com_nome_do_cliente(self):
+        self.criar_agendamento(self.amanha, time(10, 0))
+
+        form = self.formulario('10:15')
+        self.assertFalse(form.is_valid())
+        self.assertIn('Maria Silva das 10:00:00 às 10:30:00', form.errors['hora_inicio'][0])
+
+        # Encostar no início ou no fim não é conflito
+        self.assertTrue(self.formulario('09:30').is_valid())
+        self.assertTrue(self.formulario('10:30').is_valid())
+
+    def test_ignora_cancelados_e_o_proprio_agendamento(self):
+        existente = self.criar_agendamento(self.amanha, time(10, 0))
+        self.criar_agendamento(self.amanha, time(11, 0), status='cancelado')
+
+        self.assertTrue(self.formulario('10:00', instance=existente).is_valid())
+        self.assertTrue(self.formulario('11:00').is_valid())
+
+    def test_validacao_com_consultas_constantes(self):
+        self.criar_agendamento(self.amanha, time(8, 0))
+        with CaptureQueriesContext(connection) as poucos:
+            self.formulario('20:00').is_valid()
+
+        for minuto in range(30, 600, 30):
+            self.criar_agendamento(self.amanha, (datetime.combine(self.amanha, time(8, 0))
+                                                 + timedelta(minutes=minuto)).time())
+        with CaptureQueriesContext(connection) as muitos:
+            self.assertTrue(self.formulario('20:00').is_valid())
+
+        self.assertEqual(len(poucos), len(muitos))
+
+
+class ConcorrenciaAgendamentoTests(AgendamentosTestMixin, TransactionTestCase):
+    """Gravações simultâneas no mesmo horário: o banco deixa passar apenas uma"""
+
+    def setUp(self):
+        cache.clear()
+        self.setUpTestData()
+        self.amanha = timezone.localdate() + timedelta(days=1)
+
+    def reservar(self, hora, barreira):
+        try:
+            barreira.wait()
+            for _ in range(500):
+                try:
+                    Agendamento.objects.create(
+                        cliente=self.cliente, servico=self.servico, data_agendamento=self.amanha,
+                        hora_inicio=hora, criado_por=self.user,
+                    )
+                    return 'criado'
+                except ValidationError:
+                    return 'conflito'
+                except OperationalError:
+                    # SQLite em memória: tabela bloqueada por outra thread, tenta de novo
+                    relogio.sleep(0.005)
+            return 'bloqueado'
+        finally:
+            connection.close()
+
+    def test_reservas_paralelas_no_mesmo_horario(self):
+        # Todos os inícios entre 10:00 e 10:14 se sobrepõem (serviço de 30 min)
+        horarios = [time(10, minuto) for minuto in range(0, 16, 2)]
+        barreira = threading.Barrier(len(horarios))
+        with ThreadPoolExecutor(max_workers=len(horarios)) as executor:
+            resultados = list(executor.map(lambda hora: self.reservar(hora, barreira), horarios))
+
+        self.assertEqual(resultados.count('criado'), 1)
+        self.assertEqual(resultados.count('conflito'), len(horarios) - 1)
+        self.assertEqual(Agendamento.objects.filter(data_agendamento=self.amanha).count(), 1)
+
+    def test_banco_recusa_sobreposicao_e_aceita_cancelados(self):
+        self.criar_agendamento(self.amanha, time(10, 0))
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                self.criar_agendamento(self.amanha, time(10, 15))
+
+        self.criar_agendamento(self.amanha, time(10, 15), status='cancelado')
+        self.criar_agendamento(self.amanha, time(10, 15), user=self.outro_user)
+        self.assertEqual(Agendamento.objects.filter(data_agendamento=self.amanha).count(), 3)
+
+
+class DisponibilidadeTests(AgendamentosTestMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        hoje = timezone.localdate()
+        self.segunda = hoje + timedelta(days=7 - hoje.weekday())
+        ConfiguracaoHorario.objects.create(
+            usuario=self.user, dia_semana=0, hora_inicio=time(8, 0), hora_fim=time(10, 0)
+        )
+        ConfiguracaoHorario.objects.create(
+            usuario=self.user, dia_semana=1, hora_inicio=time(8, 0), hora_fim=time(18, 0), ativo=False
+        )
+
+    def test_horarios_livres_pelo_mapa_de_ocupacao(self):
+        self.assertEqual(horarios_livres(480, 600, mascara(510, 540), 30, 30), [480, 540, 570])
+        ocupacao = mascara(480, 495) | mascara(560, 600)
+        self.assertEqual(horarios_livres(480, 600, ocupacao, 30, 15), [495, 510, 525])
+        self.assertEqual(horarios_livres(480, 600, 0, 30, 30, a_partir_de=500), [510, 540, 570])
+
+    def test_api_retorna_apenas_dias_de_expediente(self):
+        self.criar_agendamento(self.segunda, time(8, 30))
+        self.criar_agendamento(self.segunda, time(9, 0), status='cancelado')
+        self.client.force_login(self.user)
+
+        response = self.client.get('/agendamentos/disponibilidade/', {
+            'servico': self.servico.pk,
+            'inicio': self.segunda.isoformat(),
+            'fim': (self.segunda + timedelta(days=6)).isoformat(),
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['dias'], [
+            {'data': self.segunda.isoformat(), 'horarios': ['08:00', '09:00', '09:30']},
+        ])
+
+    def test_api_recusa_parametros_invalidos_com_400(self):
+        self.client.force_login(self.user)
+        for parametros in ({'servico': 'abc'}, {'servico': self.servico.pk, 'inicio': 'ontem'}):
+            response = self.client.get('/agendamentos/disponibilidade/', parametros)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'error': 'Parâmetros inválidos'})
+        self.assertEqual(self.client.get('/agendamentos/disponibilidade/').status_code, 404)
+
+    def test_trinta_dias_em_poucas_consultas_com_cache_invalidado(self):
+        fim = self.segunda + timedelta(days=29)
+        with self.assertNumQueries(2):
+            disponibilidade(self.user, self.servico, self.segunda, fim)
+        with self.assertNumQueries(1):
+            dias = dict(disponibilidade(self.user, self.servico, self.segunda, fim))
+        self.assertEqual(len(dias), 5)
+        self.assertIn(time(8, 0), dias[self.segunda])
+
+        self.criar_agendamento(self.segunda, time(8, 0))
+        dias = dict(disponibilidade(self.user, self.servico, self.segunda, fim))
+        self.assertNotIn(time(8, 0), dias[self.segunda])
+
+    def test_sem_configuracao_usa_horario_padrao(self):
+        self.assertEqual(sorted(horario_funcionamento(self.outro_user)), [0, 1, 2, 3, 4])
+
+    def test_configuracoes_exibem_o_expediente(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/configuracoes/')
+        self.assertContains(response, 'Segunda-feira: 08:00 - 10:00')
+        self.assertNotContains(response, 'Terça-feira:')
+
+
+class MapaOcupacaoTests(AgendamentosTestMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.amanha = timezone.localdate() + timedelta(days=1)
+
+    def test_mascara_arredonda_para_fora(self):
+        self.assertEqual(mascara(0, 5), 0b1)
+        self.assertEqual(mascara(2, 7), 0b11)
+        self.assertEqual(mascara(600, 630), 0b111111 << 120)
+        self.assertEqual(mascara(0, 24 * 60).bit_length(), FAIXAS_POR_DIA)
+
+    def mapa(self, data):
+        return mapas_ocupacao(self.user.pk, [data])[data]
+
+    def test_mapa_reconstruido_sob_demanda_e_invalidado(self):
+        self.criar_agendamento(self.amanha, time(10, 0))
+        self.criar_agendamento(self.amanha, time(11, 0), status='cancelado')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.mapa(self.amanha), mascara(600, 630))
+        with self.assertNumQueries(0):
+            self.assertFalse(self.mapa(self.amanha) & mascara(630, 660))
+            self.assertTrue(self.mapa(self.amanha) & mascara(615, 645))
+
+        self.criar_agendamento(self.amanha, time(10, 30))
+        self.assertTrue(self.mapa(self.amanha) & mascara(630, 660))
+
+    def test_formulario_confirma_no_banco_mesmo_com_mapa_atrasado(self):
+        self.mapa(self.amanha)
+        # Gravação que não invalidou este cache (ex.: outro processo)
+        self.criar_agendamento(self.amanha, time(10, 0))
+        cache.set(f'ocupacao:{self.user.pk}:{self.amanha.isoformat()}', 0)
+        self.assertEqual(self.mapa(self.amanha), 0)
+
+        form = AgendamentoForm(data={
+            'cliente': self.cliente.pk, 'servico': self.servico.pk,
+            'data_agendamento': self.amanha.isoformat(), 'hora_inicio': '10:15',
+        }, user=self.user)
+        self.assertFalse(form.is_valid())
+        self.assertIn('Conflito de horário', form.errors['hora_inicio'][0])
+
+    def test_ocupacao_fora_da_grade_confirmada_no_banco(self):
+        # 10:02-10:32 ocupa as faixas até 10:35 no mapa, mas 10:32 está livre de fato
+        self.criar_agendamento(self.amanha, time(10, 2))
+        form = AgendamentoForm(data={
+            'cliente': self.cliente.pk, 'servico': self.servico.pk,
+            'data_agendamento': self.amanha.isoformat(), 'hora_inicio': '10:32',
+        }, user=self.user)
+        self.assertTrue(form.is_valid())
+
+
+class SerieRecorrenteTests(AgendamentosTestMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.inicio = timezone.localdate() + timedelta(days=1)
+
+    def nova_serie(self, **campos):
+        dados = {
+            'cliente': self.cliente, 'servico': self.servico, 'frequencia': 'semanal',
+            'data_inicio': self.inicio, 'hora_inicio': time(9, 0), 'criado_por': self.user,
+        }
+        dados.update(campos)
+        return SerieRecorrente(**dados)
+
+    def test_datas_da_serie(self):
+        self.assertEqual(
+            datas_da_serie('quinzenal', date(2030, 1, 1), quantidade=3),
+            [date(2030, 1, 1), date(2030, 1, 15), date(2030, 1, 29)],
+        )
+        self.assertEqual(
+            datas_da_serie('mensal', date(2030, 1, 31), data_fim=date(2030, 4, 30)),
+            [date(2030, 1, 31), date(2030, 2, 28), date(2030, 3, 31), date(2030, 4, 30)],
+        )
+
+    def test_consultas_nao_dependem_do_tamanho_da_serie(self):
+        self.criar_agendamento(self.inicio, time(9, 0))
+        consultas = []
+        for inicio, quantidade in ((self.inicio + timedelta(weeks=60), 4), (self.inicio, 52)):
+            with CaptureQueriesContext(connection) as contexto:
+                criados = criar_serie(self.nova_serie(data_inicio=inicio, hora_inicio=time(14, 0), quantidade=quantidade))
+            self.assertEqual(len(criados), quantidade)
+            consultas.append(len(contexto.captured_queries))
+        self.assertEqual(consultas[0], consultas[1] - 1)  # a 2ª também atualiza um resumo existente
+
+        serie = SerieRecorrente.objects.get(data_inicio=self.inicio)
+        self.assertEqual(serie.agendamentos.count(), 52)
+        self.assertEqual(
+            serie.agendamentos.order_by('-data_agendamento').first().data_agendamento,
+            self.inicio + timedelta(weeks=51),
+        )
+        resumo = ResumoDiarioAgendamento.objects.get(
+            usuario=self.user, data=self.inicio, status='agendado', servico=self.servico
+        )
+        self.assertEqual((resumo.quantidade, resumo.minutos, resumo.faturamento), (2, 60, Decimal('100.00')))
+        self.assertTrue(mapas_ocupacao(self.user.pk, [self.inicio])[self.inicio] & mascara(840, 870))
+
+    def test_todos_os_conflitos_reportados_e_nada_gravado(self):
+        self.criar_agendamento(self.inicio + timedelta(weeks=1), time(9, 15))
+        self.criar_agendamento(self.inicio + timedelta(weeks=3), time(9, 0), status='cancelado')
+        self.criar_agendamento(self.inicio + timedelta(weeks=5), time(10, 0))
+
+        with self.assertRaises(ValidationError) as erro:
+            criar_serie(self.nova_serie(quantidade=8))
+        self.assertEqual(len(erro.exception.messages), 2)
+        self.assertIn('Maria Silva', erro.exception.messages[0])
+        self.assertFalse(SerieRecorrente.objects.exists())
+        self.assertEqual(Agendamento.objects.count(), 3)
+
+    def test_view_lista_conflitos_no_formulario(self):
+        self.criar_agendamento(self.inicio + timedelta(weeks=2), time(9, 0))
+        self.client.force_login(self.user)
+        resposta = self.client.post(reverse('agendamentos:serie_create'), {
+            'cliente': self.cliente.pk, 'servico': self.servico.pk, 'frequencia': 'semanal',
+            'data_inicio': self.inicio.isoformat(), 'hora_inicio': '09:00', 'quantidade': 4,
+        })
+        self.assertEqual(resposta.status_code, 200)
+        self.assertContains(resposta, (self.inicio + timedelta(weeks=2)).strftime('%d/%m/%Y'))
+
+        resposta = self.client.post(reverse('agendamentos:serie_create'), {
+            'cliente': self.cliente.pk, 'servico': self.servico.pk, 'frequencia': 'mensal',
+            'data_inicio': self.inicio.isoformat(), 'hora_inicio': '15:00', 'quantidade': 3,
+        })
+        self.assertRedirects(resposta, reverse('agendamentos:agendamento_list'))
+        self.assertEqual(Agendamento.objects.filter(serie__isnull=False).count(), 3)
+
+
+class StatusEmLoteTests(AgendamentosTestMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.ontem = timezone.localdate() - timedelta(days=1)
+
+    def test_um_update_respeitando_pode_editar_e_pode_cancelar(self):
+        agendado = self.criar_agendamento(self.ontem, time(9, 0))
+        em_andamento = self.criar_agendamento(self.ontem, time(10, 0), status='em_andamento')
+        cancelado = self.criar_agendamento(self.ontem, time(11, 0), status='cancelado')
+        alheio = self.criar_agendamento(self.ontem, time(9, 0), user=self.outro_user)
+        ids = [agendado.pk, em_andamento.pk, cancelado.pk, alheio.pk]
+
+        with CaptureQueriesContext(connection) as consultas:
+            alterados = alterar_status_em_lote(
+                self.user, Agendamento.objects.filter(pk__in=ids), 'concluido', 'Fechamento do dia'
+            )
+        self.assertEqual(alterados, 2)
+        updates = [c['sql'] for c in consultas.captured_queries
+                   if c['sql'].startswith('UPDATE "agendamentos_agendamento"')]
+        self.assertEqual(len(updates), 1)
+
+        status = dict(Agendamento.objects.filter(pk__in=ids).values_list('pk', 'status'))
+        self.assertEqual(status, {
+            agendado.pk: 'concluido', em_andamento.pk: 'concluido',
+            cancelado.pk: 'cancelado', alheio.pk: 'agendado',
+        })
+        agendado.refresh_from_db()
+        self.assertIsNone(agendado.observacoes)
+        eventos = AgendamentoStatusHistorico.objects.order_by('agendamento_id').values_list(
+            'agendamento_id', 'status_anterior', 'status_novo', 'observacao', 'criado_por_id'
+        )
+        self.assertEqual(list(eventos), [
+            (agendado.pk, 'agendado', 'concluido', 'Fechamento do dia', self.user.pk),
+            (em_andamento.pk, 'em_andamento', 'concluido', 'Fechamento do dia', self.user.pk),
+        ])
+
+        resumos = dict(ResumoDiarioAgendamento.objects.filter(usuario=self.user).values_list('status', 'quantidade'))
+        self.assertEqual(resumos, {'concluido': 2, 'cancelado': 1})
+
+    def test_reabrir_exige_pode_editar(self):
+        concluido = self.criar_agendamento(self.ontem, time(9, 0), status='concluido')
+        confirmado = self.criar_agendamento(self.ontem, time(10, 0), status='confirmado')
+        alterados = alterar_status_em_lote(self.user, Agendamento.objects.all(), 'agendado')
+        self.assertEqual(alterados, 1)
+        concluido.refresh_from_db()
+        confirmado.refresh_from_db()
+        self.assertEqual((concluido.status, confirmado.status), ('concluido', 'agendado'))
+
+    def test_endpoint_aplica_aos_filtrados(self):
+        amanha = timezone.localdate() + timedelta(days=1)
+        self.criar_agendamento(self.ontem, time(9, 0))
+        self.criar_agendamento(amanha, time(9, 0))
+        self.client.force_login(self.user)
+
+        url = reverse('agendamentos:agendamento_status_lote') + f'?data_fim={self.ontem.isoformat()}'
+        resposta = self.client.post(url, {'novo_status': 'nao_compareceu', 'escopo': 'filtro'})
+        self.assertRedirects(
+            resposta, reverse('agendamentos:agendamento_list') + f'?data_fim={self.ontem.isoformat()}',
+            fetch_redirect_response=False,
+        )
+        self.assertEqual(
+            list(Agendamento.objects.order_by('data_agendamento').values_list('status', flat=True)),
+            ['nao_compareceu', 'agendado'],
+        )
+        self.assertEqual(self.client.get(url).status_code, 405)
+
+
+class HistoricoStatusTests(AgendamentosTestMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.amanha = timezone.localdate() + timedelta(days=1)
+
+    def test_form_grava_um_evento_sem_tocar_observacoes(self):
+        agendamento = self.criar_agendamento(self.amanha, time(9, 0))
+        form = AgendamentoStatusForm(
+            data={'status': 'confirmado', 'observacoes_status': 'Cliente confirmou por telefone'},
+            instance=agendamento, user=self.user,
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        with CaptureQueriesContext(connection) as consultas:
+            form.save()
+        inserts = [c['sql'] for c in consultas.captured_queries
+                   if c['sql'].startswith('INSERT INTO "agendamentos_agendamentostatushistorico"')]
+        self.assertEqual(len(inserts), 1)
+
+        agendamento.refresh_from_db()
+        self.assertIsNone(agendamento.observacoes)
+        evento = agendamento.historico_status.get()
+        self.assertEqual(
+            (evento.status_anterior, evento.status_novo, evento.observacao, evento.criado_por),
+            ('agendado', 'confirmado', 'Cliente confirmou por telefone', self.user),
+        )
+
+        self.client.force_login(self.user)
+        resposta = self.client.get(reverse('agendamentos:agendamento_detail', args=[agendamento.pk]))
+        self.assertContains(resposta, 'Cliente confirmou por telefone')
+
+    def test_migracao_extrai_linhas_das_observacoes(self):
+        migracao = importlib.import_module('agendamentos.migrations.0011_historico_status')
+        rotulos = [('Em Andamento', 'em_andamento'), ('Concluído', 'concluido'), ('Confirmado', 'confirmado')]
+        texto = (
+            "Cliente prefere WhatsApp"
+            "\n\n[05/03/2025 13:40] Status alterado para Confirmado: ligou\nconfirmando"
+            "\n\n[06/03/2025 18:02] Status alterado para Concluído: ok"
+        )
+        restante, eventos = migracao._eventos(texto, rotulos)
+        self.assertEqual(restante, 'Cliente prefere WhatsApp')
+        self.assertEqual(eventos, [
+            (datetime(2025, 3, 5, 13, 40, tzinfo=dt_timezone.utc), 'confirmado', 'ligou\nconfirmando'),
+            (datetime(2025, 3, 6, 18, 2, tzinfo=dt_timezone.utc), 'concluido', 'ok'),
+        ])
+        self.assertEqual(migracao._eventos('Sem histórico', rotulos), ('Sem histórico', []))
+
+        # Texto livre depois de uma linha de status e status desconhecidos ficam nas observações
+        texto = (
+            "[05/03/2025 13:40] Status alterado para Confirmado: ligou"
+            "\n\nTrazer exames"
+            "\n\n[06/03/2025 18:02] Status alterado para Remarcado: sexta"
+        )
+        self.assertEqual(migracao._eventos(texto, rotulos), (
+            "Trazer exames\n\n[06/03/2025 18:02] Status alterado para Remarcado: sexta",
+            [(datetime(2025, 3, 5, 13, 40, tzinfo=dt_timezone.utc), 'confirmado', 'ligou')],
+        ))
+
+
+class EstatisticasClienteTests(AgendamentosTestMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.hoje = timezone.localdate()
+
+    def contadores(self, cliente):
+        cliente.refresh_from_db()
+        return (cliente.total_agendamentos, cliente.total_visitas, cliente.total_faltas,
+                cliente.faturamento_total, cliente.ultima_visita)
+
+    def test_contadores_acompanham_as_escritas(self):
+        outro = self.criar_cliente(self.user, 'João Souza', '987.654.321-00')
+        antigo = self.criar_agendamento(self.hoje - timedelta(days=20), time(9, 0), status='concluido')
+        recente = self.criar_agendamento(
+            self.hoje - timedelta(days=5), time(9, 0), status='concluido', valor_cobrado=Decimal('70.00')
+        )
+        falta = self.criar_agendamento(self.hoje - timedelta(days=3), time(9, 0), status='nao_compareceu')
+        self.assertEqual(self.contadores(self.cliente), (3, 2, 1, Decimal('120.00'), recente.data_agendamento))
+
+        # Troca de cliente atualiza os dois
+        recente.cliente = outro
+        models.Model.save(recente)
+        self.assertEqual(self.contadores(self.cliente), (2, 1, 1, Decimal('50.00'), antigo.data_agendamento))
+        self.assertEqual(self.contadores(outro), (1, 1, 0, Decimal('70.00'), recente.data_agendamento))
+
+        # Caminho em massa (update() sem signals)
+        alterar_status_em_lote(self.user, Agendamento.objects.filter(pk=falta.pk), 'concluido')
+        self.assertEqual(self.contadores(self.cliente), (2, 2, 0, Decimal('100.00'), falta.data_agendamento))
+
+        falta.delete()
+        antigo.delete()
+        self.assertEqual(self.contadores(self.cliente), (0, 0, 0, Decimal('0.00'), None))
+
+    def test_save_aplica_diferenca_sem_reagregar_o_historico(self):
+        for dias in range(1, 31):
+            self.criar_agendamento(self.hoje - timedelta(days=dias), time(9, 0), status='concluido')
+        agendamento = self.criar_agendamento(self.hoje, time(9, 0))
+
+        agendamento.status = 'concluido'
+        with CaptureQueriesContext(connection) as consultas:
+            models.Model.save(agendamento)
+        sqls = [c['sql'] for c in consultas.captured_queries]
+        self.assertFalse([sql for sql in sqls if 'COUNT(' in sql or 'GROUP BY "agendamentos_agendamento"."cliente_id"' in sql])
+        self.assertEqual(len([sql for sql in sqls if sql.startswith('UPDATE "agendamentos_cliente"')]), 1)
+        self.assertEqual(self.contadores(self.cliente), (31, 31, 0, Decimal('1550.00'), self.hoje))
+
+        # Visita que deixa de contar: ultima_visita volta à anterior
+        agendamento.status = 'cancelado'
+        models.Model.save(agendamento)
+        self.assertEqual(self.contadores(self.cliente), (31, 30, 0, Decimal('1500.00'), self.hoje - timedelta(days=1)))
+
+        # Edição que não muda a parcela não grava nos contadores
+        agendamento.observacoes = 'Remarcar'
+        with CaptureQueriesContext(connection) as consultas:
+            models.Model.save(agendamento)
+        self.assertFalse([c for c in consultas.captured_queries if c['sql'].startswith('UPDATE "agendamentos_cliente"')])
+
+    def test_contadores_nao_reescrevem_indice_de_busca(self):
+        if connection.vendor != 'sqlite' or 'agendamentos_cliente_fts' not in connection.introspection.table_names():
+            self.skipTest('Índice FTS5 só existe no SQLite')
+        self.criar_agendamento(self.hoje, time(9, 0), status='concluido')
+        connection.ensure_connection()
+        antes = connection.connection.total_changes
+        atualizar_contadores([self.cliente.pk])
+        # Só a linha do cliente: o trigger de UPDATE do FTS5 olha apenas as colunas indexadas
+        self.assertEqual(connection.connection.total_changes - antes, 1)
+
+    def test_mudanca_de_preco_atualiza_faturamento(self):
+        self.criar_agendamento(self.hoje - timedelta(days=2), time(9, 0), status='concluido')
+        self.criar_agendamento(self.hoje - timedelta(days=1), time(9, 0), status='concluido', valor_cobrado=Decimal('70.00'))
+
+        self.servico.preco = Decimal('60.00')
+        self.servico.save()
+        self.assertEqual(self.contadores(self.cliente)[3], Decimal('130.00'))
+
+    def test_detalhe_com_uma_agregacao_e_lista_sem_consulta_por_linha(self):
+        outro = self.criar_cliente(self.user, 'Ana Lima', '987.654.321-00')
+        for dias in (10, 20, 30):
+            self.criar_agendamento(self.hoje - timedelta(days=dias), time(9, 0), status='concluido', cliente=outro)
+        self.criar_agendamento(self.hoje - timedelta(days=40), time(9, 0), status='cancelado', cliente=outro)
+        self.client.force_login(self.user)
+
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(reverse('agendamentos:cliente_detail', args=[outro.pk]))
+        agendamentos = [c['sql'] for c in consultas.captured_queries if '"agendamentos_agendamento"' in c['sql']]
+        self.assertEqual(len(agendamentos), 2)  # últimos 10 + estatísticas
+        contexto = resposta.context
+        self.assertEqual(
+            (contexto['total_agendamentos'], contexto['agendamentos_concluidos'], contexto['agendamentos_cancelados'],
+             contexto['taxa_comparecimento'], contexto['total_faturado'], contexto['ticket_medio'],
+             contexto['ultima_visita']),
+            (4, 3, 1, 75.0, Decimal('150.00'), Decimal('50.00'), self.hoje - timedelta(days=10)),
+        )
+
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(reverse('agendamentos:cliente_list') + '?ordenar=faturamento')
+        self.assertEqual([cliente.pk for cliente in resposta.context['clientes']], [outro.pk, self.cliente.pk])
+        self.assertFalse(any('"agendamentos_agendamento"' in c['sql'] for c in consultas.captured_queries))
+
+        resposta = self.client.get(reverse('agendamentos:cliente_list') + '?ordenar=ultima_visita&paginacao=cursor')
+        self.assertEqual([cliente.pk for cliente in resposta.context['clientes']], [outro.pk, self.cliente.pk])
+
+
+class ServicoListTests(AgendamentosTestMixin, TestCase):
+
+    def test_estatisticas_em_agregacoes_e_uso_anotado(self):
+        cache.clear()
+        hoje = timezone.localdate()
+        escova = TipoServico.objects.create(
+            nome='Escova', duracao=timedelta(minutes=60), preco=Decimal('80.00'), ativo=False, criado_por=self.user
+        )
+        self.criar_agendamento(hoje - timedelta(days=2), time(9, 0), status='concluido')
+        self.criar_agendamento(hoje - timedelta(days=3), time(9, 0), status='concluido', valor_cobrado=Decimal('40.00'))
+        self.criar_agendamento(hoje - timedelta(days=4), time(9, 0))
+        self.criar_agendamento(hoje - timedelta(days=60), time(9, 0), status='concluido')
+        self.criar_agendamento(hoje - timedelta(days=1), time(9, 0), servico=escova)
+        self.client.force_login(self.user)
+
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(reverse('agendamentos:servico_list'))
+        tabelas = [c['sql'] for c in consultas.captured_queries if '"agendamentos_tiposervico"' in c['sql']]
+        self.assertEqual(len(tabelas), 2)  # listagem anotada + estatísticas
+        self.assertFalse(any(
+            c['sql'].startswith('SELECT') and 'FROM "agendamentos_agendamento"' in c['sql']
+            for c in consultas.captured_queries
+        ))
+
+        contexto = resposta.context
+        self.assertEqual(
+            (contexto['servicos_cadastrados'], contexto['servicos_ativos'], contexto['preco_medio'],
+             contexto['duracao_media']),
+            (2, 1, Decimal('65.00'), '0h45min'),
+        )
+        uso = {
+            servico.nome: (servico.total_agendamentos, servico.agendamentos_30_dias, servico.faturamento_30_dias)
+            for servico in contexto['servicos']
+        }
+        self.assertEqual(uso, {'Corte': (4, 3, Decimal('90.00')), 'Escova': (1, 1, Decimal('0'))})
+
+
+class ImportacaoAgendamentosTests(AgendamentosTestMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.amanha = timezone.localdate() + timedelta(days=1)
+
+    def registro(self, hora, **campos):
+        dados = {
+            'cliente_id': self.cliente.pk, 'servico_id': self.servico.pk,
+            'data_agendamento': self.amanha, 'hora_inicio': hora,
+        }
+        dados.update(campos)
+        return dados
+
+    def test_form_valida_uma_vez_e_calcula_hora_fim(self):
+        form = AgendamentoForm(data={
+            'cliente': self.cliente.pk, 'servico': self.servico.pk,
+            'data_agendamento': self.amanha.isoformat(), 'hora_inicio': '09:00',
+        }, user=self.user)
+        self.assertTrue(form.is_valid())
+        form.instance.criado_por = self.user
+        with CaptureQueriesContext(connection) as consultas:
+            agendamento = form.save()
+        selects_unique = [c for c in consultas.captured_queries
+                          if c['sql'].startswith('SELECT 1 AS "a" FROM "agendamentos_agendamento"')]
+        self.assertEqual(selects_unique, [])
+        self.assertEqual((agendamento.hora_fim, agendamento.valor_cobrado), (time(9, 30), Decimal('50.00')))
+
+    def test_save_sem_validacao_converte_violacao_de_unicidade(self):
+        self.criar_agendamento(self.amanha, time(9, 0), status='cancelado')
+        duplicado = Agendamento(
+            cliente=self.cliente, servico=self.servico, data_agendamento=self.amanha,
+            hora_inicio=time(9, 0), criado_por=self.user,
+        )
+        with self.assertRaises(ValidationError) as erro:
+            duplicado.save(validar=False)
+        self.assertEqual(erro.exception.message_dict, {'hora_inicio': ['Já existe um agendamento neste dia e horário.']})
+
+    def test_restricao_violada_pelo_nome(self):
+        self.criar_agendamento(self.amanha, time(9, 0), status='cancelado')
+        with self.assertRaises(IntegrityError) as erro, transaction.atomic():
+            self.criar_agendamento(self.amanha, time(9, 0), status='cancelado')
+        self.assertEqual(restricao_violada(erro.exception, Agendamento), RESTRICAO_HORARIO_UNICO)
+
+        # Outras violações de unicidade não são confundidas com a do horário
+        with self.assertRaises(IntegrityError) as erro, transaction.atomic():
+            self.criar_cliente(self.user, 'Outra Maria', '999.999.999-99', email=self.cliente.email)
+        self.assertIsNone(restricao_violada(erro.exception, Agendamento))
+
+    def test_importacao_em_lote_com_relatorio_de_erros(self):
+        self.criar_agendamento(self.amanha, time(8, 0))
+        outro_servico = TipoServico.objects.create(
+            nome='Alheio', duracao=timedelta(minutes=30), preco=Decimal('10.00'), criado_por=self.outro_user
+        )
+        registros = [
+            self.registro(time(9, 0)),
+            self.registro(time(9, 15)),                                    # sobrepõe a linha 1
+            self.registro(time(8, 0), status='cancelado'),                 # mesmo início de um existente
+            self.registro(time(10, 0), servico_id=outro_servico.pk),
+            self.registro(time(23, 45)),                                   # passa da meia-noite
+            self.registro(time(9, 15), status='concluido', data_agendamento=self.amanha - timedelta(days=30)),
+            self.registro(time(11, 0), valor_cobrado=Decimal('80.00')),
+        ]
+
+        # 3 leituras + INSERT + resumo (2 leituras, UPDATE, INSERT) + contadores (SELECT, UPDATE) + savepoints
+        with self.assertNumQueries(14):
+            resultado = importar_agendamentos(self.user, registros)
+        self.assertEqual(resultado.criados, 3)
+        self.assertEqual([numero for numero, _ in resultado.erros], [2, 3, 4, 5])
+
+        self.assertEqual(
+            list(Agendamento.objects.filter(data_agendamento=self.amanha).values_list(
+                'hora_inicio', 'hora_fim', 'valor_cobrado')),
+            [(time(8, 0), time(8, 30), None), (time(9, 0), time(9, 30), Decimal('50.00')),
+             (time(11, 0), time(11, 30), Decimal('80.00'))],
+        )
+        resumo = ResumoDiarioAgendamento.objects.get(usuario=self.user, data=self.amanha, status='agendado')
+        self.assertEqual(resumo.quantidade, 3)
+
+
+class ImportacaoClientesTests(AgendamentosTestMixin, TestCase):
+
+    CSV = (
+        '\ufeffNome;Email;Telefone;CPF;Data de Nascimento;Endereço;Ativo;Criado em\n'
+        'Ana Souza;ana@exemplo.com;(11) 98888-7777;987.654.321-00;15/03/1985;Rua A;Sim;01/01/2026 10:00\n'
+        'Bruno Lima;bruno@exemplo.com;11 98888-7777;987.654.321-11;1990-01-01;;Sim;\n'
+        'Carla Dias;carla@exemplo.com;(11) 97777-6666;111.111.111-11;01/01/2999;;Sim;\n'
+        'Duplicada;12345678901@EXEMPLO.com;(11) 97777-6666;555.444.333-22;01/01/1980;;Sim;\n'
+        '\n'
+        'Eva Reis;eva@exemplo.com;(21) 3333-4444;555.444.333-22;01/01/1980;;Não;\n'
+        'Eva Copia;eva2@exemplo.com;(21) 3333-4444;555.444.333-22;01/01/1980;;Sim;\n'
+    )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_importa_validas_e_relata_erros(self):
+        resultado = importar_clientes(self.user, StringIO(self.CSV), batch_size=1)
+
+        self.assertEqual(resultado.criados, 2)
+        self.assertEqual([linha for linha, _ in resultado.erros], [3, 4, 5, 8])
+        self.assertIn('Telefone', resultado.erros[0][1])
+        self.assertIn('CPF inválido', resultado.erros[1][1])
+        self.assertIn('futuro', resultado.erros[1][1])
+        self.assertIn('Email já cadastrado', resultado.erros[2][1])
+        self.assertIn('CPF já cadastrado', resultado.erros[3][1])
+
+        eva = Cliente.objects.get(email='eva@exemplo.com')
+        self.assertEqual((eva.cpf_digitos, eva.telefone_digitos, eva.ativo), ('55544433322', '2133334444', False))
+        self.assertEqual([c.nome for c in buscar_por_digitos(Cliente.objects.all(), '98765')], ['Ana Souza'])
+
+    def test_consultas_nao_dependem_do_numero_de_linhas(self):
+        cabecalho = 'Nome,Email,Telefone,CPF,Data de Nascimento\n'
+        linhas = ''.join(
+            f'Cliente {i},c{i}@exemplo.com,(11) 90000-{i:04d},{i:03d}.000.000-01,01/01/1990\n' for i in range(1, 40)
+        )
+        # Leitura de emails/CPFs + INSERT por lote + savepoint
+        with self.assertNumQueries(1 + 4 + 2):
+            resultado = importar_clientes(self.user, StringIO(cabecalho + linhas), batch_size=10)
+        self.assertEqual((resultado.criados, resultado.erros), (39, []))
+
+    def test_cabecalho_sem_colunas_obrigatorias(self):
+        with self.assertRaises(ValidationError):
+            importar_clientes(self.user, StringIO('Nome;Email\nAna;ana@exemplo.com\n'))
+
+    def test_comando_gera_relatorio_de_erros(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, 'clientes.csv')
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                arquivo.write(self.CSV)
+            saida = StringIO()
+            call_command('importar_clientes', caminho, usuario='recepcao', stdout=saida)
+            with open(os.path.join(pasta, 'clientes_erros.csv'), encoding='utf-8-sig') as relatorio:
+                linhas = relatorio.read().splitlines()
+        self.assertIn('2 cliente(s) importado(s)', saida.getvalue())
+        self.assertEqual(linhas[0], 'Linha;Erro')
+        self.assertEqual(len(linhas), 5)
+
+    def test_upload_com_download_do_relatorio(self):
+        self.client.force_login(self.user)
+        arquivo = SimpleUploadedFile('clientes.csv', self.CSV.encode('utf-8'), content_type='text/csv')
+        resposta = self.client.post(reverse('agendamentos:cliente_import'), {'arquivo': arquivo})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.context['resultado'].criados, 2)
+
+        relatorio = self.client.get(
+            reverse('agendamentos:cliente_import_erros', args=[resposta.context['token_erros']])
+        )
+        self.assertEqual(len(b''.join(relatorio.streaming_content).decode('utf-8-sig').splitlines()), 5)
+        self.client.force_login(self.outro_user)
+        relatorio = self.client.get(
+            reverse('agendamentos:cliente_import_erros', args=[resposta.context['token_erros']])
+        )
+        self.assertEqual(relatorio.status_code, 404)
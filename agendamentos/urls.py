@@ -7,9 +7,13 @@ urlpatterns = [
     # Páginas principais
     path('', views.HomeView.as_view(), name='home'),
     path('dashboard/', views.DashboardView.as_view(), name='dashboard'),
+    path('dashboard/cache/', views.dashboard_cache_stats, name='dashboard_cache_stats'),
     
     # Clientes
     path('clientes/', views.ClienteListView.as_view(), name='cliente_list'),
+    path('clientes/exportar/', views.ClienteExportView.as_view(), name='cliente_export'),
+    path('clientes/importar/', views.ClienteImportView.as_view(), name='cliente_import'),
+    path('clientes/importar/erros/<str:token>/', views.ClienteImportErrosView.as_view(), name='cliente_import_erros'),
     path('clientes/criar/', views.ClienteCreateView.as_view(), name='cliente_create'),
     path('clientes/<int:pk>/', views.ClienteDetailView.as_view(), name='cliente_detail'),
     path('clientes/<int:pk>/editar/', views.ClienteUpdateView.as_view(), name='cliente_update'),
@@ -23,14 +27,19 @@ urlpatterns = [
     
     # Agendamentos
     path('agendamentos/', views.AgendamentoListView.as_view(), name='agendamento_list'),
+    path('agendamentos/exportar/', views.AgendamentoExportView.as_view(), name='agendamento_export'),
     path('agendamentos/criar/', views.AgendamentoCreateView.as_view(), name='agendamento_create'),
+    path('agendamentos/recorrente/criar/', views.SerieRecorrenteCreateView.as_view(), name='serie_create'),
     path('agendamentos/<int:pk>/', views.AgendamentoDetailView.as_view(), name='agendamento_detail'),
     path('agendamentos/<int:pk>/editar/', views.AgendamentoUpdateView.as_view(), name='agendamento_update'),
     path('agendamentos/<int:pk>/deletar/', views.AgendamentoDeleteView.as_view(), name='agendamento_delete'),
     path('agendamentos/<int:pk>/status/', views.AgendamentoStatusUpdateView.as_view(), name='agendamento_status'),
+    path('agendamentos/status-em-lote/', views.agendamento_status_lote, name='agendamento_status_lote'),
+    path('agendamentos/disponibilidade/', views.disponibilidade_api, name='disponibilidade'),
 
     # Relatorios
     path('relatorios/', views.RelatoriosView.as_view(), name='relatorios'),
+    path('relatorios/exportar/', views.RelatoriosExportView.as_view(), name='relatorios_export'),
     
     
     # Configurações
@@ -0,0 +1,35 @@
+"""
+Validações do cadastro de clientes compartilhadas pelo ClienteForm e pela
+importação em lote (services/importacao.py).
+"""
+
+import re
+
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+
+def validar_cpf(cpf):
+    """Regras de CPF do cadastro de clientes (formulário e importação)"""
+    # Remove caracteres especiais
+    cpf_numbers = re.sub(r'[^0-9]', '', cpf)
+    
+    # Validação básica de CPF
+    if len(cpf_numbers) != 11:
+        raise ValidationError("CPF deve ter 11 dígitos.")
+    
+    # Verifica se todos os dígitos são iguais
+    if cpf_numbers == cpf_numbers[0] * 11:
+        raise ValidationError("CPF inválido.")
+
+
+def validar_data_nascimento(data):
+    """Regras de data de nascimento do cadastro de clientes (formulário e importação)"""
+    hoje = timezone.now().date()
+    if data > hoje:
+        raise ValidationError("Data de nascimento não pode ser no futuro.")
+    
+    # Verificar se a pessoa tem pelo menos 1 ano
+    idade = hoje.year - data.year
+    if idade < 1:
+        raise ValidationError("Cliente deve ter pelo menos 1 ano.")
@@ -1,17 +1,45 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.views.generic import (TemplateView, ListView, CreateView, UpdateView, DeleteView, DetailView)
-from django.db.models import Q, Count, Sum
+from django.template.defaultfilters import pluralize
+from django.views.decorators.http import require_POST
+from django.views import View
+from django.views.generic import (TemplateView, ListView, CreateView, UpdateView, DeleteView, DetailView, FormView)
+from django.db.models import Avg, Count, DecimalField, Q, Sum, Value
 from django.utils import timezone
-from django.http import JsonResponse
-from datetime import datetime, timedelta
+from django.utils.functional import cached_property
+from django.core.exceptions import ValidationError
+from django.http import Http404, JsonResponse
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 
+import io
 import json
-from .models import Cliente, TipoServico, Agendamento, StatusAgendamento
-from .forms import ClienteForm, TipoServicoForm, AgendamentoForm, AgendamentoStatusForm
-from django.db.models.functions import TruncMonth
+from .models import Cliente, ConfiguracaoHorario, SerieRecorrente, TipoServico, Agendamento, StatusAgendamento
+from .paginacao import ContagemPaginacaoMixin, PaginacaoCursorMixin, PaginadorContagem
+from .forms import (
+    ClienteForm, TipoServicoForm, AgendamentoForm, AgendamentoStatusForm, ImportarClientesForm, SerieRecorrenteForm,
+)
+from .services.busca import buscar_clientes
+from .services.cache_dashboard import estatisticas_cache_dashboard, obter_contexto_dashboard
+from .services.estatisticas_cliente import estatisticas_cliente
+from .services.disponibilidade import LIMITE_DIAS, PASSO_PADRAO, disponibilidade, horario_funcionamento
+from .services.importacao import CABECALHO_ERROS, guardar_relatorio_erros, importar_clientes, relatorio_erros
+from .services.kpis import calcular_kpis_dashboard
+from .services.recorrencia import criar_serie
+from .services.status_lote import alterar_status_em_lote
+from .services.exportacao import (
+    CABECALHO_AGENDAMENTOS, CABECALHO_CLIENTES, CABECALHO_FATURAMENTO,
+    linhas_agendamentos, linhas_clientes, linhas_faturamento, resposta_csv,
+)
+from .services.resumo_diario import serie_diaria, totais_por_dia, valor_efetivo
+from .services.series import DIA, montar_serie
+from django.db.models.functions import Coalesce, TruncMonth
+
+# Eventos de status exibidos no detalhe do agendamento (os mais recentes)
+LIMITE_HISTORICO_STATUS = 50
 
 # ========================================
 # VIEWS PRINCIPAIS
@@ -30,90 +58,44 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         user = self.request.user
         
-        # Data atual
-        hoje = timezone.now().date()
-        inicio_semana = hoje - timedelta(days=hoje.weekday())
-        fim_semana = inicio_semana + timedelta(days=6)
-        inicio_mes = hoje.replace(day=1)
-        
-        # Queryset base
-        agendamentos = Agendamento.objects.filter(criado_por=user)
+        # Contexto em cache por usuário (invalidado a cada escrita e à meia-noite)
+        context.update(obter_contexto_dashboard(user, lambda: self.get_dados_dashboard(user)))
         
-        # Estatísticas básicas
-        context['agendamentos_hoje'] = agendamentos.filter(data_agendamento=hoje).count()
-        context['agendamentos_semana'] = agendamentos.filter(
-            data_agendamento__range=[inicio_semana, fim_semana]
-        ).count()
-        context['total_clientes'] = Cliente.objects.filter(criado_por=user).count()
-        context['agendamentos_pendentes'] = agendamentos.filter(status='agendado').count()
+        return context
+    
+    def get_dados_dashboard(self, user):
+        """Calcula KPIs, próximos agendamentos e gráfico do dashboard"""
+        dados = {}
         
+        # Data atual (fuso local)
+        hoje = timezone.localdate()
+
+        # KPIs (hoje, semana, pendentes, mês, clientes e taxa de comparecimento)
+        dados.update(calcular_kpis_dashboard(user, hoje).as_context())
+
         # Próximos agendamentos
-        context['proximos_agendamentos'] = agendamentos.filter(
+        dados['proximos_agendamentos'] = list(Agendamento.objects.filter(
+            criado_por=user,
             data_agendamento__gte=hoje
-        ).order_by('data_agendamento', 'hora_inicio')[:5]
-        
-        # Estatísticas do mês
-        agendamentos_mes = agendamentos.filter(data_agendamento__gte=inicio_mes)
-        context['agendamentos_mes_realizados'] = agendamentos_mes.filter(status='concluido').count()
-        context['agendamentos_mes_cancelados'] = agendamentos_mes.filter(
-            status__in=['cancelado', 'nao_compareceu']
-        ).count()
-        
-        # Taxa de comparecimento
-        total_mes = agendamentos_mes.count()
-        if total_mes > 0:
-            context['taxa_comparecimento'] = round(
-                (context['agendamentos_mes_realizados'] / total_mes) * 100, 1
-            )
-        else:
-            context['taxa_comparecimento'] = 0
-        
+        ).para_exibicao().order_by('data_agendamento', 'hora_inicio')[:5])
+
         # Dados para gráfico de agendamentos por dia (últimos 30 dias)
-        context['grafico_agendamentos_dados'] = self.get_agendamentos_por_dia(user)
+        dados['grafico_agendamentos_dados'] = self.get_agendamentos_por_dia(user)
         
         # Dados para outros contextos
-        context['today'] = hoje
+        dados['today'] = hoje
         
-        return context
+        return dados
     
     def get_agendamentos_por_dia(self, user):
         """Gera dados para gráfico de agendamentos por dia"""
-        hoje = timezone.now().date()
+        hoje = timezone.localdate()
         inicio_periodo = hoje - timedelta(days=29)  # Últimos 30 dias
         
-        # Buscar agendamentos do período
-        agendamentos = Agendamento.objects.filter(
-            criado_por=user,
-            data_agendamento__range=[inicio_periodo, hoje]
-        ).values('data_agendamento').annotate(
-            total=Count('id')
-        ).order_by('data_agendamento')
-        
-        # Criar lista de todos os dias do período
-        dados = {}
-        data_atual = inicio_periodo
-        while data_atual <= hoje:
-            dados[data_atual.strftime('%Y-%m-%d')] = 0
-            data_atual += timedelta(days=1)
-        
-        # Preencher com dados reais
-        for item in agendamentos:
-            data_str = item['data_agendamento'].strftime('%Y-%m-%d')
-            dados[data_str] = item['total']
-        
-        # Preparar dados para o gráfico
-        categorias = []
-        valores = []
-        
-        for data_str, total in dados.items():
-            data_obj = datetime.strptime(data_str, '%Y-%m-%d').date()
-            categorias.append(data_obj.strftime('%d/%m'))
-            valores.append(total)
+        # Totais por dia lidos do resumo diário
+        totais = totais_por_dia(user, inicio_periodo, hoje)
         
-        return {
-            'categorias': json.dumps(categorias),
-            'valores': json.dumps(valores)
-        }
+        return montar_serie(inicio_periodo, hoje, totais, DIA).as_json()
 
 
 class RelatoriosView(LoginRequiredMixin, TemplateView):
@@ -123,22 +105,11 @@ class RelatoriosView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = self.request.user
-        
-        # Período padrão (últimos 3 meses)
-        hoje = timezone.now().date()
-        inicio_periodo = hoje - timedelta(days=90)
-        
-        # Filtros da URL
-        data_inicio = self.request.GET.get('data_inicio')
-        data_fim = self.request.GET.get('data_fim')
-        
-        if data_inicio:
-            inicio_periodo = datetime.strptime(data_inicio, '%Y-%m-%d').date()
-        if data_fim:
-            hoje = datetime.strptime(data_fim, '%Y-%m-%d').date()
+        inicio_periodo, hoje = self.get_periodo()
         
         context['data_inicio'] = inicio_periodo
         context['data_fim'] = hoje
+        context['granularidade'] = self.request.GET.get('granularidade', '')
         
         # Queryset base
         agendamentos = Agendamento.objects.filter(
@@ -154,13 +125,29 @@ class RelatoriosView(LoginRequiredMixin, TemplateView):
         context['clientes_dados'] = self.get_clientes_mais_frequentes(agendamentos)
         
         # Gráfico de faturamento por dia
-        context['faturamento_dados'] = self.get_faturamento_por_dia(agendamentos, inicio_periodo, hoje)
+        context['faturamento_dados'] = self.get_faturamento_por_dia(user, inicio_periodo, hoje)
         
         # KPIs financeiros
         context['kpis_financeiros'] = self.get_kpis_financeiros(agendamentos, inicio_periodo, hoje)
         
         return context
     
+    def get_periodo(self):
+        """Período do relatório: filtros da URL ou, por padrão, os últimos 3 meses"""
+        hoje = timezone.now().date()
+        inicio_periodo = hoje - timedelta(days=90)
+        
+        # Filtros da URL
+        data_inicio = self.request.GET.get('data_inicio')
+        data_fim = self.request.GET.get('data_fim')
+        
+        if data_inicio:
+            inicio_periodo = datetime.strptime(data_inicio, '%Y-%m-%d').date()
+        if data_fim:
+            hoje = datetime.strptime(data_fim, '%Y-%m-%d').date()
+        
+        return inicio_periodo, hoje
+    
     def get_servicos_mais_realizados(self, agendamentos):
         """Dados para gráfico de pizza dos serviços mais realizados"""
         servicos = agendamentos.values('servico__nome').annotate(
@@ -194,94 +181,44 @@ class RelatoriosView(LoginRequiredMixin, TemplateView):
             'valores': json.dumps(valores)
         }
     
-    def get_faturamento_por_dia(self, agendamentos, inicio, fim):
-        """Dados para gráfico de faturamento por dia"""
-        # Agrupar por data e somar valores
-        faturamento = agendamentos.values('data_agendamento').annotate(
-            total=Sum('valor_cobrado')
-        ).order_by('data_agendamento')
-        
-        # Criar dicionário com todas as datas
-        dados = {}
-        data_atual = inicio
-        while data_atual <= fim:
-            dados[data_atual.strftime('%Y-%m-%d')] = 0
-            data_atual += timedelta(days=1)
-        
-        # Preencher com dados reais
-        for item in faturamento:
-            if item['total']:
-                data_str = item['data_agendamento'].strftime('%Y-%m-%d')
-                dados[data_str] = float(item['total'])
-            else:
-                # Se valor_cobrado for None, usar preço do serviço
-                agendamento_item = agendamentos.filter(data_agendamento=item['data_agendamento']).first()
-                if agendamento_item:
-                    data_str = item['data_agendamento'].strftime('%Y-%m-%d')
-                    dados[data_str] = float(agendamento_item.servico.preco)
-        
-        categorias = []
-        valores = []
-        
-        for data_str, valor in dados.items():
-            data_obj = datetime.strptime(data_str, '%Y-%m-%d').date()
-            categorias.append(data_obj.strftime('%d/%m'))
-            valores.append(valor)
+    def get_faturamento_por_dia(self, user, inicio, fim):
+        """Dados para gráfico de faturamento (lidos do resumo diário, agrupados por dia/semana/mês)"""
+        faturamento = totais_por_dia(
+            user, inicio, fim, campo='faturamento', status=StatusAgendamento.CONCLUIDO
+        )
+        faturamento = {data: float(valor or 0) for data, valor in faturamento.items()}
         
-        return {
-            'categorias': json.dumps(categorias),
-            'valores': json.dumps(valores)
-        }
+        granularidade = self.request.GET.get('granularidade')
+        return montar_serie(inicio, fim, faturamento, granularidade).as_json()
     
     def get_kpis_financeiros(self, agendamentos, inicio, fim):
-        """KPIs financeiros do período - CORRIGIDO para SQLite"""
-        # Faturamento total
-        total_valor_cobrado = agendamentos.filter(
-            valor_cobrado__isnull=False
-        ).aggregate(total=Sum('valor_cobrado'))['total'] or 0
-        
-        # Para agendamentos sem valor_cobrado, usar preço do serviço
-        agendamentos_sem_valor = agendamentos.filter(valor_cobrado__isnull=True)
-        total_preco_servico = 0
-        for agendamento in agendamentos_sem_valor:
-            total_preco_servico += float(agendamento.servico.preco)
-        
-        faturamento_total = float(total_valor_cobrado) + total_preco_servico
+        """KPIs financeiros do período (receita = valor cobrado ou preço do serviço)"""
+        # Faturamento total e quantidade em uma única agregação
+        totais = agendamentos.aggregate(
+            faturamento=Sum(valor_efetivo()),
+            quantidade=Count('id')
+        )
+        faturamento_total = float(totais['faturamento'] or 0)
         
         # Ticket médio
-        total_agendamentos = agendamentos.count()
+        total_agendamentos = totais['quantidade']
         ticket_medio = faturamento_total / total_agendamentos if total_agendamentos > 0 else 0
         
         # Faturamento por mês usando TruncMonth (compatível com SQLite)
         meses = agendamentos.annotate(
             mes=TruncMonth('data_agendamento')
         ).values('mes').annotate(
-            total_valor=Sum('valor_cobrado'),
+            total_valor=Sum(valor_efetivo()),
             count_agendamentos=Count('id')
         ).order_by('mes')
         
-        faturamento_mensal = []
-        for item in meses:
-            mes_obj = item['mes']
-            valor_cobrado = float(item['total_valor'] or 0)
-            
-            # Calcular valor dos serviços sem valor_cobrado neste mês
-            agendamentos_mes_sem_valor = agendamentos.filter(
-                data_agendamento__year=mes_obj.year,
-                data_agendamento__month=mes_obj.month,
-                valor_cobrado__isnull=True
-            )
-            
-            valor_servicos = 0
-            for agendamento in agendamentos_mes_sem_valor:
-                valor_servicos += float(agendamento.servico.preco)
-            
-            valor_total_mes = valor_cobrado + valor_servicos
-            
-            faturamento_mensal.append({
-                'mes': mes_obj.strftime('%m/%Y'),
-                'valor': valor_total_mes
-            })
+        faturamento_mensal = [
+            {
+                'mes': item['mes'].strftime('%m/%Y'),
+                'valor': float(item['total_valor'] or 0)
+            }
+            for item in meses
+        ]
         
         # Crescimento mensal
         crescimento = 0
@@ -300,29 +237,49 @@ class RelatoriosView(LoginRequiredMixin, TemplateView):
             'dias_periodo': (fim - inicio).days + 1
         }
 
+
+class RelatoriosExportView(RelatoriosView):
+    """Exporta a série diária de faturamento do relatório em CSV"""
+    
+    def get(self, request, *args, **kwargs):
+        inicio, fim = self.get_periodo()
+        dias = serie_diaria(request.user, inicio, fim, status=StatusAgendamento.CONCLUIDO)
+        return resposta_csv('faturamento', CABECALHO_FATURAMENTO, linhas_faturamento(dias))
+
+
 # ========================================
 # VIEWS DE CLIENTES
 # ========================================
 
-class ClienteListView(LoginRequiredMixin, ListView):
+class ClienteListView(LoginRequiredMixin, ContagemPaginacaoMixin, PaginacaoCursorMixin, ListView):
     """Lista todos os clientes do usuário"""
     model = Cliente
     template_name = 'agendamentos/cliente_list.html'
     context_object_name = 'clientes'
     paginate_by = 20
+    # ?ordenar=<chave>; os contadores desnormalizados dispensam JOIN com os agendamentos.
+    # Sem última visita, o cliente vai para o fim (ultima_visita_ordem evita NULL no cursor)
+    ordenacoes = {
+        'nome': ('nome', 'id'),
+        'visitas': ('-total_visitas', 'nome', 'id'),
+        'faltas': ('-total_faltas', 'nome', 'id'),
+        'faturamento': ('-faturamento_total', 'nome', 'id'),
+        'ultima_visita': ('-ultima_visita_ordem', 'nome', 'id'),
+    }
+    
+    # Ordem por relevância da busca (definida em get_queryset), usada também pelo cursor
+    ordenacao_busca = None
+    
+    @property
+    def ordenacao_cursor(self):
+        if self.ordenacao_busca:
+            return self.ordenacao_busca
+        return self.ordenacoes.get(self.request.GET.get('ordenar'), self.ordenacoes['nome'])
     
     def get_queryset(self):
-        queryset = Cliente.objects.filter(criado_por=self.request.user)
-        
-        # Filtro de busca
-        search = self.request.GET.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(nome__icontains=search) |
-                Q(email__icontains=search) |
-                Q(telefone__icontains=search) |
-                Q(cpf__icontains=search)
-            )
+        queryset = Cliente.objects.filter(criado_por=self.request.user).annotate(
+            ultima_visita_ordem=Coalesce('ultima_visita', Value(date.min))
+        )
         
         # Filtro de status
         status = self.request.GET.get('status')
@@ -331,16 +288,68 @@ class ClienteListView(LoginRequiredMixin, ListView):
         elif status == 'inativo':
             queryset = queryset.filter(ativo=False)
         
-        return queryset.order_by('nome')
+        # Filtro de busca (indexada e ordenada por relevância quando o banco suporta)
+        search = self.request.GET.get('search')
+        if search:
+            queryset = buscar_clientes(queryset, search)
+            ordem = queryset.query.order_by
+            if self.request.GET.get('ordenar') not in self.ordenacoes and ordem:
+                self.ordenacao_busca = tuple(ordem) + (() if 'id' in ordem else ('id',))
+                return queryset
+        
+        return queryset.order_by(*self.ordenacao_cursor)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['search'] = self.request.GET.get('search', '')
         context['status'] = self.request.GET.get('status', '')
-        context['total_clientes'] = self.get_queryset().count()
+        context['ordenar'] = self.request.GET.get('ordenar', '')
+        # Sem COUNT na paginação por cursor; na por página o total é o do paginator
+        if not context['paginacao_cursor']:
+            context['total_clientes'] = context['total_registros']
         return context
 
 
+class ClienteExportView(ClienteListView):
+    """Exporta os clientes filtrados em CSV (streaming)"""
+    
+    def get(self, request, *args, **kwargs):
+        return resposta_csv('clientes', CABECALHO_CLIENTES, linhas_clientes(self.get_queryset()))
+
+
+class ClienteImportView(LoginRequiredMixin, FormView):
+    """Importa clientes de um CSV; as linhas recusadas ficam disponíveis para download"""
+    form_class = ImportarClientesForm
+    template_name = 'agendamentos/cliente_import.html'
+    tamanho_lote = 1000
+
+    def form_valid(self, form):
+        arquivo = io.TextIOWrapper(form.cleaned_data['arquivo'].file, encoding='utf-8-sig', newline='')
+        try:
+            resultado = importar_clientes(self.request.user, arquivo, batch_size=self.tamanho_lote)
+        except (ValidationError, UnicodeDecodeError) as erro:
+            mensagens = erro.messages if isinstance(erro, ValidationError) else ['O arquivo deve estar em UTF-8.']
+            form.add_error('arquivo', mensagens)
+            return self.form_invalid(form)
+
+        token = guardar_relatorio_erros(self.request.user.pk, resultado.erros) if resultado.erros else None
+        if resultado.criados:
+            messages.success(self.request, f'{resultado.criados} cliente(s) importado(s) com sucesso!')
+        return self.render_to_response(self.get_context_data(
+            form=self.form_class(), resultado=resultado, erros=resultado.erros[:50], token_erros=token,
+        ))
+
+
+class ClienteImportErrosView(LoginRequiredMixin, View):
+    """Download (CSV) das linhas recusadas na última importação"""
+
+    def get(self, request, token):
+        erros = relatorio_erros(request.user.pk, token)
+        if erros is None:
+            raise Http404('Relatório de importação expirado.')
+        return resposta_csv('clientes_erros_importacao', CABECALHO_ERROS, erros)
+
+
 class ClienteCreateView(LoginRequiredMixin, CreateView):
     """Criar novo cliente"""
     model = Cliente
@@ -369,21 +378,18 @@ class ClienteDetailView(LoginRequiredMixin, DetailView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        cliente = self.get_object()
+        cliente = self.object
         
         # Histórico de agendamentos
-        context['agendamentos'] = Agendamento.objects.filter(
+        context['agendamentos'] = list(Agendamento.objects.filter(
             cliente=cliente
-        ).order_by('-data_agendamento', '-hora_inicio')[:10]
+        ).para_exibicao().order_by('-data_agendamento', '-hora_inicio')[:10])
         
-        # Estatísticas do cliente
-        context['total_agendamentos'] = Agendamento.objects.filter(cliente=cliente).count()
-        context['agendamentos_concluidos'] = Agendamento.objects.filter(
-            cliente=cliente, status='concluido'
-        ).count()
-        context['agendamentos_cancelados'] = Agendamento.objects.filter(
-            cliente=cliente, status__in=['cancelado', 'nao_compareceu']
-        ).count()
+        # Estatísticas do cliente (uma única consulta de agregação)
+        totais = estatisticas_cliente(cliente)
+        context['total_agendamentos'] = totais['total_agendamentos']
+        context['agendamentos_concluidos'] = totais['total_visitas']
+        context['agendamentos_cancelados'] = totais['total_cancelados'] + totais['total_faltas']
         
         # Taxa de comparecimento
         if context['total_agendamentos'] > 0:
@@ -394,25 +400,11 @@ class ClienteDetailView(LoginRequiredMixin, DetailView):
             context['taxa_comparecimento'] = 0
         
         # Informações financeiras
-        agendamentos_concluidos = Agendamento.objects.filter(
-            cliente=cliente, status='concluido'
+        context['total_faturado'] = totais['faturamento_total']
+        context['ticket_medio'] = (
+            totais['faturamento_total'] / totais['total_visitas'] if totais['total_visitas'] else 0
         )
-        
-        if agendamentos_concluidos.exists():
-            valores = []
-            for agendamento in agendamentos_concluidos:
-                valor = agendamento.valor_cobrado or agendamento.servico.preco
-                valores.append(valor)
-            
-            context['total_faturado'] = sum(valores)
-            context['ticket_medio'] = context['total_faturado'] / len(valores)
-            
-            # Última visita
-            context['ultima_visita'] = agendamentos_concluidos.order_by('-data_agendamento').first().data_agendamento
-        else:
-            context['total_faturado'] = 0
-            context['ticket_medio'] = 0
-            context['ultima_visita'] = None
+        context['ultima_visita'] = totais['ultima_visita']
         
         return context
 
@@ -471,7 +463,7 @@ class ClienteDeleteView(LoginRequiredMixin, DeleteView):
 # VIEWS DE SERVIÇOS
 # ========================================
 
-class TipoServicoListView(LoginRequiredMixin, ListView):
+class TipoServicoListView(LoginRequiredMixin, ContagemPaginacaoMixin, ListView):
     """Lista todos os tipos de serviço do usuário"""
     model = TipoServico
     template_name = 'agendamentos/servico_list.html'
@@ -496,32 +488,56 @@ class TipoServicoListView(LoginRequiredMixin, ListView):
         elif status == 'inativo':
             queryset = queryset.filter(ativo=False)
         
+        # Uso de cada serviço na mesma consulta da listagem (sem uma contagem por linha)
+        hoje = timezone.localdate()
+        ultimos_30_dias = Q(agendamento__data_agendamento__range=(hoje - timedelta(days=30), hoje))
+        concluidos = ultimos_30_dias & Q(agendamento__status=StatusAgendamento.CONCLUIDO)
+        queryset = queryset.annotate(
+            total_agendamentos=Count('agendamento'),
+            agendamentos_30_dias=Count('agendamento', filter=ultimos_30_dias),
+            faturamento_30_dias=Coalesce(
+                Sum(Coalesce('agendamento__valor_cobrado', 'preco'), filter=concluidos), Value(Decimal('0')),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+        
         return queryset.order_by('nome')
     
+    @cached_property
+    def estatisticas(self):
+        """Totais e médias de todos os serviços do usuário, em uma única consulta"""
+        return TipoServico.objects.filter(criado_por=self.request.user).aggregate(
+            total=Count('id'),
+            ativos=Count('id', filter=Q(ativo=True)),
+            preco_medio=Avg('preco'),
+            duracao_media=Avg('duracao'),
+        )
+    
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        if self.listagem_filtrada():
+            return super().get_paginator(queryset, per_page, orphans, allow_empty_first_page, **kwargs)
+        # Sem filtros o total da listagem é o da agregação: dispensa o COUNT da paginação
+        return PaginadorContagem(
+            queryset, per_page, orphans=orphans, allow_empty_first_page=allow_empty_first_page,
+            contagem=self.estatisticas['total'], **kwargs
+        )
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['search'] = self.request.GET.get('search', '')
         context['status'] = self.request.GET.get('status', '')
-        context['total_servicos'] = self.get_queryset().count()
+        context['total_servicos'] = context['total_registros']
         
         # Estatísticas adicionais
-        servicos = TipoServico.objects.filter(criado_por=self.request.user)
-        context['servicos_ativos'] = servicos.filter(ativo=True).count()
-        
-        if servicos.exists():
-            # Preço médio
-            precos = [s.preco for s in servicos]
-            context['preco_medio'] = sum(precos) / len(precos) if precos else 0
-            
-            # Duração média
-            duracoes = [s.duracao.total_seconds() for s in servicos]
-            duracao_media_segundos = sum(duracoes) / len(duracoes) if duracoes else 0
-            horas = int(duracao_media_segundos // 3600)
-            minutos = int((duracao_media_segundos % 3600) // 60)
-            context['duracao_media'] = f"{horas}h{minutos:02d}min"
-        else:
-            context['preco_medio'] = 0
-            context['duracao_media'] = "0h00min"
+        estatisticas = self.estatisticas
+        context['servicos_cadastrados'] = estatisticas['total']
+        context['servicos_ativos'] = estatisticas['ativos']
+        context['preco_medio'] = estatisticas['preco_medio'] or 0
+        
+        duracao_media_segundos = int(estatisticas['duracao_media'].total_seconds()) if estatisticas['duracao_media'] else 0
+        horas = duracao_media_segundos // 3600
+        minutos = (duracao_media_segundos % 3600) // 60
+        context['duracao_media'] = f"{horas}h{minutos:02d}min"
         
         return context
 
@@ -597,39 +613,46 @@ class TipoServicoDeleteView(LoginRequiredMixin, DeleteView):
 # VIEWS DE AGENDAMENTOS
 # ========================================
 
-class AgendamentoListView(LoginRequiredMixin, ListView):
+def filtrar_agendamentos(queryset, parametros):
+    """Aplica os filtros da listagem de agendamentos (busca, status e período)"""
+    # Filtro de busca
+    search = parametros.get('search')
+    if search:
+        queryset = queryset.filter(
+            Q(cliente__nome__icontains=search) |
+            Q(servico__nome__icontains=search) |
+            Q(observacoes__icontains=search)
+        )
+    
+    # Filtro de status
+    status = parametros.get('status')
+    if status:
+        queryset = queryset.filter(status=status)
+    
+    # Filtro de data
+    data_inicio = parametros.get('data_inicio')
+    data_fim = parametros.get('data_fim')
+    
+    if data_inicio:
+        queryset = queryset.filter(data_agendamento__gte=data_inicio)
+    if data_fim:
+        queryset = queryset.filter(data_agendamento__lte=data_fim)
+    
+    return queryset
+
+
+class AgendamentoListView(LoginRequiredMixin, ContagemPaginacaoMixin, PaginacaoCursorMixin, ListView):
     """Lista todos os agendamentos do usuário"""
     model = Agendamento
     template_name = 'agendamentos/agendamento_list.html'
     context_object_name = 'agendamentos'
     paginate_by = 20
+    ordenacao_cursor = ('-data_agendamento', '-hora_inicio', '-id')
+    parametros_filtro = ('search', 'status', 'data_inicio', 'data_fim')
     
     def get_queryset(self):
-        queryset = Agendamento.objects.filter(criado_por=self.request.user)
-        
-        # Filtro de busca
-        search = self.request.GET.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(cliente__nome__icontains=search) |
-                Q(servico__nome__icontains=search) |
-                Q(observacoes__icontains=search)
-            )
-        
-        # Filtro de status
-        status = self.request.GET.get('status')
-        if status:
-            queryset = queryset.filter(status=status)
-        
-        # Filtro de data
-        data_inicio = self.request.GET.get('data_inicio')
-        data_fim = self.request.GET.get('data_fim')
-        
-        if data_inicio:
-            queryset = queryset.filter(data_agendamento__gte=data_inicio)
-        if data_fim:
-            queryset = queryset.filter(data_agendamento__lte=data_fim)
-        
+        queryset = Agendamento.objects.filter(criado_por=self.request.user).para_exibicao()
+        queryset = filtrar_agendamentos(queryset, self.request.GET)
         return queryset.order_by('-data_agendamento', '-hora_inicio')
     
     def get_context_data(self, **kwargs):
@@ -639,7 +662,9 @@ class AgendamentoListView(LoginRequiredMixin, ListView):
         context['data_inicio'] = self.request.GET.get('data_inicio', '')
         context['data_fim'] = self.request.GET.get('data_fim', '')
         context['status_choices'] = StatusAgendamento.choices
-        context['total_agendamentos'] = self.get_queryset().count()
+        # Sem COUNT na paginação por cursor; na por página o total é o do paginator
+        if not context['paginacao_cursor']:
+            context['total_agendamentos'] = context['total_registros']
         
         # Datas para filtros rápidos
         hoje = timezone.now().date()
@@ -663,6 +688,15 @@ class AgendamentoListView(LoginRequiredMixin, ListView):
         return context
 
 
+class AgendamentoExportView(AgendamentoListView):
+    """Exporta os agendamentos filtrados (busca, status e datas) em CSV (streaming)"""
+    
+    def get(self, request, *args, **kwargs):
+        return resposta_csv(
+            'agendamentos', CABECALHO_AGENDAMENTOS, linhas_agendamentos(self.get_queryset())
+        )
+
+
 class AgendamentoCreateView(LoginRequiredMixin, CreateView):
     """Criar novo agendamento"""
     model = Agendamento
@@ -677,17 +711,56 @@ class AgendamentoCreateView(LoginRequiredMixin, CreateView):
     
     def form_valid(self, form):
         form.instance.criado_por = self.request.user
+        try:
+            response = super().form_valid(form)
+        except ValidationError as erro:
+            # Outro agendamento ocupou o horário entre a validação e a gravação
+            form.add_error(None, erro)
+            return self.form_invalid(form)
         messages.success(
             self.request, 
             f'Agendamento para "{form.instance.cliente.nome}" criado com sucesso!'
         )
-        return super().form_valid(form)
+        return response
     
     def form_invalid(self, form):
         messages.error(self.request, 'Erro ao criar agendamento. Verifique os dados informados.')
         return super().form_invalid(form)
 
 
+class SerieRecorrenteCreateView(LoginRequiredMixin, CreateView):
+    """Criar série de agendamentos recorrentes"""
+    model = SerieRecorrente
+    form_class = SerieRecorrenteForm
+    template_name = 'agendamentos/serie_form.html'
+    success_url = reverse_lazy('agendamentos:agendamento_list')
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
+    def form_valid(self, form):
+        serie = form.save(commit=False)
+        serie.criado_por = self.request.user
+        try:
+            agendamentos = criar_serie(serie)
+        except ValidationError as erro:
+            # Todos os conflitos da série são listados de uma vez
+            form.add_error(None, erro)
+            return self.form_invalid(form)
+        self.object = serie
+        messages.success(
+            self.request,
+            f'Série para "{serie.cliente.nome}" criada com {len(agendamentos)} agendamentos!'
+        )
+        return redirect(self.get_success_url())
+
+    def form_invalid(self, form):
+        messages.error(self.request, 'Erro ao criar série. Verifique os dados informados.')
+        return super().form_invalid(form)
+
+
 class AgendamentoDetailView(LoginRequiredMixin, DetailView):
     """Detalhes do agendamento"""
     model = Agendamento
@@ -695,7 +768,16 @@ class AgendamentoDetailView(LoginRequiredMixin, DetailView):
     context_object_name = 'agendamento'
     
     def get_queryset(self):
-        return Agendamento.objects.filter(criado_por=self.request.user)
+        return Agendamento.objects.filter(criado_por=self.request.user).select_related('cliente', 'servico')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Consulta preguiçosa: só executa se o template exibir o histórico
+        context['historico_status'] = self.object.historico_status.select_related('criado_por').only(
+            'status_anterior', 'status_novo', 'observacao', 'criado_em', 'agendamento_id',
+            'criado_por__username', 'criado_por__first_name', 'criado_por__last_name',
+        )[:LIMITE_HISTORICO_STATUS]
+        return context
 
 
 class AgendamentoUpdateView(LoginRequiredMixin, UpdateView):
@@ -722,11 +804,16 @@ class AgendamentoUpdateView(LoginRequiredMixin, UpdateView):
             )
             return redirect('agendamentos:agendamento_detail', pk=form.instance.pk)
         
+        try:
+            response = super().form_valid(form)
+        except ValidationError as erro:
+            form.add_error(None, erro)
+            return self.form_invalid(form)
         messages.success(
             self.request, 
             f'Agendamento de "{form.instance.cliente.nome}" atualizado com sucesso!'
         )
-        return super().form_valid(form)
+        return response
     
     def form_invalid(self, form):
         messages.error(self.request, 'Erro ao atualizar agendamento. Verifique os dados informados.')
@@ -778,17 +865,58 @@ class AgendamentoStatusUpdateView(LoginRequiredMixin, UpdateView):
         )
         return reverse_lazy('agendamentos:agendamento_detail', kwargs={'pk': self.object.pk})
 
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
     def form_valid(self, form):
-        # Log da mudança de status
-        old_status = self.get_object().status
-        new_status = form.cleaned_data['status']
-        
-        if old_status != new_status:
-            # Aqui você pode adicionar lógica adicional
-            # como envio de notificações, emails, etc.
-            pass
-            
-        return super().form_valid(form)
+        try:
+            return super().form_valid(form)
+        except ValidationError as erro:
+            # Ex.: reativar um agendamento cujo horário já foi ocupado
+            form.add_error(None, erro.messages)
+            messages.error(self.request, ' '.join(erro.messages))
+            return self.form_invalid(form)
+
+
+@login_required
+@require_POST
+def agendamento_status_lote(request):
+    """
+    Altera o status de vários agendamentos de uma vez.
+
+    POST novo_status=<status>, observacoes_status e ids=<id> (repetido) ou
+    escopo=filtro para todos os agendamentos que atendem aos filtros da
+    listagem, recebidos na query string.
+    """
+    destino = f"{reverse('agendamentos:agendamento_list')}?{request.GET.urlencode()}"
+    novo_status = request.POST.get('novo_status')
+    if novo_status not in StatusAgendamento.values:
+        messages.error(request, 'Selecione um status válido.')
+        return redirect(destino)
+
+    queryset = Agendamento.objects.all()
+    if request.POST.get('escopo') == 'filtro':
+        queryset = filtrar_agendamentos(queryset, request.GET)
+    else:
+        ids = [pk for pk in request.POST.getlist('ids') if pk.isdigit()]
+        if not ids:
+            messages.error(request, 'Selecione ao menos um agendamento.')
+            return redirect(destino)
+        queryset = queryset.filter(pk__in=ids)
+
+    observacao = request.POST.get('observacoes_status', '').strip()[:500]
+    alterados = alterar_status_em_lote(request.user, queryset, novo_status, observacao)
+    if alterados:
+        messages.success(
+            request,
+            f'{alterados} agendamento{pluralize(alterados)} alterado{pluralize(alterados)} para '
+            f'"{StatusAgendamento(novo_status).label}".'
+        )
+    else:
+        messages.error(request, 'Nenhum agendamento selecionado permite essa alteração de status.')
+    return redirect(destino)
 
 
 # ========================================
@@ -801,7 +929,11 @@ class ConfiguracaoView(LoginRequiredMixin, TemplateView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Aqui você pode adicionar configurações específicas
+        dias = dict(ConfiguracaoHorario.DIAS_SEMANA)
+        context['expediente'] = [
+            (dias[dia], abertura, fechamento)
+            for dia, (abertura, fechamento) in sorted(horario_funcionamento(self.request.user).items())
+        ]
         return context
 
 
@@ -809,3 +941,42 @@ class ConfiguracaoView(LoginRequiredMixin, TemplateView):
 # ========================================
 # APIS DE CONFIGURAÇÃO
 # ========================================
+
+@login_required
+def dashboard_cache_stats(request):
+    """Contadores de acerto/falha do cache do dashboard (apenas para admins)"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Acesso negado'}, status=403)
+    return JsonResponse(estatisticas_cache_dashboard())
+
+
+@login_required
+def disponibilidade_api(request):
+    """
+    Horários livres para um serviço em um período.
+
+    GET ?servico=<id>&inicio=AAAA-MM-DD&fim=AAAA-MM-DD[&passo=<minutos>]
+    (padrão: os próximos 7 dias, grade de 30 minutos).
+    """
+    try:
+        servico_id = int(request.GET.get('servico') or 0)
+        inicio = date.fromisoformat(request.GET['inicio']) if request.GET.get('inicio') else timezone.localdate()
+        fim = date.fromisoformat(request.GET['fim']) if request.GET.get('fim') else inicio + timedelta(days=6)
+        passo = int(request.GET.get('passo') or PASSO_PADRAO)
+    except ValueError:
+        return JsonResponse({'error': 'Parâmetros inválidos'}, status=400)
+
+    servico = get_object_or_404(TipoServico, pk=servico_id, criado_por=request.user, ativo=True)
+    if fim < inicio or (fim - inicio).days >= LIMITE_DIAS or not 5 <= passo <= 240:
+        return JsonResponse({'error': f'Período de até {LIMITE_DIAS} dias e passo entre 5 e 240 minutos'},
+                            status=400)
+
+    dias = disponibilidade(request.user, servico, inicio, fim, passo=passo)
+    return JsonResponse({
+        'servico': {'id': servico.pk, 'nome': servico.nome, 'duracao_minutos': int(servico.duracao.total_seconds() // 60)},
+        'passo_minutos': passo,
+        'dias': [
+            {'data': data.isoformat(), 'horarios': [hora.strftime('%H:%M') for hora in horarios]}
+            for data, horarios in dias
+        ],
+    })
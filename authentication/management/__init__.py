@@ -0,0 +1 @@
+# Arquivo vazio para tornar este diretório um pacote Python
@@ -0,0 +1,17 @@
+"""
+collectstatic que gera o CSS dos temas antes de coletar os arquivos
+
+Requer 'authentication' antes de 'django.contrib.staticfiles' em
+INSTALLED_APPS (o primeiro app com o comando prevalece).
+"""
+
+from django.contrib.staticfiles.management.commands.collectstatic import Command as CollectstaticCommand
+from django.core.management import call_command
+
+
+class Command(CollectstaticCommand):
+
+    def handle(self, **options):
+        if not options['dry_run']:
+            call_command('gerar_css_temas', verbosity=options['verbosity'])
+        return super().handle(**options)
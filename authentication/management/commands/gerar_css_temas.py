@@ -0,0 +1,61 @@
+"""
+Gera as folhas de estilo de cada (tema, modo) em static/css/temas
+
+Uso:
+    python manage.py gerar_css_temas
+    python manage.py gerar_css_temas --check   # falha se os arquivos estiverem desatualizados
+
+Executado automaticamente pelo collectstatic.
+"""
+
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.context_processors import ARQUIVOS_TEMA
+from core.temas_css import DIRETORIO_TEMAS
+
+
+class Command(BaseCommand):
+    help = 'Gera um CSS com hash no nome para cada tema e modo a partir das paletas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--destino',
+            default=os.path.join(settings.BASE_DIR, 'static'),
+            help='Diretório estático onde gravar css/temas (padrão: static/ do projeto)',
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Não grava nada; sai com erro se algum arquivo estiver ausente ou sobrando',
+        )
+
+    def handle(self, *args, **options):
+        diretorio = os.path.join(options['destino'], *DIRETORIO_TEMAS.split('/'))
+        esperados = {os.path.basename(caminho): css for caminho, css in ARQUIVOS_TEMA.values()}
+        existentes = set(os.listdir(diretorio)) if os.path.isdir(diretorio) else set()
+        sobrando = sorted(nome for nome in existentes - set(esperados) if nome.endswith('.css'))
+
+        if options['check']:
+            faltando = sorted(set(esperados) - existentes)
+            if faltando or sobrando:
+                raise CommandError(
+                    f'CSS dos temas desatualizado (faltando: {", ".join(faltando) or "-"}; '
+                    f'sobrando: {", ".join(sobrando) or "-"}). Rode "python manage.py gerar_css_temas".'
+                )
+            self.stdout.write(self.style.SUCCESS('CSS dos temas em dia.'))
+            return
+
+        os.makedirs(diretorio, exist_ok=True)
+        # Versões anteriores (hash antigo) deixam de ser referenciadas
+        for nome in sobrando:
+            os.remove(os.path.join(diretorio, nome))
+        for nome, css in esperados.items():
+            with open(os.path.join(diretorio, nome), 'w', encoding='utf-8', newline='\n') as arquivo:
+                arquivo.write(css)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'{len(esperados)} arquivo(s) de tema gerado(s) em {diretorio}.')
+        )
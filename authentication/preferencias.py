@@ -0,0 +1,26 @@
+"""
+Tema e modo do usuário guardados na sessão.
+
+O context processor roda em toda renderização; com os valores na sessão
+(que já é carregada para autenticar) a página não consulta
+PreferenciasUsuario. A sessão é preenchida na primeira leitura e
+atualizada por alterar_tema/alterar_modo.
+"""
+
+from .models import PreferenciasUsuario
+
+CHAVE_SESSAO = 'preferencias_tema'
+
+
+def guardar_na_sessao(request, preferencias):
+    request.session[CHAVE_SESSAO] = {'tema': preferencias.tema, 'modo': preferencias.modo}
+
+
+def tema_e_modo(request):
+    """(tema, modo) do usuário autenticado; consulta o banco só se a sessão ainda não tiver"""
+    dados = request.session.get(CHAVE_SESSAO)
+    if dados is None:
+        preferencias = PreferenciasUsuario.get_or_create_for_user(request.user)
+        guardar_na_sessao(request, preferencias)
+        dados = request.session[CHAVE_SESSAO]
+    return dados['tema'], dados['modo']
@@ -1,3 +1,66 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.templatetags.static import static
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.context_processors import ARQUIVOS_TEMA
+
+from .models import PreferenciasUsuario
+
+
+class TemaContextTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='recepcao', password='senha-teste-123')
+        self.client.force_login(self.user)
+
+    def consultas_preferencias(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        return resposta, [
+            c['sql'] for c in consultas.captured_queries if 'authentication_preferenciasusuario' in c['sql']
+        ]
+
+    def test_paginas_autenticadas_nao_consultam_preferencias(self):
+        url = reverse('authentication:profile')
+        # Primeira renderização cria as preferências e as guarda na sessão
+        self.client.get(url)
+        self.assertTrue(PreferenciasUsuario.objects.filter(usuario=self.user).exists())
+
+        resposta, consultas = self.consultas_preferencias(url)
+        self.assertEqual(consultas, [])
+        self.assertEqual((resposta.context['tema_atual'], resposta.context['modo_atual']), ('default', 'light'))
+
+        # As views AJAX gravam no banco e atualizam a sessão
+        self.client.post(reverse('authentication:alterar_tema'), {'tema': 'ocean'})
+        self.client.post(reverse('authentication:alterar_modo'), {'modo': 'dark'})
+        resposta, consultas = self.consultas_preferencias(url)
+        self.assertEqual(consultas, [])
+        self.assertEqual((resposta.context['tema_atual'], resposta.context['modo_atual']), ('ocean', 'dark'))
+        self.assertEqual(resposta.context['paleta_cores']['name'], 'Oceano Profundo')
+        self.assertTrue(resposta.context['is_dark_mode'])
+
+        preferencias = PreferenciasUsuario.objects.get(usuario=self.user)
+        self.assertEqual((preferencias.tema, preferencias.modo), ('ocean', 'dark'))
+
+    def test_tema_em_arquivo_css_trocado_pela_url(self):
+        resposta = self.client.get(reverse('authentication:profile'))
+        css_claro = static(ARQUIVOS_TEMA[('default', 'light')][0])
+        self.assertContains(resposta, f'id="tema-css" href="{css_claro}"')
+        # As cores não vão mais embutidas na página
+        self.assertNotContains(resposta, '--primary-color:')
+
+        dados = self.client.post(reverse('authentication:alterar_modo'), {'modo': 'dark'}).json()
+        self.assertEqual(dados['css_url'], static(ARQUIVOS_TEMA[('default', 'dark')][0]))
+        dados = self.client.post(reverse('authentication:alterar_tema'), {'tema': 'purple'}).json()
+        self.assertEqual(dados['css_url'], static(ARQUIVOS_TEMA[('purple', 'dark')][0]))
 
-# Create your tests here.
+    def test_css_dos_temas_versionado_em_dia(self):
+        # Falha se as paletas mudaram sem rodar gerar_css_temas
+        call_command('gerar_css_temas', '--check', stdout=StringIO())
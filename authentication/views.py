@@ -15,6 +15,8 @@ from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from .models import PreferenciasUsuario
+from .preferencias import guardar_na_sessao
+from core.context_processors import url_css_tema
 from django.views.decorators.csrf import csrf_protect
 
 # ========================================
@@ -165,10 +167,14 @@ def alterar_tema(request):
     preferencias = PreferenciasUsuario.get_or_create_for_user(request.user)
     preferencias.tema = tema
     preferencias.save()
+    guardar_na_sessao(request, preferencias)
     
     return JsonResponse({
         'success': True,
         'tema': tema,
+        'tema_nome': preferencias.get_tema_display(),
+        'modo': preferencias.modo,
+        'css_url': url_css_tema(tema, preferencias.modo),
         'message': f'Tema alterado para {preferencias.get_tema_display()}'
     })
 
@@ -192,6 +198,7 @@ def alterar_modo(request):
         modo_anterior = preferencias.modo
         preferencias.modo = modo
         preferencias.save()
+        guardar_na_sessao(request, preferencias)
         
         # CORRIGIDO: Mostrar mensagem baseada no novo modo
         modo_nome = 'Escuro' if modo == 'dark' else 'Claro'
@@ -200,6 +207,8 @@ def alterar_modo(request):
             'success': True,
             'modo': modo,
             'modo_anterior': modo_anterior,
+            'tema': preferencias.tema,
+            'css_url': url_css_tema(preferencias.tema, modo),
             'message': f'Modo alterado para {modo_nome} com sucesso!'
         })
         
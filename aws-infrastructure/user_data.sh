@@ -435,6 +435,7 @@ done
 # Executar migrações e coletar arquivos estáticos
 source venv/bin/activate
 python manage.py migrate --settings=core.settings_production
+python manage.py createcachetable --settings=core.settings_production
 
 # Coletar arquivos estáticos com logs detalhados
 echo "Coletando arquivos estáticos..."
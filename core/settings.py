@@ -22,12 +22,14 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
-    'django.contrib.staticfiles',
     
     # Apps locais
     'agendamentos',
     'authentication',
     'info',
+
+    # Depois dos apps locais: o collectstatic de authentication gera o CSS dos temas
+    'django.contrib.staticfiles',
 ]
 
 MIDDLEWARE = [
@@ -109,11 +109,15 @@ LOGGING = {
     },
 }
 
-# Cache (usar memória para instância única)
+# Cache compartilhado entre os workers do gunicorn: dashboard, totais das
+# listagens, mapas de ocupação e relatórios de importação são invalidados
+# por um worker e lidos por outro. O LocMemCache é por processo e deixaria
+# cada worker com a sua cópia. A tabela é criada com createcachetable.
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": "unique-snowflake",
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "cache_agendamentos",
+        "OPTIONS": {"MAX_ENTRIES": 20000},
     }
 }
 
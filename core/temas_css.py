@@ -0,0 +1,101 @@
+"""
+Folhas de estilo de cada (tema, modo), geradas a partir das paletas de
+core.context_processors.
+
+O nome do arquivo leva um hash do conteúdo, então o navegador pode
+guardá-lo por tempo indeterminado; trocar de tema é trocar o <link>.
+Os arquivos são gravados em static/css/temas pelo comando gerar_css_temas
+(executado também pelo collectstatic).
+"""
+
+import hashlib
+
+DIRETORIO_TEMAS = 'css/temas'
+
+# Chave da paleta -> variável CSS
+VARIAVEIS = [
+    ('primary', '--primary-color'),
+    ('secondary', '--secondary-color'),
+    ('success', '--success-color'),
+    ('warning', '--warning-color'),
+    ('danger', '--danger-color'),
+    ('info', '--info-color'),
+    ('light', '--light-color'),
+    ('dark', '--dark-color'),
+    ('background', '--background-color'),
+    ('surface', '--surface-color'),
+    ('text', '--text-color'),
+    ('text_muted', '--text-muted-color'),
+    ('border', '--border-color'),
+    ('gradient', '--gradient-bg'),
+    ('shadow', '--shadow-color'),
+]
+
+# Forçar cores de texto em modo escuro
+REGRAS_MODO_ESCURO = """
+body, body * {
+    color: var(--text-color) !important;
+}
+
+/* Exceções para elementos que devem manter cor específica */
+.text-primary { color: var(--primary-color) !important; }
+.text-secondary { color: var(--secondary-color) !important; }
+.text-success { color: var(--success-color) !important; }
+.text-warning { color: var(--warning-color) !important; }
+.text-danger { color: var(--danger-color) !important; }
+.text-info { color: var(--info-color) !important; }
+.text-light { color: var(--light-color) !important; }
+.text-dark { color: var(--dark-color) !important; }
+.text-muted { color: var(--text-muted-color) !important; }
+.text-white { color: #ffffff !important; }
+
+/* Botões com cores específicas */
+.btn-primary, .btn-primary *,
+.btn-success, .btn-success *,
+.btn-warning, .btn-warning *,
+.btn-danger, .btn-danger *,
+.btn-info, .btn-info *,
+.btn-light, .btn-light *,
+.btn-dark, .btn-dark * {
+    color: white !important;
+}
+
+/* Badges */
+.badge, .badge * {
+    color: white !important;
+}
+
+/* Headers de cards com background colorido */
+.card-header.bg-primary, .card-header.bg-primary *,
+.card-header.bg-success, .card-header.bg-success *,
+.card-header.bg-warning, .card-header.bg-warning *,
+.card-header.bg-danger, .card-header.bg-danger *,
+.card-header.bg-info, .card-header.bg-info *,
+.card-header.bg-dark, .card-header.bg-dark * {
+    color: white !important;
+}
+"""
+
+
+def gerar_css(modo, paleta, amostras):
+    """
+    CSS de um tema: variáveis da paleta, regras do modo escuro e as
+    amostras do seletor (`amostras`: {tema: paleta clara}).
+    """
+    linhas = [f'/* Tema {paleta["name"]} ({modo}) - gerado por gerar_css_temas, não editar */', ':root {']
+    linhas += [f'    {variavel}: {paleta[chave]};' for chave, variavel in VARIAVEIS]
+    linhas.append('}')
+    if modo == 'dark':
+        linhas.append(REGRAS_MODO_ESCURO.rstrip())
+    linhas.append('')
+    linhas += [
+        f'.tema-amostra-{chave} {{ background: {amostra["gradient"]}; }}'
+        for chave, amostra in amostras.items()
+    ]
+    return '\n'.join(linhas) + '\n'
+
+
+def caminho_css(tema, modo, css):
+    """Caminho estático do arquivo, com os 12 primeiros dígitos do MD5 do conteúdo"""
+    digest = hashlib.md5(css.encode('utf-8'), usedforsecurity=False).hexdigest()[:12]
+    return f'{DIRETORIO_TEMAS}/{tema}-{modo}.{digest}.css'
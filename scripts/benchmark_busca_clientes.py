@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark da busca de clientes: icontains x backend indexado (FTS5/trigram).
+
+Cria um banco de teste temporário, insere N clientes (padrão 100.000) e
+mede o tempo médio de cada busca nos dois backends.
+
+Uso: python scripts/benchmark_busca_clientes.py [--quantidade 100000] [--repeticoes 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date
+
+import django
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+NOMES = ['José', 'Maria', 'João', 'Ana', 'Antônio', 'Francisca', 'Carlos', 'Márcia', 'Paulo', 'Letícia']
+SOBRENOMES = ['Silva', 'Conceição', 'Araújo', 'Gonçalves', 'Lima', 'Souza', 'Pereira', 'Assunção', 'Melo', 'Brandão']
+TERMOS = ['jose', 'conceicao', 'ana sou', 'gonçalves', '98765-43', 'cliente42@']
+
+
+def popular(usuario, quantidade, lote=5000):
+    from agendamentos.models import Cliente
+
+    aleatorio = random.Random(42)
+    clientes = []
+    for i in range(quantidade):
+        clientes.append(Cliente(
+            nome=f'{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)} {aleatorio.choice(SOBRENOMES)}',
+            email=f'cliente{i}@exemplo.com',
+            telefone=f'(11) 9{aleatorio.randint(1000, 9999)}-{aleatorio.randint(1000, 9999)}',
+            cpf=f'{i // 1000000:03d}.{i // 1000 % 1000:03d}.{i % 1000:03d}-{i % 100:02d}',
+            data_nascimento=date(1990, 1, 1),
+            criado_por=usuario,
+        ))
+        if len(clientes) == lote:
+            Cliente.objects.bulk_create(clientes)
+            clientes = []
+    Cliente.objects.bulk_create(clientes)
+
+
+def medir(backend, queryset, termo, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        # Primeira página, como na listagem
+        resultados = list(backend.buscar(queryset, termo).values_list('id', flat=True)[:20])
+    return (time.perf_counter() - inicio) / repeticoes * 1000, len(resultados)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quantidade', type=int, default=100000)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    django.setup()
+
+    from django.contrib.auth.models import User
+    from django.db import connection
+
+    from agendamentos.models import Cliente
+    from agendamentos.services.busca import BuscaClientesIcontains, obter_backend_busca
+
+    nome_original = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, keepdb=False)
+    try:
+        usuario = User.objects.create_user('benchmark', password='benchmark')
+        inicio = time.perf_counter()
+        popular(usuario, args.quantidade)
+        print(f'{args.quantidade} clientes inseridos em {time.perf_counter() - inicio:.1f}s')
+
+        indexado = obter_backend_busca()
+        icontains = BuscaClientesIcontains()
+        queryset = Cliente.objects.filter(criado_por=usuario)
+        print(f'Backend: {type(indexado).__name__} ({connection.vendor})\n')
+        print(f'{"termo":<14}{"icontains (ms)":>16}{"indexado (ms)":>16}')
+        for termo in TERMOS:
+            tempo_icontains, _ = medir(icontains, queryset.order_by('nome'), termo, args.repeticoes)
+            tempo_indexado, _ = medir(indexado, queryset, termo, args.repeticoes)
+            print(f'{termo:<14}{tempo_icontains:>16.1f}{tempo_indexado:>16.1f}')
+    finally:
+        connection.creation.destroy_test_db(nome_original, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark da verificação de conflito de horário do AgendamentoForm.
+
+Compara o laço antigo (carrega todos os agendamentos ativos do dia e testa
+a sobreposição em Python) com a consulta única de sobreposição
+(Agendamento.objects.primeiro_conflito), com N agendamentos no dia
+(padrão 200).
+
+Uso: python scripts/benchmark_conflito_agendamento.py [--por-dia 200] [--repeticoes 200]
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import django
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def conflito_legado(usuario, data, hora_inicio, hora_fim):
+    """Reprodução do laço anterior do AgendamentoForm.clean"""
+    from agendamentos.models import STATUS_ATIVOS, Agendamento
+
+    for agendamento in Agendamento.objects.filter(
+        criado_por=usuario, data_agendamento=data, status__in=STATUS_ATIVOS
+    ):
+        if hora_inicio < agendamento.hora_fim and hora_fim > agendamento.hora_inicio:
+            return agendamento.hora_inicio, agendamento.hora_fim, agendamento.cliente.nome
+    return None
+
+
+def medir(funcao, repeticoes):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as consultas:
+        funcao()
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes * 1000, len(consultas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--por-dia', type=int, default=200)
+    parser.add_argument('--repeticoes', type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    django.setup()
+
+    from django.contrib.auth.models import User
+    from django.db import connection
+
+    from agendamentos.models import Agendamento, Cliente, TipoServico
+
+    nome_original = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, keepdb=False)
+    try:
+        usuario = User.objects.create_user('benchmark', password='benchmark')
+        cliente = Cliente.objects.create(
+            nome='Cliente Benchmark', email='benchmark@exemplo.com', telefone='(11) 99999-9999',
+            cpf='123.456.789-01', data_nascimento=date(1990, 1, 1), criado_por=usuario,
+        )
+        servico = TipoServico.objects.create(
+            nome='Serviço', duracao=timedelta(minutes=5), preco=Decimal('10.00'), criado_por=usuario,
+        )
+        data = date.today() + timedelta(days=1)
+        # Agendamentos de 5 minutos, lado a lado, a partir das 06:00
+        inicio_dia = datetime.combine(data, datetime.min.time()) + timedelta(hours=6)
+        Agendamento.objects.bulk_create([
+            Agendamento(
+                cliente=cliente, servico=servico, data_agendamento=data,
+                hora_inicio=(inicio_dia + timedelta(minutes=5 * i)).time(),
+                hora_fim=(inicio_dia + timedelta(minutes=5 * (i + 1))).time(),
+                criado_por=usuario,
+            )
+            for i in range(args.por_dia)
+        ])
+
+        livre_inicio = (inicio_dia + timedelta(minutes=5 * args.por_dia)).time()
+        livre_fim = (inicio_dia + timedelta(minutes=5 * args.por_dia + 30)).time()
+        ocupado_inicio = (inicio_dia + timedelta(minutes=5 * (args.por_dia - 1))).time()
+
+        cenarios = [
+            ('horário livre', livre_inicio, livre_fim),
+            ('conflito no fim do dia', ocupado_inicio, livre_fim),
+        ]
+        print(f'{args.por_dia} agendamentos no dia ({connection.vendor})\n')
+        print(f'{"cenário":<24}{"laço (ms)":>12}{"consultas":>11}{"consulta única (ms)":>21}{"consultas":>11}')
+        for nome, hora_inicio, hora_fim in cenarios:
+            tempo_legado, consultas_legado = medir(
+                lambda: conflito_legado(usuario, data, hora_inicio, hora_fim), args.repeticoes
+            )
+            tempo_novo, consultas_novo = medir(
+                lambda: Agendamento.objects.primeiro_conflito(usuario, data, hora_inicio, hora_fim),
+                args.repeticoes,
+            )
+            print(f'{nome:<24}{tempo_legado:>12.2f}{consultas_legado:>11}{tempo_novo:>21.2f}{consultas_novo:>11}')
+    finally:
+        connection.creation.destroy_test_db(nome_original, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark de inserção de agendamentos.
+
+Compara N inserções (padrão 10.000) por três caminhos:
+- save() padrão: full_clean (com o SELECT de unique_together) + signals;
+- save(validar=False): o caminho do AgendamentoForm, já validado;
+- importar_agendamentos: cálculo em memória + bulk_create em lotes.
+
+Uso: python scripts/benchmark_importacao_agendamentos.py [--quantidade 10000] [--lote 1000]
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import django
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Horários de 15 em 15 minutos a partir das 06:00 (serviço de 10 minutos)
+HORARIOS_POR_DIA = 48
+
+
+def gerar_registros(cliente, servico, quantidade, primeira_data):
+    inicio_dia = datetime.combine(primeira_data, datetime.min.time()) + timedelta(hours=6)
+    for i in range(quantidade):
+        dia, horario = divmod(i, HORARIOS_POR_DIA)
+        yield {
+            'cliente_id': cliente.pk,
+            'servico_id': servico.pk,
+            'data_agendamento': primeira_data + timedelta(days=dia),
+            'hora_inicio': (inicio_dia + timedelta(minutes=15 * horario)).time(),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quantidade', type=int, default=10000)
+    parser.add_argument('--lote', type=int, default=1000)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    django.setup()
+
+    from django.contrib.auth.models import User
+    from django.db import connection
+
+    from agendamentos.models import Agendamento, Cliente, TipoServico
+    from agendamentos.services.importacao import importar_agendamentos
+
+    def preparar(nome):
+        usuario = User.objects.create_user(nome, password='benchmark')
+        cliente = Cliente.objects.create(
+            nome=f'Cliente {nome}', email=f'{nome}@exemplo.com', telefone='(11) 99999-9999',
+            cpf=f'{usuario.pk:03d}.456.789-01', data_nascimento=date(1990, 1, 1), criado_por=usuario,
+        )
+        servico = TipoServico.objects.create(
+            nome='Serviço', duracao=timedelta(minutes=10), preco=Decimal('10.00'), criado_por=usuario,
+        )
+        return usuario, cliente, servico
+
+    def por_save(validar):
+        def executar(usuario, registros):
+            for registro in registros:
+                Agendamento(criado_por=usuario, **registro).save(validar=validar)
+        return executar
+
+    def por_importacao(usuario, registros):
+        resultado = importar_agendamentos(usuario, registros, batch_size=args.lote)
+        assert resultado.criados == args.quantidade, resultado.erros[:5]
+
+    caminhos = [
+        ('save() com full_clean', por_save(True)),
+        ('save(validar=False)', por_save(False)),
+        ('importar_agendamentos', por_importacao),
+    ]
+
+    nome_original = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, keepdb=False)
+    try:
+        primeira_data = date.today() + timedelta(days=1)
+        print(f'{args.quantidade} agendamentos por caminho ({connection.vendor})\n')
+        print(f'{"caminho":<26}{"tempo (s)":>11}{"linhas/s":>11}{"consultas":>11}')
+        for indice, (nome, executar) in enumerate(caminhos):
+            usuario, cliente, servico = preparar(f'benchmark{indice}')
+            registros = list(gerar_registros(cliente, servico, args.quantidade, primeira_data))
+            consultas = []
+            with connection.execute_wrapper(lambda execute, sql, *resto: consultas.append(sql) or execute(sql, *resto)):
+                inicio = time.perf_counter()
+                executar(usuario, registros)
+                duracao = time.perf_counter() - inicio
+            print(f'{nome:<26}{duracao:>11.2f}{args.quantidade / duracao:>11.0f}{len(consultas):>11}')
+    finally:
+        connection.creation.destroy_test_db(nome_original, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -26,7 +26,10 @@ function alterarTema(tema, event) {
     .then(data => {
         if (data.success) {
             showToast(data.message, 'success');
-            setTimeout(() => location.reload(), 800);
+            aplicarTema(data);
+            if (clickedItem) {
+                clickedItem.classList.remove('tema-loading');
+            }
         } else {
             showToast('Erro ao alterar tema', 'error');
             if (clickedItem) {
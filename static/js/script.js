@@ -39,7 +39,7 @@ function alterarTema(tema, event) {
     .then((response) => response.json())
     .then((data) => {
       if (data.success) {
-        location.reload();
+        aplicarTema(data);
       }
     })
     .catch((error) => console.error("Erro:", error));
@@ -60,12 +60,48 @@ function alterarModo(isDark) {
     .then((response) => response.json())
     .then((data) => {
       if (data.success) {
-        location.reload();
+        aplicarTema(data);
       }
     })
     .catch((error) => console.error("Erro:", error));
 }
 
+// Troca a folha de estilo do tema (css_url da resposta) sem recarregar a página
+function aplicarTema(data) {
+  const atual = document.getElementById("tema-css");
+  if (atual && data.css_url && atual.getAttribute("href") !== data.css_url) {
+    // O arquivo antigo só sai depois que o novo carregar, evitando a página sem cores
+    const novo = atual.cloneNode();
+    novo.href = data.css_url;
+    novo.onload = () => atual.remove();
+    atual.after(novo);
+  }
+
+  if (data.tema) {
+    document.querySelectorAll("[data-tema]").forEach((item) => {
+      item.classList.toggle("active", item.dataset.tema === data.tema);
+    });
+  }
+  if (data.tema_nome) {
+    document.querySelectorAll(".tema-nome-atual").forEach((elemento) => {
+      elemento.textContent = data.tema_nome;
+    });
+  }
+  if (data.modo) {
+    const escuro = data.modo === "dark";
+    document.querySelectorAll(".modo-icone").forEach((icone) => {
+      icone.classList.toggle("fa-moon", escuro);
+      icone.classList.toggle("fa-sun", !escuro);
+    });
+    document.querySelectorAll(".modo-texto").forEach((texto) => {
+      texto.textContent = escuro ? "Modo Escuro" : "Modo Claro";
+    });
+    document.querySelectorAll('input[onchange^="alterarModo"]').forEach((toggle) => {
+      toggle.checked = escuro;
+    });
+  }
+}
+
 // Função para pegar CSRF token
 function getCookie(name) {
   let cookieValue = null;